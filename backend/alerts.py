@@ -0,0 +1,287 @@
+import os
+import asyncio
+import bisect
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from supabase_client import table, execute
+from events import broker
+from cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+ALERTS_ENABLED = os.getenv("ALERTS_ENABLED", "true").lower() != "false"
+
+# Umbrales por defecto (mínimo, máximo) por tipo y campo; None = sin límite
+DEFAULT_THRESHOLDS = {
+    'Temperatura': {'value': (35.5, 38.0)},
+    'Frecuencia Cardíaca': {'value': (50, 110)},
+    'Frecuencia Respiratoria': {'value': (12, 24)},
+    'Saturación O2': {'value': (92, None)},
+    'Presión Arterial': {'systolic': (90, 160), 'diastolic': (60, 100)},
+}
+
+# Tendencias: tipo -> campo vigilado; alerta con TREND_READINGS lecturas seguidas en subida
+TREND_FIELDS = {
+    'Temperatura': 'value',
+    'Frecuencia Cardíaca': 'value',
+    'Presión Arterial': 'systolic',
+}
+TREND_READINGS = 3
+WINDOW = timedelta(hours=24)
+# Una tendencia que sigue subiendo no vuelve a alertar antes de este intervalo
+TREND_COOLDOWN = timedelta(hours=float(os.getenv("ALERT_TREND_COOLDOWN_HOURS", "6")))
+
+# Límites de memoria: lecturas por residente y residentes con ventana
+WINDOW_MAX_READINGS = 200
+WINDOW_MAX_RESIDENTS = int(os.getenv("ALERT_WINDOW_RESIDENTS", "2000"))
+# Lecturas pendientes de evaluar; si se llena se descartan en lugar de frenar las escrituras
+ALERT_QUEUE_SIZE = int(os.getenv("ALERT_QUEUE_SIZE", "10000"))
+
+FIELD_LABELS = {'value': 'valor', 'systolic': 'sistólica', 'diastolic': 'diastólica'}
+
+# Umbrales propios por residente y feed de alertas (ver update_vital_sign_alerts.sql)
+THRESHOLDS_TABLE = 'vital_sign_thresholds'
+ALERTS_TABLE = 'vital_sign_alerts'
+
+# Los umbrales se leen en cada lectura evaluada; la caché es compartida, así un
+# cambio por PUT se ve enseguida en todos los workers
+threshold_cache = SharedCache('alert_thresholds', maxsize=WINDOW_MAX_RESIDENTS, ttl=300.0)
+
+def parse_taken_at(value) -> datetime:
+    """datetime sin zona (UTC si venía con zona) para comparar lecturas de cualquier origen"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def window_key(entry: tuple) -> tuple:
+    # Orden por (taken_at, tipo): los valores pueden ser None y no se comparan
+    return entry[:2]
+
+class AlertEngine:
+    """Evalúa cada signo vital nuevo contra umbrales y tendencias, fuera del camino de escritura.
+
+    Los endpoints solo encolan la lectura (submit); una tarea en segundo plano la
+    evalúa con una ventana de las últimas 24 h del residente que se carga una vez
+    desde Supabase y luego se mantiene en memoria (por proceso). Los umbrales
+    propios y las alertas se guardan en Supabase, compartidos por todos los workers.
+    """
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.windows = OrderedDict()   # resident_id -> [(taken_at, type, value, systolic, diastolic)]
+        self.last_trend = {}           # (resident_id, tipo) -> taken_at de la última alerta de tendencia
+        self.published = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """Arranca el worker (idempotente); lo llama el lifespan o el primer submit"""
+        if self.task is None or self.task.done():
+            self.queue = asyncio.Queue(maxsize=ALERT_QUEUE_SIZE)
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+        self.queue = None
+
+    def submit(self, reading: dict):
+        """Encola una lectura ya guardada; nunca bloquea ni falla la escritura"""
+        if not ALERTS_ENABLED:
+            return
+        self.start()
+        try:
+            self.queue.put_nowait(reading)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def submit_many(self, readings):
+        for reading in readings:
+            self.submit(reading)
+
+    async def run(self):
+        while True:
+            reading = await self.queue.get()
+            try:
+                await self.process(reading)
+            except Exception as e:
+                self.failed += 1
+                logger.error("Error evaluating vital sign alerts: %s", e)
+            finally:
+                self.processed += 1
+                self.queue.task_done()
+
+    async def drain(self):
+        """Espera a que se evalúen las lecturas encoladas (benchmarks y apagado ordenado)"""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def process(self, reading: dict) -> list:
+        resident_id = reading['resident_id']
+        window = self.windows.get(resident_id)
+        if window is None:
+            window = await self.load_window(resident_id)
+        self.windows.move_to_end(resident_id)
+        entry = (
+            parse_taken_at(reading['taken_at']), reading['type'],
+            reading.get('value'), reading.get('systolic'), reading.get('diastolic')
+        )
+        index = self.add_to_window(window, entry)
+        thresholds = await self.thresholds(resident_id)
+        # Una lectura más vieja que la ventana solo se evalúa contra los umbrales
+        alerts = self.evaluate(resident_id, reading, entry, [entry] if index is None else window[:index + 1], thresholds)
+        if alerts:
+            alerts = await self.publish(alerts)
+        return alerts
+
+    async def load_window(self, resident_id: str) -> list:
+        """Últimas 24 h del residente, una sola vez por proceso (luego se actualiza en memoria)"""
+        since = (datetime.now(timezone.utc) - WINDOW).isoformat()
+        result = await execute(
+            table('vital_signs').select("type, value, systolic, diastolic, taken_at")
+            .eq('resident_id', resident_id).gte('taken_at', since).order('taken_at')
+        )
+        window = sorted(
+            ((parse_taken_at(row['taken_at']), row['type'], row.get('value'), row.get('systolic'), row.get('diastolic'))
+             for row in result.data),
+            key=window_key
+        )[-WINDOW_MAX_READINGS:]
+        self.windows[resident_id] = window
+        while len(self.windows) > WINDOW_MAX_RESIDENTS:
+            self.windows.popitem(last=False)
+        return window
+
+    def add_to_window(self, window: list, entry: tuple) -> Optional[int]:
+        """Inserta en orden y devuelve la posición de la lectura (None si quedó fuera de las 24 h).
+
+        Si ya estaba (se guardó antes de cargar la ventana) no se duplica.
+        """
+        index = bisect.bisect_left(window, window_key(entry), key=window_key)
+        if index == len(window) or window[index][:2] != entry[:2]:
+            window.insert(index, entry)
+        newest = window[-1][0]
+        while len(window) > 1 and (window[0][0] < newest - WINDOW or len(window) > WINDOW_MAX_READINGS):
+            window.pop(0)
+            index -= 1
+        return index if index >= 0 else None
+
+    async def overrides(self, resident_id: str) -> dict:
+        """Umbrales propios del residente ({} si no tiene), vía la caché compartida"""
+        key = ('resident', resident_id)
+        overrides = await threshold_cache.get(key)
+        if overrides is None:
+            result = await execute(table(THRESHOLDS_TABLE).select("thresholds").eq('resident_id', resident_id))
+            overrides = result.data[0]['thresholds'] if result.data else {}
+            await threshold_cache.set(key, overrides)
+        return overrides
+
+    async def set_overrides(self, resident_id: str, thresholds: dict):
+        """Reemplaza los umbrales propios del residente"""
+        await execute(
+            table(THRESHOLDS_TABLE).upsert(
+                {"resident_id": resident_id, "thresholds": thresholds, "updated_at": datetime.now(timezone.utc).isoformat()},
+                on_conflict='resident_id'
+            )
+        )
+        await threshold_cache.set(('resident', resident_id), thresholds)
+
+    async def delete_overrides(self, resident_id: str):
+        await execute(table(THRESHOLDS_TABLE).delete().eq('resident_id', resident_id))
+        await threshold_cache.set(('resident', resident_id), {})
+
+    async def thresholds(self, resident_id: str) -> dict:
+        """Umbrales por defecto con los del residente encima"""
+        overrides = await self.overrides(resident_id)
+        if not overrides:
+            return DEFAULT_THRESHOLDS
+        merged = {vital_type: dict(fields) for vital_type, fields in DEFAULT_THRESHOLDS.items()}
+        for vital_type, fields in overrides.items():
+            merged.setdefault(vital_type, {}).update(fields)
+        return merged
+
+    def evaluate(self, resident_id: str, reading: dict, entry: tuple, window: list, thresholds: dict) -> list:
+        """Alertas de la lectura; `window` son las lecturas de 24 h hasta ella inclusive"""
+        alerts = []
+        vital_type = reading['type']
+        limits = thresholds.get(vital_type, {})
+        for field, (low, high) in limits.items():
+            value = reading.get(field)
+            if value is None:
+                continue
+            if low is not None and value < low:
+                alerts.append(self.build_alert(reading, 'low', field, value, low))
+            elif high is not None and value > high:
+                alerts.append(self.build_alert(reading, 'high', field, value, high))
+
+        field = TREND_FIELDS.get(vital_type)
+        if field is not None:
+            position = 2 + ('value', 'systolic', 'diastolic').index(field)
+            values = [item[position] for item in window if item[1] == vital_type and item[position] is not None]
+            recent = values[-TREND_READINGS:]
+            rising = len(recent) == TREND_READINGS and all(a < b for a, b in zip(recent, recent[1:]))
+            last = self.last_trend.get((resident_id, vital_type))
+            if rising and (last is None or abs(entry[0] - last) >= TREND_COOLDOWN):
+                self.last_trend[(resident_id, vital_type)] = entry[0]
+                alerts.append(self.build_alert(reading, 'rising', field, recent[-1], recent[0]))
+        return alerts
+
+    def build_alert(self, reading: dict, rule: str, field: str, value, threshold) -> dict:
+        label = FIELD_LABELS[field]
+        messages = {
+            'low': f"{reading['type']}: {label} {value} por debajo de {threshold}",
+            'high': f"{reading['type']}: {label} {value} por encima de {threshold}",
+            'rising': f"{reading['type']}: {TREND_READINGS} lecturas seguidas en aumento en 24 h ({threshold} → {value})",
+        }
+        return {
+            "resident_id": reading['resident_id'],
+            "vital_sign_id": reading.get('id'),
+            "type": reading['type'],
+            "rule": rule,
+            "field": field,
+            "value": value,
+            "threshold": threshold,
+            "taken_at": str(reading['taken_at']),
+            "message": messages[rule]
+        }
+
+    async def publish(self, alerts: list) -> list:
+        """Guarda las alertas de una lectura (un solo insert) y las emite con el id asignado"""
+        result = await execute(table(ALERTS_TABLE).insert(alerts))
+        for alert in result.data:
+            self.published += 1
+            broker.publish('alert.created', alert, alert['resident_id'])
+            logger.warning("Vital sign alert %s (%s) for resident %s", alert['rule'], alert['type'], alert['resident_id'])
+        return result.data
+
+    async def alerts(self, resident_id: Optional[str] = None, since_id: int = 0, limit: int = 100) -> list:
+        """Alertas del feed, más recientes primero"""
+        query = table(ALERTS_TABLE).select("*").gt('id', since_id)
+        if resident_id is not None:
+            query = query.eq('resident_id', resident_id)
+        result = await execute(query.order('id', desc=True).limit(limit))
+        return result.data
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ALERTS_ENABLED,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "residents": len(self.windows),
+            "alerts": self.published,
+            "thresholds_cache": threshold_cache.stats()
+        }
+
+engine = AlertEngine()
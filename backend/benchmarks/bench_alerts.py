@@ -0,0 +1,93 @@
+"""Motor de alertas: lecturas evaluadas por segundo y latencia agregada a POST /vital-signs/.
+
+1. Ingesta sostenida: encola lecturas de 200 residentes y mide cuántas por
+   segundo evalúa el worker (las ventanas se cargan una vez desde el stub).
+2. Camino de escritura: latencia de POST /api/vital-signs/ con el motor
+   apagado y encendido.
+
+Uso (desde backend/): python benchmarks/bench_alerts.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+RESIDENTS = 200
+READINGS = 100_000
+WRITES = 500
+LATENCY = 0.0
+PORT = 54326
+
+TYPES = [
+    ('Temperatura', lambda: {'value': round(random.gauss(36.8, 0.6), 1), 'unit': '°C'}),
+    ('Frecuencia Cardíaca', lambda: {'value': random.randint(55, 115), 'unit': 'lpm'}),
+    ('Saturación O2', lambda: {'value': random.randint(88, 99), 'unit': '%'}),
+    ('Presión Arterial', lambda: {'systolic': random.randint(95, 170), 'diastolic': random.randint(60, 105), 'unit': 'mmHg'}),
+]
+
+def make_reading(resident: int, taken_at: datetime) -> dict:
+    vital_type, values = random.choice(TYPES)
+    return {'resident_id': f"resident-{resident}", 'type': vital_type, 'taken_at': taken_at.isoformat(), **values()}
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def sustained_ingest(engine):
+    start_time = datetime(2024, 1, 1)
+    readings = [make_reading(i % RESIDENTS, start_time + timedelta(minutes=i)) for i in range(READINGS)]
+    start = time.perf_counter()
+    submitted = 0
+    # Entrega en ráfagas del tamaño de la cola, como haría una ingesta masiva
+    while submitted < READINGS:
+        burst = readings[submitted:submitted + 5000]
+        engine.submit_many(burst)
+        submitted += len(burst)
+        await engine.drain()
+    elapsed = time.perf_counter() - start
+    stats = engine.stats()
+    print(f"ingesta sostenida: {READINGS} lecturas de {RESIDENTS} residentes en {elapsed:.2f} s "
+          f"= {READINGS / elapsed:,.0f} lecturas/s, {stats['alerts']} alertas, {stats['dropped']} descartadas")
+
+async def write_latency(client, alerts_module, enabled: bool):
+    alerts_module.ALERTS_ENABLED = enabled
+    latencies = []
+    for i in range(WRITES):
+        reading = make_reading(i % RESIDENTS, datetime(2024, 6, 1) + timedelta(minutes=i))
+        start = time.perf_counter()
+        response = await client.post('/api/vital-signs/', json=reading)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    await alerts_module.engine.drain()
+    label = "encendido" if enabled else "apagado"
+    print(f"POST /vital-signs/ motor {label:9s}: p50 {percentile(latencies, 0.5):5.2f} ms  p95 {percentile(latencies, 0.95):5.2f} ms")
+
+async def main():
+    stub = StubSupabase(latency=LATENCY)
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        os.environ.setdefault('LOG_LEVEL', 'ERROR')
+        from main import app
+        import alerts
+        import supabase_client
+
+        await sustained_ingest(alerts.engine)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for enabled in (False, True):
+                await write_latency(client, alerts, enabled)
+        await alerts.engine.stop()
+        await supabase_client.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
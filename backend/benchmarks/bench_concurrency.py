@@ -0,0 +1,86 @@
+"""Throughput de /api/residents/ con 50 clientes concurrentes.
+
+Compara el patrón anterior (cliente síncrono dentro de un handler async, que
+bloquea el event loop) con la capa asíncrona de supabase_client, ambos contra
+el stub local de PostgREST.
+
+Uso (desde backend/): python benchmarks/bench_concurrency.py
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from postgrest import SyncPostgrestClient
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+CLIENTS = 50
+REQUESTS = 500
+LATENCY = 0.02
+PORT = 54321
+
+def seed_residents(stub: StubSupabase, count: int = 50):
+    stub.seed('residents', [
+        {
+            'id': str(uuid.uuid4()),
+            'name': f"Residente {i}",
+            'status': 'independent',
+            'admission_date': '2023-01-01',
+        }
+        for i in range(count)
+    ])
+
+async def drive(app, path: str, clients: int = CLIENTS, requests: int = REQUESTS) -> float:
+    """Lanza `requests` peticiones repartidas en `clients` tareas y devuelve RPS"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        queue = asyncio.Queue()
+        for _ in range(requests):
+            queue.put_nowait(path)
+
+        async def worker():
+            while not queue.empty():
+                url = queue.get_nowait()
+                response = await client.get(url)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        return requests / (time.perf_counter() - start)
+
+def blocking_app(base_url: str) -> FastAPI:
+    """Réplica del handler original: execute() síncrono dentro de async def"""
+    app = FastAPI()
+    client = SyncPostgrestClient(f"{base_url}/rest/v1", headers={'apikey': 'bench'})
+
+    @app.get('/api/residents/')
+    async def get_residents():
+        return client.from_('residents').select('*').execute().data
+
+    return app
+
+async def main():
+    stub = StubSupabase(latency=LATENCY)
+    seed_residents(stub)
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        from main import app
+        import supabase_client
+
+        before = await drive(blocking_app(base_url), '/api/residents/')
+        after = await drive(app, '/api/residents/')
+        await supabase_client.close()
+
+    print(f"{CLIENTS} clientes, {REQUESTS} peticiones, latencia simulada {LATENCY * 1000:.0f} ms")
+    print(f"antes (síncrono):  {before:8.1f} req/s")
+    print(f"después (async):   {after:8.1f} req/s  (x{after / before:.1f})")
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""Bytes y latencia ahorrados por ETag en cargas repetidas del perfil de un residente.
+
+Carga el perfil (las mismas peticiones que hace la UI) N veces sin ETag y N
+veces enviando If-None-Match con el ETag recibido en la primera carga.
+
+Uso (desde backend/): python benchmarks/bench_etag.py
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+LOADS = 30
+LATENCY = 0.0
+PORT = 54325
+RESIDENT_ID = 'bench-resident'
+
+PROFILE_PATHS = [
+    f"/api/residents/{RESIDENT_ID}",
+    f"/api/residents/{RESIDENT_ID}/medical-info",
+    f"/api/family-contacts/resident/{RESIDENT_ID}",
+    f"/api/medications/today-status/{RESIDENT_ID}",
+    f"/api/vital-signs/resident/{RESIDENT_ID}/latest",
+    f"/api/vital-signs/resident/{RESIDENT_ID}?limit=200",
+]
+
+def seed(stub: StubSupabase):
+    stub.seed('residents', [{
+        'id': RESIDENT_ID, 'name': 'Residente de prueba', 'status': 'independent',
+        'admission_date': '2022-03-01', 'birth_date': '1941-07-15',
+        'pathologies': ['Hipertensión', 'Diabetes tipo 2'], 'allergies': ['Penicilina'],
+        'medical_history': 'Antecedentes ' * 200, 'blood_type': 'O+',
+    }])
+    stub.seed('family_contacts', [
+        {'id': str(uuid.uuid4()), 'resident_id': RESIDENT_ID, 'name': f"Familiar {i}",
+         'relationship': 'Hijo/a', 'phone': '3000000000', 'is_primary': i == 0}
+        for i in range(4)
+    ])
+    stub.seed('medications', [
+        {'id': str(uuid.uuid4()), 'resident_id': RESIDENT_ID, 'med_name': f"Med {i}",
+         'dosage': '5 mg', 'frequency': 'Dos veces al día'}
+        for i in range(8)
+    ])
+    start = datetime(2024, 1, 1)
+    stub.seed('vital_signs', [
+        {'id': str(uuid.uuid4()), 'resident_id': RESIDENT_ID, 'type': 'Temperatura', 'unit': '°C',
+         'value': 36.5, 'taken_at': (start + timedelta(hours=i)).isoformat()}
+        for i in range(500)
+    ])
+
+async def load_profile(client, etags: dict, conditional: bool):
+    transferred = 0
+    start = time.perf_counter()
+    for path in PROFILE_PATHS:
+        headers = {'If-None-Match': etags[path]} if conditional and path in etags else {}
+        response = await client.get(path, headers=headers)
+        if response.status_code == 200 and 'etag' in response.headers:
+            etags[path] = response.headers['etag']
+        transferred += len(response.content)
+    return transferred, (time.perf_counter() - start) * 1000
+
+async def main():
+    stub = StubSupabase(latency=LATENCY)
+    seed(stub)
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        from main import app
+        import supabase_client
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            etags = {}
+            await load_profile(client, etags, conditional=False)
+            results = {}
+            for conditional in (False, True):
+                loads = [await load_profile(client, etags, conditional) for _ in range(LOADS)]
+                latencies = sorted(latency for _, latency in loads)
+                results[conditional] = (loads[0][0], latencies[len(latencies) // 2])
+        await supabase_client.close()
+
+    (full_bytes, full_ms), (cond_bytes, cond_ms) = results[False], results[True]
+    print(f"perfil = {len(PROFILE_PATHS)} peticiones, {LOADS} cargas")
+    print(f"sin ETag:           {full_bytes:8d} bytes/carga  mediana {full_ms:6.1f} ms")
+    print(f"con If-None-Match:  {cond_bytes:8d} bytes/carga  mediana {cond_ms:6.1f} ms")
+    print(f"ahorro: {100 * (1 - cond_bytes / full_bytes):.0f}% bytes, {100 * (1 - cond_ms / full_ms):.0f}% latencia")
+
+if __name__ == '__main__':
+    asyncio.run(main())
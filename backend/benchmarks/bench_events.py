@@ -0,0 +1,113 @@
+"""Fan-out del stream SSE: conexiones ociosas por worker y latencia de entrega.
+
+Levanta el backend con uvicorn en un proceso aparte (un worker), abre
+CONNECTIONS streams a /api/events, mide la memoria del worker con ellos
+ociosos y luego cuánto tarda cada POST /api/vital-signs/ en llegar a todas
+las conexiones.
+
+Uso (desde backend/): python benchmarks/bench_events.py
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+CONNECTIONS = 200
+EVENTS = 50
+STUB_PORT = 54327
+APP_PORT = 54328
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def listen(client, received: dict, ready: asyncio.Event, connected: list):
+    async with client.stream('GET', '/api/events?topics=vital_sign') as response:
+        assert response.status_code == 200, response.status_code
+        connected.append(1)
+        if len(connected) == CONNECTIONS:
+            ready.set()
+        event_id = None
+        async for line in response.aiter_lines():
+            if line.startswith('id: '):
+                event_id = int(line[4:])
+            elif line.startswith('data: ') and event_id is not None:
+                received.setdefault(event_id, []).append(time.perf_counter())
+
+async def wait_ready(base_url: str):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(200):
+            try:
+                await client.get('/ping')
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError("el backend no arrancó")
+
+async def main():
+    stub = StubSupabase()
+    with serve(stub, STUB_PORT) as stub_url:
+        env = {**os.environ, 'SUPABASE_URL': stub_url, 'SUPABASE_SERVICE_ROLE_KEY': 'bench', 'LOG_LEVEL': 'WARNING'}
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(APP_PORT), '--log-level', 'warning'],
+            cwd=BACKEND_DIR, env=env
+        )
+        base_url = f"http://127.0.0.1:{APP_PORT}"
+        try:
+            await wait_ready(base_url)
+            idle_rss = rss_mb(server.pid)
+
+            received, ready, connected = {}, asyncio.Event(), []
+            limits = httpx.Limits(max_connections=CONNECTIONS + 10)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as streams:
+                listeners = [asyncio.create_task(listen(streams, received, ready, connected)) for _ in range(CONNECTIONS)]
+                await asyncio.wait_for(ready.wait(), timeout=30)
+                await asyncio.sleep(1)
+                connected_rss = rss_mb(server.pid)
+
+                latencies = []
+                async with httpx.AsyncClient(base_url=base_url) as writer:
+                    for i in range(EVENTS):
+                        sent = time.perf_counter()
+                        response = await writer.post('/api/vital-signs/', json={
+                            'resident_id': 'bench-resident', 'type': 'Temperatura', 'value': 36.5,
+                            'taken_at': f"2024-01-01T10:{i:02d}:00"
+                        })
+                        assert response.status_code == 200, response.text
+                        # Esperar a que el evento llegue a todas las conexiones
+                        while True:
+                            deliveries = [times for times in received.values() if len(times) == CONNECTIONS]
+                            if len(deliveries) > i:
+                                break
+                            await asyncio.sleep(0.001)
+                        last_event = max(received, key=lambda event_id: event_id if len(received[event_id]) == CONNECTIONS else -1)
+                        latencies.append((max(received[last_event]) - sent) * 1000)
+                for listener in listeners:
+                    listener.cancel()
+                await asyncio.gather(*listeners, return_exceptions=True)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{CONNECTIONS} conexiones SSE ociosas: RSS del worker {idle_rss:.0f} MB -> {connected_rss:.0f} MB "
+          f"({(connected_rss - idle_rss) * 1024 / CONNECTIONS:.0f} KB por conexión)")
+    print(f"{EVENTS} POST /vital-signs/ entregados a las {CONNECTIONS} conexiones: "
+          f"p50 {percentile(latencies, 0.5):.1f} ms  p95 {percentile(latencies, 0.95):.1f} ms (incluye el insert)")
+
+if __name__ == '__main__':
+    asyncio.run(main())
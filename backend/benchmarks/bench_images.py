@@ -0,0 +1,57 @@
+"""Throughput de normalización de fotos (variantes + EXIF + orientación).
+
+Genera un lote de fotos sintéticas tipo cámara de celular y mide imágenes/s
+procesando en el event loop (serial) y a través del pool de procesos.
+
+Uso (desde backend/): python benchmarks/bench_images.py
+"""
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import image_processing
+
+BATCH = 12
+SIZE = (3000, 2000)
+
+def sample_images(count: int = BATCH) -> list:
+    """JPEGs con ruido (no comprimen trivialmente) y orientación EXIF = 6"""
+    images = []
+    for i in range(count):
+        img = Image.effect_noise(SIZE, 40 + i).convert('RGB')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=90, exif=exif)
+        images.append(buffer.getvalue())
+    return images
+
+async def main():
+    images = sample_images()
+    total_mb = sum(len(data) for data in images) / 1024 / 1024
+
+    start = time.perf_counter()
+    for data in images:
+        image_processing.normalize_image(data)
+    serial = BATCH / (time.perf_counter() - start)
+
+    # Calentar el pool para no medir el arranque de los procesos
+    await image_processing.process_image(images[0])
+    start = time.perf_counter()
+    await asyncio.gather(*(image_processing.process_image(data) for data in images))
+    pooled = BATCH / (time.perf_counter() - start)
+    image_processing.shutdown()
+
+    print(f"{BATCH} fotos {SIZE[0]}x{SIZE[1]} ({total_mb:.1f} MB), formato {image_processing.output_format()[0]}, "
+          f"{image_processing.IMAGE_WORKERS} workers")
+    print(f"serial:          {serial:6.2f} img/s")
+    print(f"pool de procesos:{pooled:6.2f} img/s")
+
+if __name__ == '__main__':
+    asyncio.run(main())
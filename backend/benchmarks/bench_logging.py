@@ -0,0 +1,104 @@
+"""Costo de logging por petición: antes (f-strings con el payload a INFO) y después
+(JSON estructurado, formato perezoso, muestreo y redacción).
+
+Reproduce los logs que escribía GET /residents/{id}/medical-info: el antes con
+basicConfig y los f-strings originales (incluida la línea INFO de httpx), el
+después con setup_logging() y la línea de acceso de LoggingMiddleware, con la
+petición muestreada y sin muestrear.
+
+Uso (desde backend/): python benchmarks/bench_logging.py
+"""
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging_config
+
+REQUESTS = 20_000
+RESIDENT_ID = 'bench-resident'
+
+RESIDENT = {
+    'id': RESIDENT_ID, 'name': 'Residente de prueba', 'status': 'independent',
+    'admission_date': '2022-03-01', 'birth_date': '1941-07-15', 'document_number': '12345678',
+    'pathologies': ['Hipertensión', 'Diabetes tipo 2'], 'allergies': ['Penicilina'],
+    'medical_history': 'Antecedentes ' * 150, 'blood_type': 'O+',
+}
+
+class CountingStream(io.TextIOBase):
+    """Descarta lo escrito y cuenta los bytes"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode())
+        return len(text)
+
+def reset_root(handler):
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.NOTSET)
+
+def before(logger, httpx_logger):
+    logger.info(f"Fetching medical info for resident: {RESIDENT_ID}")
+    httpx_logger.info(f"HTTP Request: GET https://x.supabase.co/rest/v1/residents?select=%2A&id=eq.{RESIDENT_ID} \"HTTP/1.1 200 OK\"")
+    logger.info(f"Found resident data: {RESIDENT}")
+    result = {**RESIDENT, 'age': 83}
+    logger.info(f"Returning medical info: {result}")
+
+def after(logger, access_logger):
+    logger.debug("Fetching medical info for resident: %s", RESIDENT_ID)
+    # Igual que LoggingMiddleware: sin muestrear no se crea el registro de acceso
+    if logging_config._sampled.get() and access_logger.isEnabledFor(logging.INFO):
+        access_logger.info("request", extra={"status": 200, "duration_ms": 12.34})
+
+def run(label, setup, fn, sampled=True):
+    stream = CountingStream()
+    setup(stream)
+    token = logging_config._sampled.set(sampled)
+    context = logging_config._request_context.set({"method": "GET", "path": f"/api/residents/{RESIDENT_ID}/medical-info"})
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        fn()
+    elapsed = time.perf_counter() - start
+    logging_config._request_context.reset(context)
+    logging_config._sampled.reset(token)
+    print(f"  {label:34s} {elapsed / REQUESTS * 1e6:7.1f} µs/petición  {stream.bytes / REQUESTS:7.0f} bytes/petición")
+    return elapsed
+
+def main():
+    logger = logging.getLogger("routers.residents")
+    httpx_logger = logging.getLogger("httpx")
+    access_logger = logging_config.access_logger
+
+    def setup_before(stream):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        reset_root(handler)
+
+    def setup_after(stream):
+        logging_config.setup_logging(level="INFO", fmt="json", stream=stream)
+
+    print(f"{REQUESTS} peticiones de medical-info")
+    base = run("antes (f-strings a INFO)", setup_before, lambda: before(logger, httpx_logger))
+    sampled = run("después, petición muestreada", setup_after, lambda: after(logger, access_logger))
+    dropped = run("después, petición no muestreada", setup_after, lambda: after(logger, access_logger), sampled=False)
+    rate = 0.1
+    mixed = rate * sampled + (1 - rate) * dropped
+    print(f"  después con LOG_SAMPLE_RATE={rate}: {mixed / REQUESTS * 1e6:.1f} µs/petición (x{base / mixed:.1f} menos)")
+
+    # La redacción deja fuera los campos médicos aunque se pase el payload completo
+    stream = io.StringIO()
+    logging_config.setup_logging(level="DEBUG", fmt="json", stream=stream)
+    logger.debug("Updating resident %s", RESIDENT_ID, extra={"data": RESIDENT})
+    print("ejemplo redactado:", stream.getvalue().strip())
+
+if __name__ == '__main__':
+    main()
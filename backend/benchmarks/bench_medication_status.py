@@ -0,0 +1,106 @@
+"""today-status con 30 medicaciones x 2.000 registros de historial del día.
+
+Mide el agrupamiento en memoria (escaneo por medicación + sort anterior vs una
+sola pasada) y la latencia del endpoint contra el stub, donde las dos
+consultas ahora viajan en paralelo.
+
+Uso (desde backend/): python benchmarks/bench_medication_status.py
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+MEDICATIONS = 30
+HISTORY = 2000
+LATENCY = 0.02
+PORT = 54323
+RESIDENT_ID = 'bench-resident'
+
+def sample_data():
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    medications = [
+        {
+            'id': str(uuid.uuid4()), 'resident_id': RESIDENT_ID, 'med_name': f"Med {i}",
+            'dosage': '10 mg', 'frequency': 'Tres veces al día', 'scheduled_time': None, 'notes': None,
+        }
+        for i in range(MEDICATIONS)
+    ]
+    history = [
+        {
+            'id': str(uuid.uuid4()), 'medication_id': medications[i % MEDICATIONS]['id'],
+            'resident_id': RESIDENT_ID, 'med_name': 'Med', 'dosage': '10 mg',
+            'administered_at': (today + timedelta(seconds=i * 40)).isoformat(),
+            'administered_by_user_id': 'bench',
+        }
+        for i in range(HISTORY)
+    ]
+    return medications, history
+
+def previous_status(medications, history, expected):
+    """Algoritmo anterior: filtra el historial completo por cada medicación y ordena"""
+    result = []
+    for medication in medications:
+        today_count = len([h for h in history if h['medication_id'] == medication['id']])
+        matching = [h for h in history if h['medication_id'] == medication['id']]
+        matching.sort(key=lambda x: x['administered_at'], reverse=True)
+        result.append({
+            **medication,
+            'administered_today': today_count,
+            'expected_today': expected(medication['frequency']),
+            'last_administered': matching[0]['administered_at'] if matching else None,
+        })
+    return result
+
+def timeit(fn, repeat: int = 50) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+async def main():
+    medications, history = sample_data()
+    stub = StubSupabase(latency=LATENCY)
+    stub.seed('medications', medications)
+    stub.seed('medication_history', history)
+
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        from main import app
+        from routers.medications import build_medication_status, summarize_history
+        from dose_schedule import parse_frequency
+        import supabase_client
+
+        expected = lambda frequency: parse_frequency(frequency)['max_per_day']
+        before_ms = timeit(lambda: previous_status(medications, history, expected))
+        after_ms = timeit(lambda: build_medication_status(medications, summarize_history(history)))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            await client.get(f"/api/medications/today-status/{RESIDENT_ID}")
+            samples = []
+            for _ in range(20):
+                start = time.perf_counter()
+                response = await client.get(f"/api/medications/today-status/{RESIDENT_ID}")
+                response.raise_for_status()
+                samples.append((time.perf_counter() - start) * 1000)
+        await supabase_client.close()
+
+    samples.sort()
+    print(f"{MEDICATIONS} medicaciones x {HISTORY} administraciones")
+    print(f"agrupamiento anterior: {before_ms:8.2f} ms")
+    print(f"una sola pasada:       {after_ms:8.2f} ms  (x{before_ms / after_ms:.0f})")
+    print(f"endpoint (latencia simulada {LATENCY * 1000:.0f} ms por consulta): "
+          f"mediana {samples[len(samples) // 2]:.1f} ms")
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Barrido de dosis omitidas para una residencia de 200 residentes.
+
+Siembra en el stub 200 residentes x 5 medicaciones con sus franjas de ayer y
+hoy y un historial donde ~90 % de las dosis se dieron (algunas tarde). Mide:
+
+1. El barrido completo contra el stub (consultas masivas + clasificación +
+   escritura de los estados que cambiaron) y un segundo barrido sin cambios.
+2. Solo la clasificación en memoria, para ver que crece lineal con el volumen.
+3. Que con dos schedulers (dos workers) solo uno toma el lease.
+
+Contra el stub, el tiempo del barrido lo domina el filtrado en Python del
+propio stub (corre en otro hilo del mismo proceso); lo que hace el backend
+es la clasificación del punto 2.
+
+Uso (desde backend/): python benchmarks/bench_missed_doses.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+RESIDENTS = 200
+MEDICATIONS_PER_RESIDENT = 5
+FREQUENCIES = ['una vez al día', 'dos veces al día', 'tres veces al día', 'cada 8 horas', 'cada 12 horas']
+LATENCY = 0.02
+PORT = 54329
+
+def sample_data(residents: int, now: datetime):
+    from dose_schedule import parse_frequency, slots_for_range
+    random.seed(7)
+    medications = []
+    for r in range(residents):
+        for m in range(MEDICATIONS_PER_RESIDENT):
+            frequency = random.choice(FREQUENCIES)
+            medications.append({
+                'id': str(uuid.uuid4()), 'resident_id': f"resident-{r}", 'med_name': f"Med {m}",
+                'dosage': '10 mg', 'frequency': frequency, 'scheduled_time': None,
+                'schedule': parse_frequency(frequency)
+            })
+    slots = slots_for_range(medications, now.date() - timedelta(days=1), 2)
+    history = []
+    for slot in slots:
+        scheduled_at = datetime.fromisoformat(slot['scheduled_at'])
+        if scheduled_at > now or random.random() > 0.9:
+            continue
+        given_at = scheduled_at + timedelta(minutes=random.choice([-20, -5, 0, 10, 25, 45, 90]))
+        if given_at > now:
+            continue
+        history.append({
+            'id': str(uuid.uuid4()), 'medication_id': slot['medication_id'], 'resident_id': slot['resident_id'],
+            'administered_at': given_at.isoformat(), 'administered_by_user_id': 'bench'
+        })
+    return medications, slots, history
+
+def classify_all(slots, history, now):
+    from missed_doses import classify
+    by_medication, administrations = {}, {}
+    for slot in slots:
+        by_medication.setdefault(slot['medication_id'], []).append(slot)
+    for record in sorted(history, key=lambda record: record['administered_at']):
+        administrations.setdefault(record['medication_id'], []).append(datetime.fromisoformat(record['administered_at']))
+    for medication_id, medication_slots in by_medication.items():
+        classify(medication_slots, administrations.get(medication_id, []), now)
+
+async def main():
+    now = datetime.combine(date.today(), datetime.min.time()) + timedelta(hours=15)
+    medications, slots, history = sample_data(RESIDENTS, now)
+    stub = StubSupabase(latency=LATENCY)
+    stub.seed('medications', medications)
+    stub.seed('medication_dose_slots', [dict(slot) for slot in slots])
+    stub.seed('medication_history', history)
+
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        import main  # noqa: F401  (configura logging)
+        import missed_doses
+        import supabase_client
+        from scheduler import Scheduler
+
+        for label in ("primer barrido", "sin cambios"):
+            requests_before = stub.requests
+            start = time.perf_counter()
+            result = await missed_doses.sweep(now)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{label:15s}: {elapsed:7.1f} ms, {stub.requests - requests_before} consultas "
+                  f"(latencia simulada {LATENCY * 1000:.0f} ms), {result['slots']} franjas, "
+                  f"{result['administrations']} administraciones, {result['late']} atrasadas, "
+                  f"{result['missed']} omitidas, {result['updated']} franjas escritas")
+
+        workers = [Scheduler(), Scheduler()]
+        leaders = [await worker.acquire() for worker in workers]
+        leaders += [await worker.acquire() for worker in workers]
+        print(f"lease con dos workers: {leaders[:2]} -> renovación {leaders[2:]}")
+        await supabase_client.close()
+
+    for residents in (200, 400, 800):
+        _, scaled_slots, scaled_history = sample_data(residents, now)
+        start = time.perf_counter()
+        for _ in range(10):
+            classify_all(scaled_slots, scaled_history, now)
+        elapsed = (time.perf_counter() - start) / 10 * 1000
+        print(f"clasificación en memoria, {residents:4d} residentes ({len(scaled_slots)} franjas, "
+              f"{len(scaled_history)} administraciones): {elapsed:6.1f} ms")
+
+if __name__ == '__main__':
+    asyncio.run(main())
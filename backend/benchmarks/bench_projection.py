@@ -0,0 +1,136 @@
+"""Listas con proyección liviana (por defecto) vs filas completas (fields=*).
+
+Siembra en el stub 2.000 residentes con historia clínica, patologías y
+alergias, 2.000 signos vitales y las medicaciones y contactos de un residente
+(con columnas de auditoría y el horario interpretado). Para cada lista mide el
+tamaño de la respuesta sin comprimir y con gzip y la latencia de la petición.
+
+Uso (desde backend/): python benchmarks/bench_projection.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+RESIDENTS = 2000
+VITAL_SIGNS = 2000
+REPEAT = 30
+LATENCY = 0.0
+PORT = 54332
+
+PATHOLOGIES = ['Hipertensión arterial', 'Diabetes mellitus tipo 2', 'Enfermedad de Alzheimer', 'EPOC',
+               'Artrosis de rodilla', 'Insuficiencia cardíaca congestiva']
+ALLERGIES = ['Penicilina', 'Ibuprofeno', 'Látex', 'Mariscos', 'Sulfas']
+HISTORY = ("Ingresa remitido por su familia tras caída en domicilio. Antecedente de fractura de cadera "
+           "operada, control de tensión arterial irregular y deterioro cognitivo leve. ")
+
+def sample_data():
+    random.seed(5)
+    stamp = datetime(2024, 1, 1).isoformat()
+    residents = [
+        {
+            'id': str(uuid.uuid4()), 'name': f"Residente {i:05d}", 'status': random.choice(['independent', 'semidependent']),
+            'photo_url': f"https://storage.example/residents/{i}.webp", 'admission_date': '2023-01-01', 'discharge_date': None,
+            'emergency_contact_name': 'Familiar', 'emergency_contact_phone': '3001234567',
+            'document_number': str(10_000_000 + i), 'birth_date': '1940-05-17', 'blood_type': 'O+',
+            'pathologies': random.sample(PATHOLOGIES, 3), 'allergies': random.sample(ALLERGIES, 2),
+            'medical_history': HISTORY * random.randint(3, 8), 'created_at': stamp, 'updated_at': stamp
+        }
+        for i in range(RESIDENTS)
+    ]
+    resident_id = residents[0]['id']
+    start = datetime(2024, 1, 1)
+    vital_signs = [
+        {
+            'id': str(uuid.uuid4()), 'resident_id': resident_id, 'type': 'Temperatura', 'value': 36.5, 'unit': '°C',
+            'systolic': None, 'diastolic': None, 'taken_at': (start + timedelta(hours=i)).isoformat(), 'notes': None,
+            'taken_by': 'enfermera-1', 'created_at': stamp, 'updated_at': stamp, 'synced_at': stamp
+        }
+        for i in range(VITAL_SIGNS)
+    ]
+    medications = [
+        {
+            'id': str(uuid.uuid4()), 'resident_id': resident_id, 'med_name': f"Medicamento {i}", 'dosage': '10 mg',
+            'frequency': 'cada 8 horas', 'scheduled_time': '08:00:00', 'notes': None, 'administered_at': None,
+            'administered_by_user_id': None, 'created_at': stamp, 'updated_at': stamp,
+            'schedule': {'kind': 'interval', 'times': ['08:00', '16:00', '00:00'], 'interval_hours': 8, 'max_per_day': 3}
+        }
+        for i in range(12)
+    ]
+    contacts = [
+        {
+            'id': str(uuid.uuid4()), 'resident_id': resident_id, 'name': f"Contacto {i}", 'relationship': 'Hijo/a',
+            'phone': '3001234567', 'is_primary': i == 0, 'address': 'Calle 10 # 20-30', 'notes': None,
+            'created_at': stamp, 'updated_at': stamp
+        }
+        for i in range(4)
+    ]
+    return residents, vital_signs, medications, contacts
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def measure(client, path, params):
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        response = await client.get(path, params=params, headers={'Accept-Encoding': 'identity'})
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    compressed = await client.get(path, params=params, headers={'Accept-Encoding': 'gzip'})
+    return len(response.content), int(compressed.headers.get('content-length', len(compressed.content))), samples
+
+async def main():
+    residents, vital_signs, medications, contacts = sample_data()
+    stub = StubSupabase(latency=LATENCY)
+    stub.seed('residents', residents)
+    stub.seed('vital_signs', vital_signs)
+    stub.seed('medications', medications)
+    stub.seed('family_contacts', contacts)
+    resident_id = residents[0]['id']
+
+    endpoints = {
+        'residentes (500)': ('/api/residents/', {'limit': 500}),
+        'signos vitales (500)': (f"/api/vital-signs/resident/{resident_id}", {'limit': 500}),
+        'medicaciones': (f"/api/medications/resident/{resident_id}", {}),
+        'contactos': (f"/api/family-contacts/resident/{resident_id}", {}),
+    }
+
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        os.environ.setdefault('LOG_LEVEL', 'ERROR')
+        from main import app
+        from routers.residents import resident_cache
+        import supabase_client
+
+        # Sin caché: se mide la consulta, no el acierto
+        resident_cache.ttl = 0
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for label, (path, params) in endpoints.items():
+                full_size, full_gzip, full = await measure(client, path, {**params, 'fields': '*'})
+                lean_size, lean_gzip, lean = await measure(client, path, params)
+                print(f"{label}:")
+                print(f"  fields=*  : {full_size / 1024:8.1f} KB ({full_gzip / 1024:6.1f} KB gzip)  "
+                      f"p50 {percentile(full, 0.5):6.2f} ms  p95 {percentile(full, 0.95):6.2f} ms")
+                print(f"  liviana   : {lean_size / 1024:8.1f} KB ({lean_gzip / 1024:6.1f} KB gzip)  "
+                      f"p50 {percentile(lean, 0.5):6.2f} ms  p95 {percentile(lean, 0.95):6.2f} ms  "
+                      f"({100 * (1 - lean_size / full_size):.0f} % menos bytes)")
+            response = await client.get('/api/residents/', params={'fields': 'id,name,photo_url', 'limit': 500},
+                                        headers={'Accept-Encoding': 'identity'})
+            print(f"residentes con fields=id,name,photo_url: {len(response.content) / 1024:.1f} KB")
+        await supabase_client.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Búsqueda de residentes con 10.000 filas: índice en memoria vs bajar todo y filtrar.
+
+1. Carga del índice desde el stub (una vez por worker y cada RESIDENT_INDEX_TTL).
+2. Latencia de GET /api/residents/search para búsquedas típicas: nombre con
+   error de tipeo y sin tildes, documento, filtros sin texto.
+3. Lo que hacía ResidentList.vue: recorrer GET /api/residents/ completo y
+   filtrar en el navegador (se mide la descarga de todas las páginas).
+
+Uso (desde backend/): python benchmarks/bench_resident_search.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+RESIDENTS = 10_000
+REPEAT = 200
+LATENCY = 0.0
+PORT = 54331
+
+FIRST = ['José', 'María', 'Ana', 'Luis', 'Carmen', 'Jorge', 'Lucía', 'Andrés', 'Inés', 'Ramón', 'Sofía', 'Héctor',
+         'Beatriz', 'Carlos', 'Dolores', 'Esteban', 'Fabiola', 'Gustavo', 'Hilda', 'Iván', 'Julia', 'Manuel', 'Nubia',
+         'Óscar', 'Pilar', 'Rafael', 'Teresa', 'Víctor', 'Yolanda', 'Álvaro']
+LAST = ['González', 'Rodríguez', 'Pérez', 'Martínez', 'Gómez', 'Díaz', 'Hernández', 'Muñoz', 'Álvarez', 'Ramírez',
+        'Castaño', 'Peña', 'Acevedo', 'Betancur', 'Cárdenas', 'Duque', 'Escobar', 'Franco', 'Giraldo', 'Henao',
+        'Jaramillo', 'López', 'Mejía', 'Ospina', 'Quintero', 'Restrepo', 'Salazar', 'Toro', 'Uribe', 'Zapata']
+PATHOLOGIES = ['Hipertensión', 'Diabetes tipo 2', 'Alzheimer', 'EPOC', 'Artrosis', 'Insuficiencia cardíaca']
+ALLERGIES = ['Penicilina', 'Ibuprofeno', 'Látex', 'Mariscos']
+BLOOD_TYPES = ['O+', 'O-', 'A+', 'A-', 'B+', 'AB+']
+
+def sample_residents():
+    random.seed(11)
+    return [
+        {
+            'id': str(uuid.uuid4()),
+            'name': f"{random.choice(FIRST)} {random.choice(FIRST)} {random.choice(LAST)} {random.choice(LAST)}",
+            'status': random.choice(['independent', 'semidependent']),
+            'admission_date': '2023-01-01',
+            'document_number': str(10_000_000 + i),
+            'blood_type': random.choice(BLOOD_TYPES),
+            'pathologies': random.sample(PATHOLOGIES, random.randint(0, 3)),
+            'allergies': random.sample(ALLERGIES, random.randint(0, 1)),
+            'medical_history': 'Antecedentes ' * 40,
+            'photo_url': None,
+            'discharge_date': None,
+        }
+        for i in range(RESIDENTS)
+    ]
+
+QUERIES = {
+    'nombre con error': '?q=gonzales perez',
+    'nombre sin tildes': '?q=ramon munoz',
+    'documento': '?q=10.004.321',
+    'filtros': '?pathologies=Diabetes%20tipo%202&allergies=penicilina&blood_type=O%2B',
+    'nombre + filtro': '?q=lucia&status=independent',
+}
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def main():
+    stub = StubSupabase(latency=LATENCY)
+    stub.seed('residents', sample_residents())
+
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        os.environ.setdefault('LOG_LEVEL', 'ERROR')
+        from main import app
+        from resident_search import search_index
+        import supabase_client
+
+        start = time.perf_counter()
+        await search_index.reload()
+        print(f"carga del índice ({RESIDENTS} residentes, {search_index.stats()['trigrams']} trigramas): "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for label, params in QUERIES.items():
+                samples = []
+                for _ in range(REPEAT):
+                    start = time.perf_counter()
+                    response = await client.get(f"/api/residents/search{params}&limit=20")
+                    samples.append((time.perf_counter() - start) * 1000)
+                    assert response.status_code == 200, response.text
+                body = response.json()
+                first = body['results'][0]['name'] if body['results'] else '-'
+                print(f"  {label:18s}: p50 {percentile(samples, 0.5):5.2f} ms  p95 {percentile(samples, 0.95):5.2f} ms  "
+                      f"{body['total']:5d} resultados, primero: {first}")
+
+            start = time.perf_counter()
+            downloaded, cursor = 0, None
+            while True:
+                response = await client.get('/api/residents/', params={'limit': 500, **({'cursor': cursor} if cursor else {})},
+                                            headers={'Accept-Encoding': 'identity'})
+                downloaded += len(response.content)
+                cursor = response.headers.get('x-next-cursor')
+                if not cursor:
+                    break
+            print(f"listado completo para filtrar en el navegador: {(time.perf_counter() - start) * 1000:.0f} ms, "
+                  f"{downloaded / 1024 / 1024:.1f} MB")
+        await supabase_client.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
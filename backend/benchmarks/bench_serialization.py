@@ -0,0 +1,84 @@
+"""Tiempo de serialización de 10k filas de VitalSign y tamaño comprimido.
+
+Compara lo que hace FastAPI con response_model (validar cada fila con pydantic
+y luego codificar) contra devolver las filas de Supabase tal cual con json y
+con orjson (ORJSONResponse). Luego mide gzip y brotli sobre el JSON resultante.
+
+Uso (desde backend/): python benchmarks/bench_serialization.py
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from compression import _Compressor
+from routers.vital_signs import VitalSign
+from serialization import ORJSONResponse
+
+ROWS = 10_000
+REPEAT = 5
+
+def make_rows():
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(ROWS):
+        taken_at = (start + timedelta(minutes=15 * i)).isoformat()
+        row = {
+            'id': str(uuid.uuid4()), 'resident_id': f"resident-{i % 50}", 'type': 'Temperatura',
+            'value': 36.5, 'unit': '°C', 'systolic': None, 'diastolic': None,
+            'taken_at': taken_at, 'notes': None, 'taken_by': 'Enfermería',
+            'created_at': taken_at, 'updated_at': taken_at,
+        }
+        if i % 4 == 0:
+            row.update({'type': 'Presión Arterial', 'value': None, 'unit': 'mmHg', 'systolic': 120, 'diastolic': 80})
+        rows.append(row)
+    return rows
+
+def best_of(fn):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+def main():
+    rows = make_rows()
+    adapter = TypeAdapter(List[VitalSign])
+    response = ORJSONResponse(content=None)
+
+    strategies = {
+        # Camino clásico de response_model: modelos pydantic + jsonable_encoder + json
+        "response_model (jsonable_encoder)": lambda: json.dumps(
+            jsonable_encoder([VitalSign(**row) for row in rows])
+        ).encode(),
+        # Camino rápido de pydantic v2: validar y volcar en Rust
+        "response_model (pydantic dump_json)": lambda: adapter.dump_json(adapter.validate_python(rows)),
+        "raw + json.dumps": lambda: json.dumps(rows).encode(),
+        "raw + orjson (ORJSONResponse)": lambda: response.render(rows),
+    }
+
+    print(f"{ROWS} filas de VitalSign, mejor de {REPEAT}")
+    baseline = None
+    payload = None
+    for name, fn in strategies.items():
+        ms, body = best_of(fn)
+        baseline = baseline or ms
+        payload = body
+        print(f"  {name:38s} {ms:8.1f} ms  {len(body) / 1024:8.0f} KiB  x{baseline / ms:5.1f}")
+
+    print("compresión del JSON (orjson):")
+    for encoding in ('gzip', 'br'):
+        ms, body = best_of(lambda: _Compressor(encoding).compress(payload))
+        print(f"  {encoding:5s} {ms:8.1f} ms  {len(body) / 1024:8.0f} KiB  ({100 * (1 - len(body) / len(payload)):.0f}% menos)")
+
+if __name__ == '__main__':
+    main()
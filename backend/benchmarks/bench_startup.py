@@ -0,0 +1,66 @@
+"""Tiempo de arranque: import de main + primera respuesta de /ping y de /ready.
+
+Cada medición corre en un proceso nuevo para que el import sea en frío. Storage
+responde con una latencia alta a propósito: /ping no debe esperarla.
+
+Uso (desde backend/): python benchmarks/bench_startup.py
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+RUNS = 5
+STORAGE_LATENCY = 1.0
+PORT = 54322
+
+async def measure() -> dict:
+    start = time.perf_counter()
+    from main import app
+    imported = time.perf_counter()
+
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            await client.get('/ping')
+            first_response = time.perf_counter()
+            while (await client.get('/ready')).status_code != 200:
+                await asyncio.sleep(0.01)
+            ready = time.perf_counter()
+
+    return {
+        'import_ms': (imported - start) * 1000,
+        'first_response_ms': (first_response - start) * 1000,
+        'ready_ms': (ready - start) * 1000,
+    }
+
+def main():
+    from benchmarks.stub_supabase import StubSupabase, serve
+
+    stub = StubSupabase(latency=STORAGE_LATENCY)
+    results = []
+    with serve(stub, PORT) as base_url:
+        env = {**os.environ, 'SUPABASE_URL': base_url, 'SUPABASE_SERVICE_ROLE_KEY': 'bench'}
+        for _ in range(RUNS):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child'],
+                cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{RUNS} arranques en frío, latencia de Storage simulada {STORAGE_LATENCY * 1000:.0f} ms")
+    for key in ('import_ms', 'first_response_ms', 'ready_ms'):
+        values = sorted(result[key] for result in results)
+        print(f"{key:18} mediana {values[len(values) // 2]:8.1f}  min {values[0]:8.1f}  max {values[-1]:8.1f}")
+
+if __name__ == '__main__':
+    if '--child' in sys.argv:
+        print(json.dumps(asyncio.run(measure())))
+    else:
+        main()
@@ -0,0 +1,104 @@
+"""Turno de una tableta: sincronización en un round trip vs una petición por registro.
+
+Un turno típico en un pabellón de 25 residentes: 200 signos vitales y 100
+administraciones registradas sin conexión. Se compara subirlas con
+POST /api/sync contra reenviar cada una a su endpoint (POST /vital-signs/ y
+POST /medications/{id}/administer), con LATENCY de red simulada por consulta
+a Supabase.
+
+Uso (desde backend/): python benchmarks/bench_sync.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+RESIDENTS = 25
+VITALS = 200
+ADMINISTRATIONS = 100
+LATENCY = 0.02
+PORT = 54330
+
+def shift_changes(medications):
+    random.seed(3)
+    start = datetime.now(timezone.utc) - timedelta(hours=8)
+    changes = []
+    for i in range(VITALS):
+        taken_at = (start + timedelta(minutes=i * 2)).isoformat()
+        changes.append({
+            'table': 'vital_signs', 'id': str(uuid.uuid4()), 'updated_at': taken_at,
+            'data': {'resident_id': f"resident-{i % RESIDENTS}", 'type': 'Temperatura',
+                     'value': round(random.gauss(36.8, 0.4), 1), 'unit': '°C', 'taken_at': taken_at}
+        })
+    for i in range(ADMINISTRATIONS):
+        administered_at = (start + timedelta(minutes=i * 4)).isoformat()
+        changes.append({
+            'table': 'medication_history', 'id': str(uuid.uuid4()), 'updated_at': administered_at,
+            'data': {'medication_id': medications[i % len(medications)]['id'],
+                     'administered_by_user_id': 'enfermera-1', 'administered_at': administered_at}
+        })
+    return changes
+
+async def one_by_one(client, changes):
+    for change in changes:
+        if change['table'] == 'vital_signs':
+            response = await client.post('/api/vital-signs/', json=change['data'])
+        else:
+            response = await client.post(
+                f"/api/medications/{change['data']['medication_id']}/administer",
+                params={'user_id': change['data']['administered_by_user_id']}
+            )
+        assert response.status_code == 200, response.text
+
+async def main():
+    stub = StubSupabase(latency=LATENCY)
+    medications = [
+        {'id': str(uuid.uuid4()), 'resident_id': f"resident-{i}", 'med_name': f"Med {i}",
+         'dosage': '10 mg', 'frequency': 'dos veces al día'}
+        for i in range(RESIDENTS)
+    ]
+    stub.seed('medications', medications)
+
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        os.environ.setdefault('LOG_LEVEL', 'ERROR')
+        from main import app
+        import alerts
+        import supabase_client
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            changes = shift_changes(medications)
+            requests_before = stub.requests
+            start = time.perf_counter()
+            await one_by_one(client, changes)
+            separate_ms = (time.perf_counter() - start) * 1000
+            separate_queries = stub.requests - requests_before
+
+            changes = shift_changes(medications)
+            requests_before = stub.requests
+            start = time.perf_counter()
+            response = await client.post('/api/sync', json={'device_id': 'tablet-1', 'changes': changes})
+            sync_ms = (time.perf_counter() - start) * 1000
+            sync_queries = stub.requests - requests_before
+            assert response.status_code == 200, response.text
+            applied = sum(1 for result in response.json()['results'] if result['status'] == 'applied')
+        await alerts.engine.stop()
+        await supabase_client.close()
+
+    print(f"{len(changes)} cambios de un turno (latencia simulada {LATENCY * 1000:.0f} ms por consulta):")
+    print(f"  una petición por registro: {len(changes):4d} peticiones, {separate_queries:4d} consultas, {separate_ms:8.0f} ms")
+    print(f"  POST /api/sync:               1 petición,  {sync_queries:4d} consultas, {sync_ms:8.0f} ms ({applied} aplicados)")
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Throughput de ingesta masiva en POST /api/vital-signs/batch.
+
+Envía el mismo lote como array JSON, NDJSON y CSV contra el stub y reporta
+filas/s de punta a punta (parseo, validación con VitalSign e inserts en bloque).
+Objetivo: >= 10.000 filas/s.
+
+Uso (desde backend/): python benchmarks/bench_vital_ingest.py
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.stub_supabase import StubSupabase, serve
+
+ROWS = 50000
+LATENCY = 0.005
+PORT = 54324
+TARGET = 10000
+
+def sample_rows(count: int = ROWS) -> list:
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        taken_at = (start + timedelta(minutes=i)).isoformat()
+        if i % 3 == 0:
+            rows.append({'resident_id': f"r{i % 80}", 'type': 'Presión Arterial', 'unit': 'mmHg',
+                         'systolic': 120 + i % 20, 'diastolic': 80 + i % 10, 'taken_at': taken_at})
+        else:
+            rows.append({'resident_id': f"r{i % 80}", 'type': 'Temperatura', 'unit': '°C',
+                         'value': 36 + (i % 20) / 10, 'taken_at': taken_at})
+    return rows
+
+def encode(rows: list, content_type: str) -> bytes:
+    if content_type == 'application/json':
+        return json.dumps(rows).encode()
+    if content_type == 'application/x-ndjson':
+        return '\n'.join(json.dumps(row) for row in rows).encode()
+    columns = ['resident_id', 'type', 'value', 'unit', 'systolic', 'diastolic', 'taken_at']
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+async def main():
+    rows = sample_rows()
+    stub = StubSupabase(latency=LATENCY)
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        from main import app
+        import supabase_client
+
+        transport = httpx.ASGITransport(app=app)
+        print(f"{ROWS} filas por formato, latencia simulada {LATENCY * 1000:.0f} ms por insert")
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            for content_type in ('application/json', 'application/x-ndjson', 'text/csv'):
+                body = encode(rows, content_type)
+                start = time.perf_counter()
+                response = await client.post('/api/vital-signs/batch', content=body,
+                                             headers={'content-type': content_type})
+                elapsed = time.perf_counter() - start
+                result = response.json()
+                rate = result['inserted'] / elapsed
+                status = 'OK' if rate >= TARGET else 'por debajo del objetivo'
+                print(f"{content_type:22} {rate:10.0f} filas/s  insertadas {result['inserted']}  "
+                      f"errores {result['failed']}  [{status}]")
+        await supabase_client.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""Escalado del perfil multi-worker: GET /api/residents/ con 1, 2 y 4 workers de gunicorn.
+
+Levanta el stub de Supabase (2.000 residentes) y el stub de Redis en este
+proceso, arranca `gunicorn main:app -c gunicorn.conf.py` con WEB_CONCURRENCY
+workers y SHARED_STATE_URL apuntando al stub, y carga el listado desde
+LOAD_PROCESSES procesos con CLIENTS clientes concurrentes durante DURATION
+segundos. Las lecturas salen de la caché compartida, así el costo es CPU de
+los workers (ETag, serialización, compresión) y el escalado depende de los
+núcleos disponibles: con menos núcleos que workers no puede ser lineal.
+
+Uso (desde backend/): python benchmarks/bench_workers.py [workers ...]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from benchmarks.stub_redis import StubRedis, serve as serve_redis
+from benchmarks.stub_supabase import StubSupabase, serve
+
+RESIDENTS = 2000
+WORKER_COUNTS = [1, 2, 4]
+LOAD_PROCESSES = 2
+CLIENTS = 32
+DURATION = 10.0
+WARMUP = 2.0
+STUB_PORT = 54333
+REDIS_PORT = 56380
+APP_PORT = 54334
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def sample_residents():
+    return [
+        {
+            'id': str(uuid.uuid4()), 'name': f"Residente {i:05d}", 'status': 'independent', 'photo_url': None,
+            'admission_date': '2023-01-01', 'discharge_date': None, 'emergency_contact_name': 'Familiar',
+            'emergency_contact_phone': '3001234567', 'medical_history': 'Antecedentes ' * 40
+        }
+        for i in range(RESIDENTS)
+    ]
+
+async def drive(base_url: str, clients: int, duration: float) -> list:
+    """Cada cliente repite GET /api/residents/ hasta que vence el tiempo; devuelve latencias en ms"""
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def loop():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get('/api/residents/')
+                if response.status_code == 200:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(*(loop() for _ in range(clients)))
+    return latencies
+
+def run_load(args) -> list:
+    return asyncio.run(drive(*args))
+
+async def wait_ready(base_url: str):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(400):
+            try:
+                await client.get('/ping')
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError("el backend no arrancó")
+
+def measure(workers: int, env: dict, executor: ProcessPoolExecutor) -> dict:
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'main:app', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env={**env, 'WEB_CONCURRENCY': str(workers), 'PORT': str(APP_PORT)}
+    )
+    base_url = f"http://127.0.0.1:{APP_PORT}"
+    try:
+        asyncio.run(wait_ready(base_url))
+        list(executor.map(run_load, [(base_url, CLIENTS // LOAD_PROCESSES, WARMUP)] * LOAD_PROCESSES))
+        start = time.perf_counter()
+        results = list(executor.map(run_load, [(base_url, CLIENTS // LOAD_PROCESSES, DURATION)] * LOAD_PROCESSES))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    latencies = [latency for result in results for latency in result]
+    return {"rps": len(latencies) / elapsed, "p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95)}
+
+def main():
+    worker_counts = [int(arg) for arg in sys.argv[1:]] or WORKER_COUNTS
+    stub = StubSupabase()
+    stub.seed('residents', sample_residents())
+    redis = StubRedis()
+
+    with serve(stub, STUB_PORT) as stub_url, serve_redis(redis, REDIS_PORT) as redis_url:
+        env = {**os.environ, 'SUPABASE_URL': stub_url, 'SUPABASE_SERVICE_ROLE_KEY': 'bench',
+               'SHARED_STATE_URL': redis_url, 'LOG_LEVEL': 'WARNING'}
+        print(f"{os.cpu_count()} núcleos, {LOAD_PROCESSES} procesos de carga x {CLIENTS // LOAD_PROCESSES} clientes, "
+              f"{DURATION:.0f} s por medición")
+        baseline = None
+        with ProcessPoolExecutor(LOAD_PROCESSES) as executor:
+            for workers in worker_counts:
+                result = measure(workers, env, executor)
+                baseline = baseline or result["rps"] / workers
+                print(f"  {workers} worker(s): {result['rps']:7.0f} req/s  p50 {result['p50']:6.1f} ms  "
+                      f"p95 {result['p95']:6.1f} ms  eficiencia {result['rps'] / (baseline * workers) * 100:4.0f} %")
+        print(f"comandos al stub de Redis: {redis.commands}, consultas al stub de Supabase: {stub.requests}")
+
+if __name__ == '__main__':
+    main()
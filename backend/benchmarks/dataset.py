@@ -0,0 +1,141 @@
+"""Datos sintéticos con volúmenes de una residencia real para el stub de Supabase.
+
+Todo sale de un random.Random(seed): con los mismos parámetros se generan los
+mismos residentes, ids y valores (las fechas se anclan a `now`). Por residente:
+1 a 3 contactos, 2 a 6 medicaciones con su horario interpretado, el historial
+de administraciones de `years` años (~93 % de adherencia, con atrasos),
+`readings_per_day` signos vitales por día durante `years` años y las franjas de
+dosis de ayer a mañana.
+"""
+import random
+import sys
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dose_schedule import parse_frequency, slots_for_day, slots_for_range
+
+FIRST = ['José', 'María', 'Ana', 'Luis', 'Carmen', 'Jorge', 'Lucía', 'Andrés', 'Inés', 'Ramón', 'Sofía', 'Héctor',
+         'Beatriz', 'Carlos', 'Dolores', 'Esteban', 'Fabiola', 'Gustavo', 'Hilda', 'Iván', 'Julia', 'Manuel']
+LAST = ['González', 'Rodríguez', 'Pérez', 'Martínez', 'Gómez', 'Díaz', 'Hernández', 'Muñoz', 'Álvarez', 'Ramírez',
+        'Castaño', 'Peña', 'Acevedo', 'Betancur', 'Cárdenas', 'Duque', 'Escobar', 'Franco', 'Giraldo', 'Henao']
+PATHOLOGIES = ['Hipertensión arterial', 'Diabetes mellitus tipo 2', 'Enfermedad de Alzheimer', 'EPOC',
+               'Artrosis', 'Insuficiencia cardíaca', 'Parkinson', 'Hipotiroidismo']
+ALLERGIES = ['Penicilina', 'Ibuprofeno', 'Látex', 'Mariscos', 'Sulfas']
+BLOOD_TYPES = ['O+', 'O-', 'A+', 'A-', 'B+', 'AB+']
+RELATIONSHIPS = ['Hijo/a', 'Sobrino/a', 'Nieto/a', 'Hermano/a', 'Cónyuge']
+MEDICATIONS = [('Losartán', '50 mg'), ('Metformina', '850 mg'), ('Donepezilo', '10 mg'), ('Omeprazol', '20 mg'),
+               ('Levotiroxina', '75 mcg'), ('Atorvastatina', '20 mg'), ('Acetaminofén', '500 mg'), ('Furosemida', '40 mg')]
+FREQUENCIES = ['una vez al día', 'dos veces al día', 'tres veces al día', 'cada 8 horas', 'cada 12 horas']
+NURSES = ['enfermera-1', 'enfermera-2', 'enfermero-3', 'auxiliar-4']
+# Tomas del día; el tipo rota entre tomas para cubrir todos los signos
+READING_HOURS = [6, 10, 14, 18, 22, 2]
+VITAL_TYPES = ['Temperatura', 'Presión Arterial', 'Frecuencia Cardíaca', 'Saturación O2', 'Frecuencia Respiratoria']
+
+@dataclass
+class Dataset:
+    tables: dict = field(default_factory=dict)
+
+    @property
+    def residents(self) -> list:
+        return self.tables['residents']
+
+    def counts(self) -> dict:
+        return {name: len(rows) for name, rows in self.tables.items()}
+
+def vital_reading(rng: random.Random, vital_type: str) -> dict:
+    if vital_type == 'Presión Arterial':
+        return {'value': None, 'unit': 'mmHg', 'systolic': round(rng.gauss(128, 14)), 'diastolic': round(rng.gauss(78, 9))}
+    value, unit = {
+        'Temperatura': (round(rng.gauss(36.7, 0.35), 1), '°C'),
+        'Frecuencia Cardíaca': (round(rng.gauss(76, 10)), 'lpm'),
+        'Saturación O2': (min(100, round(rng.gauss(95, 2))), '%'),
+        'Frecuencia Respiratoria': (round(rng.gauss(17, 2)), 'rpm'),
+    }[vital_type]
+    return {'value': value, 'unit': unit, 'systolic': None, 'diastolic': None}
+
+def generate(residents: int = 50, years: float = 1.0, readings_per_day: int = 4, seed: int = 42,
+             now: datetime = None) -> Dataset:
+    rng = random.Random(seed)
+    now = (now or datetime.now()).replace(microsecond=0)
+    today = now.date()
+    days = max(1, int(years * 365))
+    new_id = lambda: str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    data = Dataset({'residents': [], 'family_contacts': [], 'medications': [], 'medication_history': [],
+                    'vital_signs': [], 'medication_dose_slots': []})
+
+    for r in range(residents):
+        admitted = today - timedelta(days=rng.randint(days, days + 2000))
+        resident = {
+            'id': new_id(), 'name': f"{rng.choice(FIRST)} {rng.choice(FIRST)} {rng.choice(LAST)} {rng.choice(LAST)}",
+            'status': rng.choice(['independent', 'semidependent']), 'photo_url': None,
+            'emergency_contact_name': f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+            'emergency_contact_phone': f"300{rng.randint(1000000, 9999999)}",
+            'admission_date': admitted.isoformat(), 'discharge_date': None,
+            'document_number': str(rng.randint(10_000_000, 99_999_999)),
+            'birth_date': date(rng.randint(1930, 1955), rng.randint(1, 12), rng.randint(1, 28)).isoformat(),
+            'pathologies': rng.sample(PATHOLOGIES, rng.randint(1, 4)), 'allergies': rng.sample(ALLERGIES, rng.randint(0, 2)),
+            'medical_history': "Antecedentes relevantes, controles periódicos y cambios de tratamiento. " * rng.randint(2, 10),
+            'blood_type': rng.choice(BLOOD_TYPES), 'created_at': admitted.isoformat(), 'updated_at': admitted.isoformat()
+        }
+        data.tables['residents'].append(resident)
+
+        for c in range(rng.randint(1, 3)):
+            data.tables['family_contacts'].append({
+                'id': new_id(), 'resident_id': resident['id'], 'name': f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+                'relationship': rng.choice(RELATIONSHIPS), 'phone': f"310{rng.randint(1000000, 9999999)}",
+                'is_primary': c == 0, 'address': f"Calle {rng.randint(1, 120)} # {rng.randint(1, 90)}-{rng.randint(1, 99)}",
+                'notes': None, 'created_at': admitted.isoformat(), 'updated_at': admitted.isoformat()
+            })
+
+        medications = []
+        for med_name, dosage in rng.sample(MEDICATIONS, rng.randint(2, 6)):
+            frequency = rng.choice(FREQUENCIES)
+            scheduled_time = '08:00:00' if frequency == 'una vez al día' else None
+            medications.append({
+                'id': new_id(), 'resident_id': resident['id'], 'med_name': med_name, 'dosage': dosage,
+                'frequency': frequency, 'scheduled_time': scheduled_time, 'notes': None,
+                'administered_at': None, 'administered_by_user_id': None,
+                'schedule': parse_frequency(frequency, scheduled_time)
+            })
+        data.tables['medications'].extend(medications)
+
+        # Historial: cada franja de los últimos `days` días, con tomas omitidas y atrasadas
+        for medication in medications:
+            for offset in range(days, -1, -1):
+                for slot in slots_for_day(medication, today - timedelta(days=offset)):
+                    given_at = datetime.fromisoformat(slot['scheduled_at']) + timedelta(minutes=round(rng.gauss(10, 20)))
+                    if given_at > now or rng.random() > 0.93:
+                        continue
+                    stamp = given_at.isoformat()
+                    data.tables['medication_history'].append({
+                        'id': new_id(), 'medication_id': medication['id'], 'resident_id': resident['id'],
+                        'med_name': medication['med_name'], 'dosage': medication['dosage'], 'administered_at': stamp,
+                        'administered_by_user_id': rng.choice(NURSES), 'notes': None,
+                        'updated_at': stamp, 'synced_at': stamp
+                    })
+
+        # Signos vitales: readings_per_day tomas diarias durante `days` días
+        for offset in range(days, -1, -1):
+            day = today - timedelta(days=offset)
+            for k, hour in enumerate(READING_HOURS[:readings_per_day]):
+                taken_at = datetime.combine(day, datetime.min.time()) + timedelta(hours=hour, minutes=rng.randint(0, 40))
+                if taken_at > now:
+                    continue
+                stamp = taken_at.isoformat()
+                vital_type = VITAL_TYPES[(offset + k) % len(VITAL_TYPES)]
+                data.tables['vital_signs'].append({
+                    'id': new_id(), 'resident_id': resident['id'], 'type': vital_type,
+                    **vital_reading(rng, vital_type), 'taken_at': stamp, 'notes': None,
+                    'taken_by': rng.choice(NURSES), 'created_at': stamp, 'updated_at': stamp, 'synced_at': stamp
+                })
+
+    data.tables['medication_dose_slots'] = slots_for_range(data.tables['medications'], today - timedelta(days=1), 3)
+    return data
+
+def seed(stub, dataset: Dataset):
+    for name, rows in dataset.tables.items():
+        stub.seed(name, rows)
@@ -0,0 +1,178 @@
+"""Servidor local que habla el protocolo de Redis (RESP2) con los comandos que usa shared_state.py.
+
+Sirve para probar el modo multi-worker sin instalar Redis: GET, SET (PX, NX),
+DEL, INCR/INCRBY, PEXPIRE, HGET, HSET, HDEL, PUBLISH y SUBSCRIBE, más PING,
+AUTH, SELECT y CLIENT (redis-py envía CLIENT SETINFO al conectar). Los datos
+viven en memoria de este proceso.
+
+Uso directo: python benchmarks/stub_redis.py [puerto]
+"""
+import asyncio
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+def _bulk(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+def _array(items) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(
+        b":%d\r\n" % item if isinstance(item, int) else _bulk(item) for item in items
+    )
+
+OK = b"+OK\r\n"
+
+class StubRedis:
+    def __init__(self):
+        self.values = {}       # clave -> bytes | int | dict
+        self.expires = {}      # clave -> time.monotonic() de vencimiento
+        self.channels = {}     # canal -> {writer}
+        self.connections = set()
+        self.commands = 0
+
+    def _alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires < time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values
+
+    def _expire(self, key, milliseconds):
+        self.expires[key] = time.monotonic() + int(milliseconds) / 1000
+
+    def execute(self, args, writer) -> bytes:
+        self.commands += 1
+        name = args[0].upper().decode()
+        if name in ('PING',):
+            return b"+PONG\r\n"
+        if name in ('AUTH', 'SELECT', 'CLIENT'):
+            return OK
+        if name == 'GET':
+            value = self.values.get(args[1]) if self._alive(args[1]) else None
+            return _bulk(str(value).encode() if isinstance(value, int) else value)
+        if name == 'SET':
+            key, value, options = args[1], args[2], [option.upper() for option in args[3:]]
+            if b'NX' in options and self._alive(key):
+                return _bulk(None)
+            self.values[key] = value
+            self.expires.pop(key, None)
+            if b'PX' in options:
+                self._expire(key, args[3 + options.index(b'PX') + 1])
+            return OK
+        if name == 'DEL':
+            removed = 0
+            for key in args[1:]:
+                if self._alive(key):
+                    removed += 1
+                self.values.pop(key, None)
+                self.expires.pop(key, None)
+            return b":%d\r\n" % removed
+        if name in ('INCR', 'INCRBY'):
+            step = int(args[2]) if name == 'INCRBY' else 1
+            value = int(self.values.get(args[1], 0) if self._alive(args[1]) else 0) + step
+            self.values[args[1]] = value
+            return b":%d\r\n" % value
+        if name == 'PEXPIRE':
+            if not self._alive(args[1]):
+                return b":0\r\n"
+            self._expire(args[1], args[2])
+            return b":1\r\n"
+        if name == 'HGET':
+            fields = self.values.get(args[1], {}) if self._alive(args[1]) else {}
+            return _bulk(fields.get(args[2]))
+        if name == 'HSET':
+            fields = self.values.get(args[1]) if self._alive(args[1]) else None
+            if fields is None:
+                fields = self.values[args[1]] = {}
+            added = 0
+            for i in range(2, len(args), 2):
+                added += args[i] not in fields
+                fields[args[i]] = args[i + 1]
+            return b":%d\r\n" % added
+        if name == 'HDEL':
+            fields = self.values.get(args[1], {}) if self._alive(args[1]) else {}
+            return b":%d\r\n" % sum(1 for field in args[2:] if fields.pop(field, None) is not None)
+        if name == 'PUBLISH':
+            message = _array([b'message', args[1], args[2]])
+            subscribers = self.channels.get(args[1], set())
+            for subscriber in list(subscribers):
+                subscriber.write(message)
+            return b":%d\r\n" % len(subscribers)
+        if name == 'SUBSCRIBE':
+            replies = []
+            for i, channel in enumerate(args[1:], start=1):
+                self.channels.setdefault(channel, set()).add(writer)
+                replies.append(_array([b'subscribe', channel, i]))
+            return b"".join(replies)
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+    async def read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def handle(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                args = await self.read_command(reader)
+                if not args:
+                    break
+                writer.write(self.execute(args, writer))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in self.channels.values():
+                subscribers.discard(writer)
+            self.connections.discard(writer)
+            writer.close()
+
+@contextmanager
+def serve(stub: StubRedis, port: int = 56379):
+    """Levanta el servidor en un hilo propio (con su propio event loop)"""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    stop = asyncio.Event()
+
+    async def run():
+        server = await asyncio.start_server(stub.handle, '127.0.0.1', port)
+        started.set()
+        await stop.wait()
+        server.close()
+        # Cerrar las conexiones abiertas y esperar a que sus tareas terminen antes de cerrar el loop
+        for writer in list(stub.connections):
+            writer.close()
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(run(),), daemon=True)
+    thread.start()
+    started.wait()
+    try:
+        yield f"redis://127.0.0.1:{port}/0"
+    finally:
+        loop.call_soon_threadsafe(stop.set)
+        thread.join(timeout=5)
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 56379
+    stub = StubRedis()
+
+    async def main():
+        server = await asyncio.start_server(stub.handle, '127.0.0.1', port)
+        print(f"stub de Redis en redis://127.0.0.1:{port}/0")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
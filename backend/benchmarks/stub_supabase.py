@@ -0,0 +1,358 @@
+"""Servidor local que imita las APIs de PostgREST y Storage de Supabase.
+
+Sirve para medir los routers sin tocar el proyecto real. Los datos viven en
+memoria y cada petición espera `latency` segundos para simular la red.
+"""
+import asyncio
+import bisect
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+def _parse_value(raw: str):
+    if raw == 'null':
+        return None
+    if raw in ('true', 'false'):
+        return raw == 'true'
+    return raw
+
+def _compare(value, raw: str):
+    """Convierte el literal del filtro al tipo del valor almacenado"""
+    if isinstance(value, bool):
+        return _parse_value(raw)
+    if isinstance(value, (int, float)):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return _parse_value(raw)
+
+def _split_in(raw: str):
+    inner = raw.strip()[1:-1]
+    return [item.strip().strip('"') for item in inner.split(',') if item.strip()]
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    op, _, raw = expression.partition('.')
+    value = row.get(column)
+    if op == 'is':
+        result = value is _parse_value(raw)
+    elif op == 'in':
+        result = value is not None and str(value) in _split_in(raw)
+    elif value is None:
+        result = False
+    else:
+        other = _compare(value, raw)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(other, float):
+            value = float(value)
+        else:
+            value, other = str(value), str(other)
+        result = {
+            'eq': value == other,
+            'neq': value != other,
+            'gt': value > other,
+            'gte': value >= other,
+            'lt': value < other,
+            'lte': value <= other,
+        }.get(op, False)
+    return not result if negate else result
+
+def _split_top(expression: str) -> list:
+    """Separa por comas de primer nivel, respetando paréntesis y comillas"""
+    parts, depth, quoted, current = [], 0, False, ''
+    i = 0
+    while i < len(expression):
+        char = expression[i]
+        if char == '\\' and quoted:
+            current += expression[i:i + 2]
+            i += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+            i += 1
+            continue
+        current += char
+        i += 1
+    if current:
+        parts.append(current)
+    return parts
+
+def _unquote(raw: str) -> str:
+    if len(raw) >= 2 and raw[0] == '"' and raw[-1] == '"':
+        return raw[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return raw
+
+def _matches_logic(row: dict, operator: str, expression: str) -> bool:
+    """Evalúa or=(...) / and=(...) con condiciones anidadas"""
+    results = []
+    for condition in _split_top(expression.strip()[1:-1]):
+        if condition.startswith(('and(', 'or(')):
+            nested, _, inner = condition.partition('(')
+            results.append(_matches_logic(row, nested, '(' + inner))
+            continue
+        column, _, rest = condition.partition('.')
+        op, _, raw = rest.partition('.')
+        results.append(_matches(row, column, f"{op}.{_unquote(raw)}"))
+    return any(results) if operator == 'or' else all(results)
+
+# Columnas con índice en el stub: igualdad (eq / in) y rango sobre fechas (gt, gte, lt, lte).
+# Con años de historial, recorrer la tabla entera en cada consulta dominaría las mediciones.
+EQ_INDEXED = ('id', 'resident_id', 'medication_id')
+RANGE_INDEXED = ('taken_at', 'administered_at', 'scheduled_at', 'synced_at')
+# Tablas con id BIGSERIAL en lugar de UUID
+SERIAL_TABLES = ('vital_sign_alerts',)
+# Tope de filas por respuesta, como db-max-rows de Supabase: una consulta sin
+# paginar que lo supere se corta sin error, igual que en producción
+MAX_ROWS = 1000
+
+class StubSupabase:
+    """Almacén en memoria con la semántica mínima de PostgREST usada por los routers"""
+
+    def __init__(self, latency: float = 0.0, max_rows: int = MAX_ROWS):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.tables = {}
+        self.indexes = {}      # tabla -> {columna: {valor: [filas]} | ([valores ordenados], [filas])}
+        self.sequences = {}    # tabla con id BIGSERIAL -> último id asignado
+        self.buckets = {'residents': {}}
+        self.requests = 0
+
+    def seed(self, table_name: str, rows: list):
+        self.tables.setdefault(table_name, []).extend(rows)
+        self.indexes.pop(table_name, None)
+
+    def _index(self, table_name: str, column: str):
+        """Índice de la columna, construido la primera vez que un filtro lo usa"""
+        indexes = self.indexes.setdefault(table_name, {})
+        if column not in indexes:
+            rows = self.tables.get(table_name, [])
+            if column in EQ_INDEXED:
+                index = {}
+                for row in rows:
+                    index.setdefault(str(row.get(column)), []).append(row)
+            else:
+                ordered = sorted((row for row in rows if row.get(column) is not None), key=lambda row: str(row[column]))
+                index = ([str(row[column]) for row in ordered], ordered)
+            indexes[column] = index
+        return indexes[column]
+
+    def _index_rows(self, table_name: str, rows: list):
+        """Agrega filas nuevas a los índices ya construidos"""
+        for column, index in self.indexes.get(table_name, {}).items():
+            for row in rows:
+                if column in EQ_INDEXED:
+                    index.setdefault(str(row.get(column)), []).append(row)
+                elif row.get(column) is not None:
+                    keys, ordered = index
+                    position = bisect.bisect_right(keys, str(row[column]))
+                    keys.insert(position, str(row[column]))
+                    ordered.insert(position, row)
+
+    def _candidates(self, table_name: str, rows: list, params) -> list:
+        """Filas que pueden cumplir los filtros según los índices (un superconjunto)"""
+        ranges = {}
+        for column, expression in params.multi_items():
+            op, _, raw = expression.partition('.')
+            if column in EQ_INDEXED and op in ('eq', 'in'):
+                index = self._index(table_name, column)
+                values = [str(_parse_value(raw))] if op == 'eq' else _split_in(raw)
+                return [row for value in dict.fromkeys(values) for row in index.get(value, ())]
+            if column in RANGE_INDEXED and op in ('gt', 'gte', 'lt', 'lte'):
+                ranges.setdefault(column, []).append((op, raw))
+        for column, bounds in ranges.items():
+            keys, ordered = self._index(table_name, column)
+            start, end = 0, len(keys)
+            for op, raw in bounds:
+                if op in ('gt', 'gte'):
+                    start = max(start, bisect.bisect_left(keys, raw))
+                else:
+                    end = min(end, bisect.bisect_right(keys, raw))
+            return ordered[start:end]
+        return rows
+
+    def _next_id(self, table_name: str):
+        if table_name not in SERIAL_TABLES:
+            return str(uuid.uuid4())
+        self.sequences[table_name] = self.sequences.get(table_name, 0) + 1
+        return self.sequences[table_name]
+
+    async def _delay(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _filter(self, rows: list, params, table_name: str = None) -> list:
+        if table_name is not None:
+            rows = self._candidates(table_name, rows, params)
+        reserved = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+        for column, expression in params.multi_items():
+            if column in reserved:
+                continue
+            if column in ('or', 'and'):
+                rows = [row for row in rows if _matches_logic(row, column, expression)]
+                continue
+            rows = [row for row in rows if _matches(row, column, expression)]
+        return rows
+
+    @staticmethod
+    def _order(rows: list, order: str) -> list:
+        for clause in reversed(order.split(',')):
+            parts = clause.split('.')
+            column = parts[0]
+            desc = 'desc' in parts[1:]
+            present = [row for row in rows if row.get(column) is not None]
+            missing = [row for row in rows if row.get(column) is None]
+            present.sort(key=lambda row: row[column], reverse=desc)
+            rows = present + missing
+        return rows
+
+    @staticmethod
+    def _project(rows: list, select: str) -> list:
+        if not select or select == '*':
+            return rows
+        columns = [column.strip() for column in select.split(',')]
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+    async def rest(self, request: Request) -> Response:
+        await self._delay()
+        table_name = request.path_params['table']
+        rows = self.tables.setdefault(table_name, [])
+        params = request.query_params
+        prefer = request.headers.get('prefer', '')
+
+        if request.method == 'GET' or request.method == 'HEAD':
+            selected = self._filter(rows, params, table_name)
+            total = len(selected)
+            if 'order' in params:
+                selected = self._order(selected, params['order'])
+            offset = int(params.get('offset', 0))
+            limit = params.get('limit')
+            limit = min(int(limit), self.max_rows) if limit else self.max_rows
+            selected = selected[offset:offset + limit]
+            headers = {}
+            if 'count=' in prefer:
+                end = offset + len(selected) - 1
+                headers['content-range'] = f"{offset}-{end}/{total}" if selected else f"*/{total}"
+            body = self._project(selected, params.get('select', '*'))
+            return JSONResponse(body, headers=headers)
+
+        if request.method == 'POST':
+            payload = await request.json()
+            items = payload if isinstance(payload, list) else [payload]
+            now = datetime.now().isoformat()
+            created = []
+            conflict = params.get('on_conflict')
+            if conflict and 'resolution=' in prefer:
+                columns = conflict.split(',')
+                key = lambda row: tuple(row.get(column) for column in columns)
+                existing = {key(row): row for row in rows if None not in key(row)}
+                merge = 'merge-duplicates' in prefer
+                kept = []
+                for item in items:
+                    if None not in key(item):
+                        if key(item) in existing:
+                            if merge:
+                                existing[key(item)].update(item)
+                                existing[key(item)]['updated_at'] = now
+                                created.append(existing[key(item)])
+                            continue
+                        existing[key(item)] = item
+                    kept.append(item)
+                items = kept
+            if conflict and 'merge-duplicates' in prefer:
+                self.indexes.pop(table_name, None)
+            new_rows = []
+            for item in items:
+                row = {'id': self._next_id(table_name), 'created_at': now, 'updated_at': now, **item}
+                rows.append(row)
+                new_rows.append(row)
+            self._index_rows(table_name, new_rows)
+            created.extend(new_rows)
+            return JSONResponse(created, status_code=201)
+
+        if request.method == 'PATCH':
+            payload = await request.json()
+            updated = []
+            if set(payload) & set(EQ_INDEXED + RANGE_INDEXED):
+                self.indexes.pop(table_name, None)
+            for row in self._filter(rows, params, table_name):
+                row.update(payload)
+                row['updated_at'] = datetime.now().isoformat()
+                updated.append(row)
+            return JSONResponse(updated)
+
+        if request.method == 'DELETE':
+            deleted = self._filter(rows, params, table_name)
+            ids = {id(row) for row in deleted}
+            self.tables[table_name] = [row for row in rows if id(row) not in ids]
+            self.indexes.pop(table_name, None)
+            return JSONResponse(deleted)
+
+        return Response(status_code=405)
+
+    async def rpc(self, request: Request) -> Response:
+        await self._delay()
+        return JSONResponse({'message': 'rpc no soportado en el stub'}, status_code=404)
+
+    async def list_buckets(self, request: Request) -> Response:
+        await self._delay()
+        if request.method == 'POST':
+            payload = await request.json()
+            self.buckets.setdefault(payload.get('id') or payload.get('name'), {})
+            return JSONResponse({'name': payload.get('name')})
+        now = datetime.now().isoformat()
+        return JSONResponse([
+            {'id': name, 'name': name, 'owner': '', 'public': True,
+             'created_at': now, 'updated_at': now,
+             'file_size_limit': None, 'allowed_mime_types': None}
+            for name in self.buckets
+        ])
+
+    async def upload_object(self, request: Request) -> Response:
+        await self._delay()
+        bucket = request.path_params['bucket']
+        path = request.path_params['path']
+        self.buckets.setdefault(bucket, {})[path] = await request.body()
+        return JSONResponse({'Key': f"{bucket}/{path}", 'Id': str(uuid.uuid4())})
+
+    def app(self) -> Starlette:
+        methods = ['GET', 'HEAD', 'POST', 'PATCH', 'DELETE']
+        return Starlette(routes=[
+            Route('/rest/v1/rpc/{name}', self.rpc, methods=['POST']),
+            Route('/rest/v1/{table}', self.rest, methods=methods),
+            Route('/storage/v1/bucket', self.list_buckets, methods=['GET', 'POST']),
+            Route('/storage/v1/bucket/', self.list_buckets, methods=['GET', 'POST']),
+            Route('/storage/v1/object/{bucket}/{path:path}', self.upload_object, methods=['POST', 'PUT']),
+        ])
+
+@contextmanager
+def serve(stub: StubSupabase, port: int = 54321):
+    """Levanta el stub en un hilo propio (con su propio event loop)"""
+    config = uvicorn.Config(stub.app(), host='127.0.0.1', port=port, log_level='warning', lifespan='off')
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
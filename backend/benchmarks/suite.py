@@ -0,0 +1,290 @@
+"""Suite de carga reproducible: todos los routers contra el stub de Supabase sembrado.
+
+Siembra el stub con benchmarks/dataset.py (residentes, años de signos vitales
+e historial de medicación, franjas de dosis), lo levanta en un hilo de este
+proceso con `latency` por consulta y monta la app con httpx.ASGITransport (sin
+lifespan: el planificador no corre y los datos no cambian durante la medición,
+el barrido de dosis se ejecuta una vez antes de medir). Cada endpoint recibe
+un calentamiento y luego `requests` peticiones desde `clients` clientes
+concurrentes; se reportan req/s, p50/p95/p99 y errores. El stub corta cada
+respuesta en 1.000 filas como Supabase, y antes de medir se comprueba que
+las vistas de toda la residencia traigan todas las filas (si no, sale con 1).
+
+Los resultados se guardan como JSON (por defecto benchmarks/results/latest.json)
+con el commit, la versión de Python y los parámetros. Con --baseline se
+comparan contra una corrida anterior: un endpoint con p50 o p95 más de
+--threshold por ciento peor (y más de MIN_DELTA_MS) o con errores nuevos
+cuenta como regresión y el proceso sale con código 1.
+
+Uso (desde backend/):
+    python benchmarks/suite.py
+    python benchmarks/suite.py --residents 20 --years 0.25 --requests 50 -e vital
+    python benchmarks/suite.py --baseline benchmarks/results/main.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from benchmarks import dataset
+from benchmarks.stub_supabase import StubSupabase, serve
+
+PORT = 54335
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'latest.json')
+WARMUP = 5
+# Las escrituras y la subida de imágenes se miden con menos clientes: en la
+# residencia llegan de a pocas tabletas a la vez
+WRITE_CLIENTS = 4
+# Diferencias menores no cuentan como regresión (ruido de endpoints de un milisegundo)
+MIN_DELTA_MS = 1.0
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def sample_image() -> bytes:
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), (180, 120, 90)).save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+def endpoints(data: dataset.Dataset, rng: random.Random) -> dict:
+    """Catálogo nombre -> función que arma (método, ruta, kwargs de httpx) para cada petición"""
+    residents = [row['id'] for row in data.residents]
+    medications = [row['id'] for row in data.tables['medications']]
+    today = datetime.now()
+    image = sample_image()
+
+    def get(path, **params):
+        return lambda: ('GET', path.format(resident=rng.choice(residents)), {'params': params})
+
+    def vital_sign():
+        reading = dataset.vital_reading(rng, 'Temperatura')
+        return ('POST', '/api/vital-signs/', {'json': {
+            'resident_id': rng.choice(residents), 'type': 'Temperatura', **reading,
+            'taken_at': datetime.now().isoformat(timespec='seconds'), 'taken_by': 'bench'
+        }})
+
+    return {
+        'residents.list': get('/api/residents/', limit=100),
+        'residents.detail': get('/api/residents/{resident}'),
+        'residents.profile': get('/api/residents/{resident}/profile'),
+        'residents.medical_info': get('/api/residents/{resident}/medical-info'),
+        'residents.search': lambda: ('GET', '/api/residents/search',
+                                     {'params': {'q': rng.choice(dataset.LAST), 'limit': 20}}),
+        'vital_signs.resident': get('/api/vital-signs/resident/{resident}', limit=100),
+        'vital_signs.latest': get('/api/vital-signs/resident/{resident}/latest'),
+        'vital_signs.paginated': get('/api/vital-signs/resident/{resident}/paginated', page=1, limit=20),
+        'vital_signs.aggregate': get('/api/vital-signs/resident/{resident}/aggregate'),
+        'vital_signs.trend': get('/api/vital-signs/resident/{resident}/trend'),
+        'vital_signs.calendar': get('/api/vital-signs/calendar/{resident}', year=today.year, month=today.month),
+        'medications.resident': get('/api/medications/resident/{resident}'),
+        'medications.today_status': get('/api/medications/today-status'),
+        'medications.today_status_resident': get('/api/medications/today-status/{resident}'),
+        'medications.history': get('/api/medications/history/resident/{resident}'),
+        'medications.history_calendar': get('/api/medications/history/calendar/{resident}',
+                                            year=today.year, month=today.month),
+        'medications.due': get('/api/medications/due'),
+        'medications.missed': get('/api/medications/missed'),
+        'family_contacts.resident': get('/api/family-contacts/resident/{resident}'),
+        'alerts.list': get('/api/alerts'),
+        'alerts.thresholds': get('/api/alerts/thresholds/{resident}'),
+        'medications.administer': lambda: ('POST', f"/api/medications/{rng.choice(medications)}/administer",
+                                           {'params': {'user_id': 'bench'}}),
+        'vital_signs.create': vital_sign,
+        'upload.image': lambda: ('POST', '/api/upload/',
+                                 {'files': {'file': ('foto.jpg', image, 'image/jpeg')}}),
+    }
+
+async def check_completeness(client, data: dataset.Dataset) -> list:
+    """Verifica que las vistas de toda la residencia no pierdan filas por el tope max-rows del stub.
+
+    Un corte de PostgREST no da error: la respuesta simplemente trae menos filas
+    y, además, más rápido. Se comprueba antes de medir, con los datos sembrados.
+    """
+    problems = []
+    active = sum(1 for row in data.residents if not row.get('discharge_date'))
+    status = (await client.get('/api/medications/today-status')).json()
+    medications = sum(len(entry['medications']) for entry in status['residents'])
+    if len(status['residents']) != active:
+        problems.append(f"today-status: {len(status['residents'])} de {active} residentes")
+    if medications != len(data.tables['medications']):
+        problems.append(f"today-status: {medications} de {len(data.tables['medications'])} medicaciones")
+    return problems
+
+def is_write(name: str) -> bool:
+    return name.endswith(('.administer', '.create')) or name.startswith('upload.')
+
+async def run_endpoint(client, build, total: int, clients: int) -> dict:
+    latencies = []
+    errors = {}
+    size = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, size
+        while remaining > 0:
+            remaining -= 1
+            method, path, kwargs = build()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status == 200:
+                size = max(size, len(response.content))
+            else:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    for _ in range(WARMUP):
+        method, path, kwargs = build()
+        await client.request(method, path, **kwargs)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'clients': clients,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(max(latencies), 2),
+        'errors': errors,
+        'bytes': size
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Endpoints que empeoraron más de `threshold` por ciento en p50 o p95, o que ahora fallan"""
+    regressions = []
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if (previous[metric] > 0 and current[metric] > previous[metric] * (1 + threshold / 100)
+                    and current[metric] - previous[metric] > MIN_DELTA_MS):
+                regressions.append(f"{name}: {metric} {previous[metric]:.2f} -> {current[metric]:.2f} ms "
+                                   f"(+{100 * (current[metric] / previous[metric] - 1):.0f} %)")
+        if sum(current['errors'].values()) > sum(previous['errors'].values()):
+            regressions.append(f"{name}: errores {previous['errors']} -> {current['errors']}")
+    return regressions
+
+def print_table(results: dict, baseline: dict = None):
+    print(f"{'endpoint':36} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KB':>8}  errores")
+    for name, result in results['endpoints'].items():
+        line = (f"{name:36} {result['rps']:8.1f} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} "
+                f"{result['p99_ms']:8.2f} {result['bytes'] / 1024:8.1f}  {sum(result['errors'].values()) or ''}")
+        previous = (baseline or {}).get('endpoints', {}).get(name)
+        if previous and previous['p50_ms']:
+            line += f"  (p50 {100 * (result['p50_ms'] / previous['p50_ms'] - 1):+.0f} %)"
+        print(line)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Suite de carga de los routers contra el stub de Supabase")
+    parser.add_argument('--residents', type=int, default=100)
+    parser.add_argument('--years', type=float, default=2.0, help="años de signos vitales e historial por residente")
+    parser.add_argument('--readings-per-day', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.005, help="segundos por consulta al stub")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=300, help="peticiones por endpoint")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-e', '--endpoints', action='append', default=[],
+                        help="medir solo los endpoints que contienen este texto (repetible)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', help="JSON de una corrida anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=20.0, help="por ciento de empeoramiento tolerado")
+    return parser.parse_args(argv)
+
+async def run(args) -> dict:
+    started = time.perf_counter()
+    data = dataset.generate(args.residents, args.years, args.readings_per_day, args.seed)
+    print(f"datos: {data.counts()} ({time.perf_counter() - started:.1f} s)")
+    stub = StubSupabase(latency=args.latency)
+    dataset.seed(stub, data)
+    rng = random.Random(args.seed)
+    catalog = {name: build for name, build in endpoints(data, rng).items()
+               if not args.endpoints or any(text in name for text in args.endpoints)}
+
+    with serve(stub, PORT) as base_url:
+        os.environ['SUPABASE_URL'] = base_url
+        os.environ['SUPABASE_SERVICE_ROLE_KEY'] = 'bench'
+        os.environ.setdefault('LOG_LEVEL', 'ERROR')
+        from main import app
+        import missed_doses
+        import supabase_client
+
+        await missed_doses.sweep()
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        transport = httpx.ASGITransport(app=app)
+        results = {}
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', limits=limits, timeout=60) as client:
+            problems = await check_completeness(client, data)
+            for name, build in catalog.items():
+                clients = min(args.clients, WRITE_CLIENTS) if is_write(name) else args.clients
+                results[name] = await run_endpoint(client, build, args.requests, clients)
+        await supabase_client.close()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'params': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+            'rows': data.counts(),
+            'stub_queries': stub.requests,
+            'duration_s': round(time.perf_counter() - started, 1)
+        },
+        'completeness': problems,
+        'endpoints': results
+    }
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    results = asyncio.run(run(args))
+
+    print_table(results, baseline)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"resultados en {args.output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}")
+    else:
+        regressions = []
+    for problem in results['completeness']:
+        print(f"INCOMPLETO {problem}")
+    return 1 if regressions or results['completeness'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
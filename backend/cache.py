@@ -0,0 +1,169 @@
+import time
+import logging
+from collections import OrderedDict
+from threading import Lock
+import orjson
+import shared_state
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Caché LRU acotada con expiración por entrada y contadores de aciertos.
+
+    Vive en el proceso: con varios workers cada uno tiene su propia copia, por
+    eso el TTL acota cuánto puede tardar en verse un cambio hecho en otro worker.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        """Elimina las claves (tuplas) cuyo primer elemento es `prefix`"""
+        with self._lock:
+            for key in [key for key in self._data if key[0] == prefix]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None
+        }
+
+class SharedCache:
+    """Caché de lecturas compartida por todos los workers.
+
+    Con el backend en memoria (un worker) delega en un TTLCache local. Con
+    Redis cada grupo de claves (primer elemento de la tupla) es un hash, así
+    una invalidación como delete_prefix('list') es un solo DEL y se ve en
+    todos los workers a la vez, en lugar de esperar a que venza el TTL.
+    Si el backend compartido falla se responde como un fallo de caché.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.local = TTLCache(name, maxsize=maxsize, ttl=ttl)
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def ttl(self) -> float:
+        return self.local.ttl
+
+    @ttl.setter
+    def ttl(self, value: float):
+        self.local.ttl = value
+
+    def group(self, key) -> str:
+        return f"cache:{self.name}:{key[0]}"
+
+    @staticmethod
+    def field(key) -> str:
+        return orjson.dumps(list(key[1:])).decode()
+
+    def failed(self, operation: str, error: Exception):
+        self.errors += 1
+        logger.warning("Shared cache %s %s failed: %s", self.name, operation, error)
+
+    async def get(self, key, default=None):
+        backend = shared_state.get_backend()
+        if not backend.shared:
+            return self.local.get(key, default)
+        try:
+            raw = await backend.hget(self.group(key), self.field(key))
+        except Exception as e:
+            self.failed('get', e)
+            return default
+        if raw is not None:
+            expires, value = orjson.loads(raw)
+            if expires >= time.time():
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    async def set(self, key, value):
+        backend = shared_state.get_backend()
+        if not backend.shared:
+            self.local.set(key, value)
+            return
+        # Cada entrada lleva su vencimiento; el hash completo vence con la última escritura
+        payload = orjson.dumps([time.time() + self.ttl, value], default=str)
+        try:
+            await backend.hset(self.group(key), self.field(key), payload, self.ttl)
+        except Exception as e:
+            self.failed('set', e)
+
+    async def delete(self, key):
+        backend = shared_state.get_backend()
+        if not backend.shared:
+            self.local.delete(key)
+            return
+        try:
+            await backend.hdel(self.group(key), self.field(key))
+        except Exception as e:
+            self.failed('delete', e)
+
+    async def delete_prefix(self, prefix):
+        backend = shared_state.get_backend()
+        if not backend.shared:
+            self.local.delete_prefix(prefix)
+            return
+        try:
+            await backend.delete(self.group((prefix,)))
+        except Exception as e:
+            self.failed('delete_prefix', e)
+
+    def stats(self) -> dict:
+        backend = shared_state.get_backend()
+        if not backend.shared:
+            return {**self.local.stats(), "backend": backend.kind}
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "backend": backend.kind,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / total, 4) if total else None
+        }
@@ -0,0 +1,50 @@
+import hashlib
+import orjson
+from typing import Optional
+from fastapi import Request, Response
+from serialization import raw_json
+
+# Los datos son médicos: solo la caché del navegador, y siempre revalidando con ETag
+CACHE_CONTROL = "private, no-cache"
+
+def compute_etag(data) -> str:
+    """ETag fuerte a partir del contenido que devolvió Supabase"""
+    payload = orjson.dumps(data, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match usa comparación débil: W/"x" equivale a "x"
+    candidates = {candidate.strip().removeprefix('W/') for candidate in header.split(',')}
+    return etag in candidates
+
+def not_modified(request: Request, response: Response, key) -> Optional[Response]:
+    """Calcula el ETag de `key`: devuelve un 304 si el cliente ya lo tiene, o None
+    tras dejar el ETag en `response` para la respuesta normal.
+
+    Sirve para cortar antes de armar la respuesta (agrupar, validar, serializar).
+    """
+    etag = compute_etag(key)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
+
+def conditional_response(request: Request, response: Response, data, key=None, raw: bool = False):
+    """Devuelve 304 si el cliente ya tiene esta versión; si no, `data` con su ETag.
+
+    El 304 sale antes de que FastAPI valide y serialice el response_model.
+    `key` permite incluir en el hash información que viaja en headers
+    (por ejemplo el conteo de una lista paginada); por defecto es `data`.
+    Con `raw=True` los datos se devuelven tal cual con orjson, sin re-validar
+    el response_model (para listas grandes que vienen directo de Supabase).
+    """
+    unchanged = not_modified(request, response, data if key is None else key)
+    if unchanged is not None:
+        return unchanged
+    return raw_json(data, response) if raw else data
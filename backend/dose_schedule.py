@@ -0,0 +1,175 @@
+import os
+import re
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+from supabase_client import table, execute
+from pagination import fetch_all
+import facility_time
+
+logger = logging.getLogger(__name__)
+
+# Días hacia adelante con franjas de dosis materializadas en medication_dose_slots
+DOSE_SLOT_DAYS = int(os.getenv("DOSE_SLOT_DAYS", "14"))
+# Cada cuánto el scheduler extiende el horizonte y completa los horarios que falten
+DOSE_SLOT_REFRESH_HOURS = float(os.getenv("DOSE_SLOT_REFRESH_HOURS", "6"))
+# Filas por upsert al materializar (el horizonte completo de la residencia son miles)
+SLOT_INSERT_CHUNK = 1000
+
+# Hora de la primera dosis cuando la medicación no tiene scheduled_time
+DEFAULT_FIRST_DOSE = time(8, 0)
+# Horarios habituales de la ronda para "N veces al día" (se desplazan si hay scheduled_time)
+DAILY_TIMES = {
+    1: ['08:00'],
+    2: ['08:00', '20:00'],
+    3: ['08:00', '14:00', '20:00'],
+    4: ['08:00', '12:00', '16:00', '20:00'],
+}
+# Tope de administraciones diarias para "según necesidad"
+PRN_MAX_PER_DAY = 5
+
+TIMES_PER_DAY = {'una': 1, 'dos': 2, 'tres': 3, 'cuatro': 4}
+TIMES_PATTERN = re.compile(r'\b(una|dos|tres|cuatro|\d+)\s+vec(?:es|ez)')
+INTERVAL_PATTERN = re.compile(r'cada\s+(\d+)\s*(?:h\b|hs\b|horas?)')
+PRN_PATTERN = re.compile(r'seg[uú]n necesidad|si es necesario|a demanda|\bprn\b')
+
+def _parse_time(value) -> Optional[time]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, time):
+        return value
+    try:
+        return time.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def _shift(times: List[str], first: time) -> List[str]:
+    """Desplaza los horarios para que la primera dosis caiga en `first`"""
+    base = datetime.combine(date.min, time.fromisoformat(times[0]))
+    delta = datetime.combine(date.min, first) - base
+    return sorted({(datetime.combine(date.min, time.fromisoformat(t)) + delta).strftime('%H:%M') for t in times})
+
+def parse_frequency(frequency: str, scheduled_time=None) -> dict:
+    """Convierte el texto libre de `frequency` en un horario estructurado.
+
+    Se llama una vez al crear o editar la medicación; el resultado se guarda en
+    la columna `schedule`:
+      {"kind": "daily" | "interval" | "prn", "times": ["08:00", ...],
+       "interval_hours": int | None, "max_per_day": int}
+    Las frecuencias que no se reconocen se tratan como una vez al día.
+    """
+    text = (frequency or '').lower()
+    first = _parse_time(scheduled_time)
+
+    if PRN_PATTERN.search(text):
+        return {"kind": "prn", "times": [], "interval_hours": None, "max_per_day": PRN_MAX_PER_DAY}
+
+    interval = INTERVAL_PATTERN.search(text)
+    if interval and 0 < int(interval.group(1)) <= 24:
+        hours = int(interval.group(1))
+        anchor = datetime.combine(date.min, first or DEFAULT_FIRST_DOSE)
+        times = sorted({(anchor + timedelta(hours=hours * i)).strftime('%H:%M') for i in range(24 // hours)})
+        return {"kind": "interval", "times": times, "interval_hours": hours, "max_per_day": len(times)}
+
+    count = 1
+    match = TIMES_PATTERN.search(text)
+    if match:
+        word = match.group(1)
+        count = TIMES_PER_DAY.get(word) or int(word)
+    count = max(1, count)
+    if count in DAILY_TIMES:
+        times = DAILY_TIMES[count]
+        if first is not None:
+            times = _shift(times, first)
+    else:
+        # Más de cuatro tomas: repartir el día en intervalos iguales
+        anchor = datetime.combine(date.min, first or DEFAULT_FIRST_DOSE)
+        times = sorted({(anchor + timedelta(minutes=1440 * i // count)).strftime('%H:%M') for i in range(count)})
+    return {"kind": "daily", "times": list(times), "interval_hours": None, "max_per_day": len(times)}
+
+def schedule_of(medication: dict) -> dict:
+    """Horario guardado de la medicación; solo parsea el texto si la fila es anterior a la columna"""
+    return medication.get('schedule') or parse_frequency(medication.get('frequency', ''), medication.get('scheduled_time'))
+
+def expected_per_day(medication: dict) -> int:
+    return schedule_of(medication)['max_per_day']
+
+def slots_for_day(medication: dict, day: date) -> List[dict]:
+    """Filas de medication_dose_slots de una medicación para un día (scheduled_at en hora local, ver facility_time)"""
+    day_text = day.isoformat()
+    return [
+        {
+            'medication_id': medication['id'],
+            'resident_id': medication['resident_id'],
+            'slot_date': day_text,
+            'scheduled_at': f"{day_text}T{slot}:00"
+        }
+        for slot in schedule_of(medication)['times']
+    ]
+
+def slots_for_range(medications: list, start: date, days: int) -> List[dict]:
+    return [
+        slot
+        for medication in medications
+        for offset in range(days)
+        for slot in slots_for_day(medication, start + timedelta(days=offset))
+    ]
+
+async def materialize(medications: list, start: Optional[date] = None, days: int = DOSE_SLOT_DAYS, after: Optional[str] = None):
+    """Inserta las franjas de [start, start + days) que todavía no existan.
+
+    Los días son de la residencia (FACILITY_TIMEZONE); con `after` solo se
+    insertan las franjas posteriores a esa hora.
+    """
+    rows = slots_for_range(medications, start or facility_time.today(), days)
+    if after:
+        rows = [row for row in rows if row['scheduled_at'] > after]
+    for i in range(0, len(rows), SLOT_INSERT_CHUNK):
+        await execute(table('medication_dose_slots').upsert(
+            rows[i:i + SLOT_INSERT_CHUNK], on_conflict='medication_id,scheduled_at', ignore_duplicates=True
+        ))
+    return len(rows)
+
+async def rematerialize(medication: dict):
+    """Reemplaza las franjas futuras tras editar la frecuencia o el horario.
+
+    Las franjas de hoy que ya pasaron no se recrean con el horario nuevo: el
+    siguiente barrido las marcaría omitidas.
+    """
+    now = facility_time.now()
+    now_text = now.strftime(facility_time.TIMESTAMP_FORMAT)
+    await execute(
+        table('medication_dose_slots').delete()
+        .eq('medication_id', medication['id'])
+        .gte('scheduled_at', now_text)
+    )
+    await materialize([medication], now.date(), after=now_text)
+
+async def refresh():
+    """Completa el campo schedule de filas antiguas y extiende el horizonte de franjas"""
+    medications = await fetch_all(lambda: table('medications').select("*"), ['id'])
+    legacy = [medication for medication in medications if not medication.get('schedule')]
+    for medication in legacy:
+        medication['schedule'] = schedule_of(medication)
+        await execute(table('medications').update({'schedule': medication['schedule']}).eq('id', medication['id']))
+    slots = await materialize(medications)
+    logger.info("Dose slots refreshed: %s medications, %s backfilled, %s slots", len(medications), len(legacy), slots)
+
+# Orden estable de las franjas para recorrerlas por páginas
+SLOT_KEY = ['scheduled_at', 'medication_id']
+
+SLOT_COLUMNS = "medication_id, resident_id, scheduled_at"
+
+async def fetch_slots(start: str, end: str, resident_id: Optional[str] = None, columns: str = SLOT_COLUMNS) -> list:
+    """Franjas con scheduled_at en [start, end), en orden; índices (scheduled_at) y (resident_id, scheduled_at)"""
+    def build_query():
+        query = table('medication_dose_slots').select(columns).gte('scheduled_at', start).lt('scheduled_at', end)
+        return query.eq('resident_id', resident_id) if resident_id else query
+    return await fetch_all(build_query, SLOT_KEY)
+
+def group_slots(slots: list) -> dict:
+    """{medication_id: [scheduled_at, ...]} en orden"""
+    grouped = {}
+    for slot in slots:
+        grouped.setdefault(slot['medication_id'], []).append(slot['scheduled_at'])
+    return grouped
@@ -0,0 +1,207 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Optional
+import orjson
+import shared_state
+
+logger = logging.getLogger(__name__)
+
+# Eventos recientes que se reenvían a un cliente que reconecta con Last-Event-ID
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "500"))
+# Eventos pendientes por conexión; un cliente que no los consume se desconecta
+SUBSCRIBER_QUEUE_SIZE = 256
+MAX_SUBSCRIBERS = int(os.getenv("MAX_SSE_CONNECTIONS", "1000"))
+# Comentario SSE periódico para que proxies y balanceadores no cierren las conexiones ociosas
+HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
+# Canal del estado compartido por el que los workers se reenvían los eventos
+EVENTS_CHANNEL = 'events'
+# Eventos esperando a publicarse en el canal; si Redis no da abasto se descartan
+RELAY_QUEUE_SIZE = 10000
+
+HEARTBEAT = b": ping\n\n"
+CLOSE = None
+
+def topic_of(event_type: str) -> str:
+    """'medication.administered' -> 'medication'"""
+    return event_type.split('.', 1)[0]
+
+def encode_event(event_id: int, event_type: str, data) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event_type.encode(), orjson.dumps(data, default=str))
+
+class Subscriber:
+    def __init__(self, topics: Optional[set], resident_id: Optional[str]):
+        self.topics = topics
+        self.resident_id = resident_id
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def wants(self, topic: str, resident_id: Optional[str]) -> bool:
+        if self.topics is not None and topic not in self.topics:
+            return False
+        return self.resident_id is None or resident_id is None or resident_id == self.resident_id
+
+class EventBroker:
+    """Fan-out en memoria de los eventos de escritura hacia las conexiones SSE.
+
+    Cada evento se serializa una sola vez y se encola (sin esperar) en la cola de
+    cada suscriptor interesado, así una conexión ociosa solo cuesta una cola y
+    una tarea dormida. Con varios workers y estado compartido en Redis, cada
+    worker reenvía sus eventos por el canal EVENTS_CHANNEL y entrega los de los
+    demás a sus propias conexiones. Los ids son microsegundos del reloj del
+    servidor (compartido por los workers de la instancia), así Last-Event-ID
+    sirve aunque el cliente reconecte a otro worker.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.recent = deque(maxlen=EVENT_REPLAY_SIZE)   # (id, topic, resident_id, payload)
+        self.last_id = 0
+        self.published = 0
+        self.relayed = 0
+        self.relay_dropped = 0
+        self.disconnected_slow = 0
+        self.origin = uuid.uuid4().hex
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.relay_task: Optional[asyncio.Task] = None
+        self.relay_queue: Optional[asyncio.Queue] = None
+
+    def new_id(self) -> int:
+        self.last_id = max(time.time_ns() // 1000, self.last_id + 1)
+        return self.last_id
+
+    def publish(self, event_type: str, data, resident_id: Optional[str] = None):
+        """Publica un evento; nunca bloquea al endpoint que escribió"""
+        event_id = self.new_id()
+        topic = topic_of(event_type)
+        payload = encode_event(event_id, event_type, data)
+        self.dispatch(event_id, topic, resident_id, payload)
+        self.published += 1
+        if self.relay_queue is not None:
+            try:
+                self.relay_queue.put_nowait((event_id, topic, resident_id, payload))
+            except asyncio.QueueFull:
+                self.relay_dropped += 1
+
+    def dispatch(self, event_id: int, topic: str, resident_id: Optional[str], payload: bytes):
+        self.recent.append((event_id, topic, resident_id, payload))
+        for subscriber in list(self.subscribers):
+            if subscriber.wants(topic, resident_id):
+                self.deliver(subscriber, payload)
+
+    def receive(self, message: bytes):
+        """Evento publicado por otro worker (llega por el canal compartido)"""
+        event = orjson.loads(message)
+        if event["origin"] == self.origin:
+            return
+        self.last_id = max(self.last_id, event["id"])
+        self.relayed += 1
+        self.dispatch(event["id"], event["topic"], event["resident_id"], event["payload"].encode())
+
+    async def relay(self):
+        """Publica en orden los eventos de este worker en el canal compartido"""
+        backend = shared_state.get_backend()
+        while True:
+            event_id, topic, resident_id, payload = await self.relay_queue.get()
+            message = orjson.dumps({"origin": self.origin, "id": event_id, "topic": topic,
+                                    "resident_id": resident_id, "payload": payload.decode()})
+            try:
+                await backend.publish(EVENTS_CHANNEL, message)
+            except Exception as e:
+                self.relay_dropped += 1
+                logger.warning("Could not relay event %s to other workers: %s", event_id, e)
+
+    def deliver(self, subscriber: Subscriber, payload: bytes):
+        try:
+            subscriber.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Cliente lento: se le cierra el stream y al reconectar recupera lo perdido con Last-Event-ID
+            self.disconnected_slow += 1
+            logger.info("Closing slow SSE subscriber (%s pending events)", SUBSCRIBER_QUEUE_SIZE)
+            self.close(subscriber)
+
+    def close(self, subscriber: Subscriber):
+        """Termina el stream del suscriptor descartando lo que tenga pendiente"""
+        self.subscribers.discard(subscriber)
+        subscriber.closed = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(CLOSE)
+
+    def subscribe(self, topics: Optional[set] = None, resident_id: Optional[str] = None,
+                  last_event_id: Optional[int] = None) -> Optional[Subscriber]:
+        """Registra una conexión (None si se alcanzó MAX_SUBSCRIBERS) y le encola lo que se perdió"""
+        if len(self.subscribers) >= MAX_SUBSCRIBERS:
+            return None
+        subscriber = Subscriber(topics, resident_id)
+        if last_event_id is not None:
+            for event_id, topic, event_resident_id, payload in self.recent:
+                if event_id > last_event_id and subscriber.wants(topic, event_resident_id):
+                    self.deliver(subscriber, payload)
+        # Si lo perdido no entraba en su cola ya quedó cerrado: el stream termina enseguida
+        if not subscriber.closed:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def stream(self, subscriber: Subscriber):
+        """Cuerpo de la respuesta SSE de una conexión"""
+        try:
+            # Primer mensaje inmediato: el cliente sabe que está conectado y cada cuánto reintentar
+            yield b"retry: 3000\n\n"
+            while True:
+                payload = await subscriber.queue.get()
+                if payload is CLOSE:
+                    return
+                yield payload
+        finally:
+            self.unsubscribe(subscriber)
+
+    def start(self):
+        if self.heartbeat_task is None or self.heartbeat_task.done():
+            self.heartbeat_task = asyncio.create_task(self.heartbeat())
+        backend = shared_state.get_backend()
+        if backend.shared and (self.relay_task is None or self.relay_task.done()):
+            self.relay_queue = asyncio.Queue(maxsize=RELAY_QUEUE_SIZE)
+            backend.subscribe(EVENTS_CHANNEL, self.receive)
+            self.relay_task = asyncio.create_task(self.relay())
+
+    async def stop(self):
+        for task in (self.heartbeat_task, self.relay_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.heartbeat_task = None
+        self.relay_task = None
+        self.relay_queue = None
+        # Cerrar los streams abiertos para que el apagado no espere a los clientes
+        for subscriber in list(self.subscribers):
+            self.close(subscriber)
+
+    async def heartbeat(self):
+        """Un único latido para todas las conexiones (no una tarea por conexión)"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            for subscriber in list(self.subscribers):
+                self.deliver(subscriber, HEARTBEAT)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "relayed": self.relayed,
+            "relay_dropped": self.relay_dropped,
+            "disconnected_slow": self.disconnected_slow,
+            "last_event_id": self.last_id
+        }
+
+broker = EventBroker()
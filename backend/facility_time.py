@@ -0,0 +1,43 @@
+"""Reloj de la residencia y convención de almacenamiento de las horas de medicación.
+
+medication_dose_slots.scheduled_at, medication_dose_slots.administered_at y
+medication_history.administered_at son TIMESTAMP sin zona con la hora local de
+la residencia ('2024-05-01T08:00:00'), igual que los horarios de las
+medicaciones. Quien escribe convierte antes con to_local y los límites de las
+consultas se arman con la misma forma ('{día}T00:00:00'), así las
+comparaciones (también las de texto) no dependen de la zona del servidor ni de
+la de la tableta. Ver update_medication_schedule.sql y update_missed_doses.sql.
+"""
+import os
+from datetime import date, datetime
+from typing import Optional, Union
+from zoneinfo import ZoneInfo
+
+# Zona horaria de la residencia. Los horarios de las medicaciones ("08:00") y
+# las franjas de medication_dose_slots son hora local de la residencia, no del
+# servidor (Render corre en UTC)
+FACILITY_TIMEZONE = ZoneInfo(os.getenv("FACILITY_TIMEZONE", "America/Bogota"))
+
+# Forma de las horas guardadas y de los límites de las consultas
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+def now() -> datetime:
+    """Hora local de la residencia, sin tzinfo (el mismo formato que scheduled_at)"""
+    return datetime.now(FACILITY_TIMEZONE).replace(tzinfo=None, microsecond=0)
+
+def today() -> date:
+    return now().date()
+
+def to_local(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """Convierte un timestamp guardado a hora local de la residencia, sin tzinfo.
+
+    Los valores con zona (timestamptz, o lo que suben las tabletas en UTC) se
+    pasan a la zona de la residencia; los que no la tienen ya son hora local.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone(FACILITY_TIMEZONE).replace(tzinfo=None)
+    return value
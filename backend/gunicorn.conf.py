@@ -0,0 +1,19 @@
+# Perfil multi-worker: gunicorn administra N procesos con el event loop de uvicorn.
+# Uso (desde backend/): gunicorn main:app -c gunicorn.conf.py
+#
+# Con más de un worker, SHARED_STATE_URL debe apuntar a Redis (o compatible):
+# la caché de residentes, las Idempotency-Key, el límite de peticiones y el
+# reenvío de eventos SSE se comparten ahí. Las tareas periódicas ya se
+# coordinan con el lease de scheduler.py.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# WEB_CONCURRENCY es la variable estándar de Render y Heroku; por defecto un worker por núcleo
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# Al reiniciar, cada worker cierra sus streams SSE y espera las peticiones en curso hasta este tope
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Los logs de acceso ya los escribe LoggingMiddleware (JSON con muestreo)
+accesslog = None
@@ -0,0 +1,109 @@
+import os
+import logging
+import orjson
+from starlette.datastructures import Headers
+from serialization import ORJSONResponse
+import shared_state
+
+logger = logging.getLogger(__name__)
+
+# Cuánto se recuerda la respuesta de una clave (los reintentos de una tableta
+# sin conexión pueden llegar horas después)
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+# Reserva mientras la primera petición se procesa; si el worker muere, la clave se libera sola
+IDEMPOTENCY_LOCK_TTL = 60.0
+# Respuestas más grandes no se guardan (la clave se libera y un reintento se vuelve a procesar)
+IDEMPOTENCY_MAX_BODY = 1024 * 1024
+MAX_KEY_LENGTH = 200
+
+PENDING = b'pending'
+
+class IdempotencyMiddleware:
+    """Reintentos seguros de POST con el header `Idempotency-Key`.
+
+    La primera petición con una clave reserva la clave en el estado compartido
+    (SET NX) y, al terminar, guarda su respuesta; los reintentos con la misma
+    clave reciben esa respuesta sin volver a ejecutar el endpoint, aunque
+    lleguen a otro worker. Un reintento mientras la primera sigue en curso
+    recibe 409. Las respuestas 5xx no se guardan, para que el reintento pueda
+    funcionar. Si el backend compartido falla la petición sigue sin protección.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = Headers(scope=scope).get("idempotency-key")
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            response = ORJSONResponse({"detail": f"Idempotency-Key admite hasta {MAX_KEY_LENGTH} caracteres"}, status_code=400)
+            await response(scope, receive, send)
+            return
+
+        backend = shared_state.get_backend()
+        key = f"idempotency:{scope['path']}:{idempotency_key}"
+        try:
+            claimed = await backend.set(key, PENDING, IDEMPOTENCY_LOCK_TTL, only_if_absent=True)
+            stored = None if claimed else await backend.get(key)
+        except Exception as e:
+            logger.warning("Idempotency store unavailable, processing without it: %s", e)
+            await self.app(scope, receive, send)
+            return
+
+        if not claimed:
+            if stored is None or stored == PENDING:
+                response = ORJSONResponse(
+                    {"detail": "Una petición con esta Idempotency-Key todavía se está procesando"},
+                    status_code=409, headers={"Retry-After": "1"}
+                )
+                await response(scope, receive, send)
+                return
+            meta, _, body = stored.partition(b"\n")
+            meta = orjson.loads(meta)
+            headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in meta["headers"]]
+            await send({"type": "http.response.start", "status": meta["status"],
+                        "headers": headers + [(b"idempotent-replayed", b"true")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start_message = None
+        chunks = []
+        size = 0
+
+        async def send_recorded(message):
+            nonlocal start_message, size
+            if message["type"] == "http.response.start":
+                start_message = message
+            elif message["type"] == "http.response.body" and size <= IDEMPOTENCY_MAX_BODY:
+                chunks.append(message.get("body", b""))
+                size += len(chunks[-1])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_recorded)
+        except BaseException:
+            await self.release(backend, key)
+            raise
+
+        if start_message is None or start_message["status"] >= 500 or size > IDEMPOTENCY_MAX_BODY:
+            await self.release(backend, key)
+            return
+        meta = orjson.dumps({
+            "status": start_message["status"],
+            "headers": [(name.decode('latin-1'), value.decode('latin-1')) for name, value in start_message["headers"]]
+        })
+        try:
+            await backend.set(key, meta + b"\n" + b"".join(chunks), IDEMPOTENCY_TTL)
+        except Exception as e:
+            logger.warning("Could not store idempotent response for %s: %s", scope["path"], e)
+
+    async def release(self, backend, key: str):
+        try:
+            await backend.delete(key)
+        except Exception as e:
+            logger.warning("Could not release idempotency key: %s", e)
@@ -0,0 +1,78 @@
+import io
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps, features
+
+# Lado mayor (px) de cada variante; None conserva el tamaño original
+VARIANT_SIZES = {
+    'original': None,
+    'medium': 640,
+    'thumbnail': 160
+}
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "82"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+_executor = None
+
+def output_format():
+    """Formato de salida: WebP si Pillow lo soporta, si no JPEG"""
+    if features.check('webp'):
+        return 'WEBP', 'image/webp', '.webp'
+    return 'JPEG', 'image/jpeg', '.jpg'
+
+def normalize_image(file_content: bytes) -> dict:
+    """Decodifica, corrige la orientación, elimina EXIF y genera las variantes.
+
+    Corre en un proceso aparte (ver process_image). Lanza ValueError si el
+    contenido no es una imagen válida.
+    """
+    try:
+        img = Image.open(io.BytesIO(file_content))
+        img.load()
+    except Exception as e:
+        raise ValueError(f"El archivo no es una imagen válida: {str(e)}")
+
+    img_format, content_type, extension = output_format()
+
+    # Aplicar la rotación indicada por EXIF; al re-codificar sin exif= se descarta
+    img = ImageOps.exif_transpose(img)
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    img = img.convert('RGBA' if has_alpha and img_format == 'WEBP' else 'RGB')
+
+    variants = {}
+    # De mayor a menor: cada variante se reduce a partir de la anterior
+    source = img
+    for name, size in VARIANT_SIZES.items():
+        if size is not None:
+            source = source.copy()
+            source.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+        buffer = io.BytesIO()
+        source.save(buffer, img_format, quality=IMAGE_QUALITY)
+        variants[name] = buffer.getvalue()
+
+    return {
+        "content_type": content_type,
+        "extension": extension,
+        "width": img.width,
+        "height": img.height,
+        "variants": variants
+    }
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+async def process_image(file_content: bytes) -> dict:
+    """Ejecuta normalize_image en el pool de procesos sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), normalize_image, file_content)
+
+def shutdown():
+    """Detiene el pool de procesos (se llama desde el lifespan de la app)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
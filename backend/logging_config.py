@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# Nivel y formato: "json" en producción, "text" para leer en local
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+# Fracción de peticiones cuyos logs INFO/DEBUG se conservan. WARNING y ERROR
+# se registran siempre. LOG_SAMPLE_RATES ajusta por prefijo de ruta, p. ej.
+# "/api/vital-signs=0.1,/api/medications/today-status=0.2"
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+# Datos médicos y de identificación que nunca se escriben en los logs
+REDACTED_FIELDS = frozenset({
+    "pathologies", "medical_history", "allergies", "blood_type", "document_number",
+    "birth_date", "notes", "value", "systolic", "diastolic",
+    "phone", "address", "emergency_contact_phone",
+})
+REDACTED = "[REDACTED]"
+
+# Atributos estándar de LogRecord: todo lo demás llegó por `extra=` y va al JSON
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_request_context: ContextVar[dict] = ContextVar("log_request_context", default={})
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+def parse_sample_rates(value: str) -> list:
+    """[(prefijo, tasa)] ordenado del prefijo más largo al más corto"""
+    rates = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        prefix, _, rate = item.partition("=")
+        rates.append((prefix.strip(), float(rate)))
+    return sorted(rates, key=lambda entry: len(entry[0]), reverse=True)
+
+SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+def sample_rate(path: str) -> float:
+    for prefix, rate in SAMPLE_RATES:
+        if path.startswith(prefix):
+            return rate
+    return LOG_SAMPLE_RATE
+
+def redact(value):
+    """Copia de `value` con los campos sensibles reemplazados (dicts y listas anidados)"""
+    if isinstance(value, dict):
+        return {key: REDACTED if key in REDACTED_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+class ContextFilter(logging.Filter):
+    """Descarta INFO/DEBUG de peticiones no muestreadas y agrega método y ruta"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and not _sampled.get():
+            return False
+        for key, value in _request_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: redact(value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+def _message(record: logging.LogRecord) -> str:
+    # El mensaje se formatea recién aquí (formato perezoso), con los argumentos redactados
+    if record.args:
+        args = record.args
+        if isinstance(args, dict):
+            args = redact(args)
+        else:
+            args = tuple(redact(arg) if isinstance(arg, (dict, list)) else arg for arg in args)
+        return str(record.msg) % args
+    return str(record.msg)
+
+class JSONFormatter(logging.Formatter):
+    """Una línea JSON por registro: ts, level, logger, msg y los campos de `extra`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": _message(record),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo, con la misma redacción que el JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value}" for key, value in _fields(record).items())
+        line = f"{record.levelname}:{record.name}:{_message(record)}"
+        if fields:
+            line = f"{line} {fields}"
+        if record.exc_info:
+            line = f"{line}\n{self.formatException(record.exc_info)}"
+        return line
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None):
+    """Configuración única de logging para toda la aplicación (reemplaza basicConfig)"""
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+    handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # Una línea por petición HTTP a Supabase es ruido: ya se miden en metrics.py
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("uvicorn.access").disabled = True
+
+access_logger = logging.getLogger("hogar.access")
+
+class LoggingMiddleware:
+    """Decide el muestreo de cada petición y escribe una línea de acceso estructurada"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        sampled = random.random() < sample_rate(path)
+        sampled_token = _sampled.set(sampled)
+        context_token = _request_context.set({"method": scope["method"], "path": path})
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Los 5xx se registran siempre, aunque la petición no esté muestreada
+            level = logging.WARNING if status >= 500 else logging.INFO
+            if (sampled or level >= logging.WARNING) and access_logger.isEnabledFor(level):
+                access_logger.log(level, "request", extra={
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2)
+                })
+            _request_context.reset(context_token)
+            _sampled.reset(sampled_token)
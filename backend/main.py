@@ -1,9 +1,66 @@
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routers import residents, upload, family_contacts, medications
-from routers import vital_signs
+from routers import vital_signs, alerts, events, sync
+import supabase_client
+import shared_state
+import image_processing
+import dose_schedule
+import missed_doses
+from scheduler import scheduler
+from alerts import engine as alert_engine
+from resident_search import search_index
+from events import broker as event_broker
+from compression import CompressionMiddleware
+from idempotency import IdempotencyMiddleware
+from rate_limit import RateLimitMiddleware
+from metrics import MetricsMiddleware, render_prometheus
+from logging_config import LoggingMiddleware, setup_logging
 
-app = FastAPI()
+# Configuración de logging única para toda la aplicación (JSON, muestreo, redacción)
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crear el cliente sin tráfico de red; el chequeo de Storage corre en
+    # segundo plano para que /ping responda de inmediato.
+    supabase_client.init()
+    readiness_task = asyncio.create_task(supabase_client.monitor_readiness())
+    alert_engine.start()
+    event_broker.start()
+    search_index.start()
+    # Tareas periódicas: solo las ejecuta el worker que tenga el lease (ver scheduler.py)
+    scheduler.add_job('dose_slots', dose_schedule.DOSE_SLOT_REFRESH_HOURS * 3600, dose_schedule.refresh)
+    scheduler.add_job('missed_doses', missed_doses.MISSED_DOSE_SWEEP_SECONDS, missed_doses.sweep)
+    scheduler.start()
+    yield
+    readiness_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await readiness_task
+    await scheduler.stop()
+    await alert_engine.stop()
+    await event_broker.stop()
+    # Liberar el pool de conexiones HTTP compartido, el estado compartido y el pool de procesos
+    await supabase_client.close()
+    await shared_state.close()
+    image_processing.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+# Reintentos con Idempotency-Key: guarda la respuesta sin comprimir, así se
+# reenvía con la codificación que acepte cada reintento
+app.add_middleware(IdempotencyMiddleware)
+
+# gzip/brotli para respuestas JSON grandes (listas, calendarios)
+app.add_middleware(CompressionMiddleware)
+
+# Límite de peticiones por cliente (RATE_LIMIT_PER_MINUTE), compartido entre workers.
+# Va dentro de CORS para que los 429 lleven Access-Control-* y el navegador pueda leer Retry-After
+app.add_middleware(RateLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,18 +72,40 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    # Paginación por cursor de las listas (ver pagination.py) y tiempos por sección
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Server-Timing", "Retry-After", "Idempotent-Replayed"]
 )
 
+# La más externa: mide la petición completa (incluida la compresión) y agrega Server-Timing
+app.add_middleware(MetricsMiddleware)
+
+# Muestreo y contexto (método, ruta) de los logs de cada petición, más la línea de acceso
+app.add_middleware(LoggingMiddleware)
+
 # Incluir routers con prefijo /api
 app.include_router(residents.router, prefix="/api")
 app.include_router(upload.router, prefix="/api")
 app.include_router(family_contacts.router, prefix="/api")
 app.include_router(medications.router, prefix="/api")
 app.include_router(vital_signs.router, prefix="/api")
+app.include_router(alerts.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
+app.include_router(sync.router, prefix="/api")
 
 @app.get("/ping")
 def ping():
     return {"message": "pong", "status": "healthy"}
 
+@app.get("/ready")
+def ready():
+    """Indica si el backend de Supabase es alcanzable según el último chequeo"""
+    status_code = 200 if supabase_client.readiness["ready"] else 503
+    return JSONResponse(status_code=status_code, content=supabase_client.readiness)
+
+@app.get("/metrics")
+def get_metrics():
+    """Percentiles p50/p95/p99 por ruta y por tabla en formato de texto de Prometheus"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Comentario para forzar reinicio - Módulo de información médica implementado 
\ No newline at end of file
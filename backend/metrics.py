@@ -0,0 +1,198 @@
+import os
+import time
+import logging
+from collections import deque
+from contextvars import ContextVar
+from threading import Lock
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+# Cantidad de muestras recientes sobre las que se calculan los percentiles
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Consultas hechas durante la petición actual: [(tabla, operación, filas, inicio, fin)]
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+class RollingHistogram:
+    """Percentiles sobre las últimas `window` muestras, más conteo y suma acumulados"""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self) -> dict:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+class Registry:
+    """Histogramas por ruta y por tabla, compartidos por todo el proceso"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.routes = {}        # (method, route) -> RollingHistogram (segundos)
+        self.statuses = {}      # (method, route, status) -> peticiones
+        self.queries = {}       # (table, operation) -> RollingHistogram (segundos)
+        self.rows = {}          # (table, operation) -> filas devueltas
+        self.query_errors = {}  # (table, operation) -> consultas fallidas
+
+    def observe_request(self, method: str, route: str, status: int, duration: float):
+        with self._lock:
+            self.routes.setdefault((method, route), RollingHistogram()).observe(duration)
+            key = (method, route, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def observe_query(self, table: str, operation: str, rows: int, duration: float, failed: bool = False):
+        key = (table, operation)
+        with self._lock:
+            self.queries.setdefault(key, RollingHistogram()).observe(duration)
+            self.rows[key] = self.rows.get(key, 0) + rows
+            if failed:
+                self.query_errors[key] = self.query_errors.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self.routes.clear()
+            self.statuses.clear()
+            self.queries.clear()
+            self.rows.clear()
+            self.query_errors.clear()
+
+registry = Registry()
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _summary(lines: list, name: str, help_text: str, histograms: dict, label_names: tuple):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} summary")
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key))
+        for quantile, value in histogram.quantiles().items():
+            lines.append(f"{name}{_labels(**labels, quantile=quantile)} {value:.6f}")
+        lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+def _counter(lines: list, name: str, help_text: str, counters: dict, label_names: tuple):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key, value in sorted(counters.items()):
+        lines.append(f"{name}{_labels(**dict(zip(label_names, key)))} {value}")
+
+def render_prometheus() -> str:
+    """Métricas en formato de texto de Prometheus (summaries con p50/p95/p99)"""
+    lines = []
+    with registry._lock:
+        _summary(lines, "hogar_http_request_duration_seconds", "Duración de las peticiones HTTP por ruta",
+                 registry.routes, ("method", "route"))
+        _counter(lines, "hogar_http_requests_total", "Peticiones HTTP por ruta y código de estado",
+                 registry.statuses, ("method", "route", "status"))
+        _summary(lines, "hogar_supabase_query_duration_seconds", "Duración de las consultas a Supabase por tabla",
+                 registry.queries, ("table", "operation"))
+        _counter(lines, "hogar_supabase_rows_total", "Filas devueltas por Supabase por tabla",
+                 registry.rows, ("table", "operation"))
+        _counter(lines, "hogar_supabase_query_errors_total", "Consultas a Supabase fallidas por tabla",
+                 registry.query_errors, ("table", "operation"))
+    return "\n".join(lines) + "\n"
+
+OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+def describe_query(query) -> tuple:
+    """(tabla, operación) de un query builder de PostgREST"""
+    request = getattr(query, "request", None)
+    if request is None:
+        return "unknown", "unknown"
+    segments = request.path.path.rstrip("/").split("/")
+    method = getattr(request.http_method, "value", str(request.http_method))
+    if len(segments) >= 2 and segments[-2] == "rpc":
+        return segments[-1], "rpc"
+    operation = OPERATIONS.get(method, method.lower())
+    if operation == "insert" and "resolution=" in request.headers.get("prefer", ""):
+        operation = "upsert"
+    return segments[-1], operation
+
+def count_rows(result) -> int:
+    data = getattr(result, "data", None)
+    if isinstance(data, list):
+        return len(data)
+    return 1 if data else 0
+
+def record_query(table: str, operation: str, rows: int, start: float, end: float, failed: bool = False):
+    """Registra una consulta en las métricas del proceso y en la petición en curso"""
+    registry.observe_query(table, operation, rows, end - start, failed)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.append((table, operation, rows, start, end))
+    logger.debug("supabase %s %s: %d filas en %.1f ms", operation, table, rows, (end - start) * 1000)
+
+def _busy_time(intervals: list) -> float:
+    """Tiempo cubierto por la unión de intervalos (las consultas en paralelo no suman dos veces)"""
+    total = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+def server_timing(queries: list, elapsed: float) -> str:
+    """`db` = tiempo esperando a Supabase, `app` = el resto (validación, lógica, serialización)"""
+    db = _busy_time([(start, end) for _, _, _, start, end in queries])
+    return (
+        f'db;dur={db * 1000:.1f};desc="{len(queries)} consultas", '
+        f"app;dur={max(elapsed - db, 0) * 1000:.1f}, "
+        f"total;dur={elapsed * 1000:.1f}"
+    )
+
+class MetricsMiddleware:
+    """Mide cada petición: agrega Server-Timing a la respuesta y alimenta los histogramas por ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        queries = []
+        token = _request_queries.set(queries)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(raw=message["headers"])
+                timing = server_timing(queries, time.perf_counter() - start)
+                # Conserva los tiempos por sección que ya haya puesto el endpoint
+                existing = headers.get("server-timing")
+                headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_queries.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            registry.observe_request(scope["method"], path, status, time.perf_counter() - start)
@@ -0,0 +1,120 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from supabase_client import table, execute
+from pagination import fetch_all
+from dose_schedule import fetch_slots, SLOT_INSERT_CHUNK
+import facility_time
+from facility_time import TIMESTAMP_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto el líder del scheduler revisa las dosis de la ventana
+MISSED_DOSE_SWEEP_SECONDS = float(os.getenv("MISSED_DOSE_SWEEP_SECONDS", "300"))
+# Ventana revisada en cada barrido (hacia atrás desde ahora)
+MISSED_DOSE_LOOKBACK = timedelta(hours=float(os.getenv("MISSED_DOSE_LOOKBACK_HOURS", "24")))
+# Una administración cuenta para la franja si llega hasta este tiempo antes de la hora
+EARLY_TOLERANCE = timedelta(minutes=int(os.getenv("DOSE_EARLY_TOLERANCE_MINUTES", "60")))
+# Sin administrar pasado este tiempo la dosis está atrasada...
+LATE_AFTER = timedelta(minutes=int(os.getenv("DOSE_LATE_AFTER_MINUTES", "30")))
+# ...y pasado este, omitida
+MISSED_AFTER = timedelta(minutes=int(os.getenv("DOSE_MISSED_AFTER_MINUTES", "120")))
+
+# Estados que guarda el barrido en medication_dose_slots.status
+GIVEN = 'given'
+GIVEN_LATE = 'given_late'
+LATE = 'late'
+MISSED = 'missed'
+FLAGGED = (LATE, MISSED)
+
+last_sweep = {}
+
+def classify(slots: list, administrations: list, now: datetime) -> list:
+    """Estado de cada franja de una medicación en una sola pasada.
+
+    slots y administrations vienen ordenados por hora. Una administración
+    pertenece a la franja cuya ventana la contiene: desde EARLY_TOLERANCE antes
+    de su hora hasta que se abre la ventana de la franja siguiente. Devuelve
+    [(slot, estado, administered_at)]; estado None = todavía pendiente a tiempo.
+    """
+    result = []
+    j = 0
+    for i, slot in enumerate(slots):
+        scheduled_at = datetime.fromisoformat(slot['scheduled_at'])
+        opens = scheduled_at - EARLY_TOLERANCE
+        closes = datetime.fromisoformat(slots[i + 1]['scheduled_at']) - EARLY_TOLERANCE if i + 1 < len(slots) else None
+        # Administraciones anteriores a la ventana (extras o de franjas fuera del barrido)
+        while j < len(administrations) and administrations[j] < opens:
+            j += 1
+        given_at = None
+        if j < len(administrations) and (closes is None or administrations[j] < closes):
+            given_at = administrations[j]
+        while j < len(administrations) and (closes is None or administrations[j] < closes):
+            j += 1
+
+        if given_at is not None:
+            status = GIVEN if given_at <= scheduled_at + LATE_AFTER else GIVEN_LATE
+        elif now > scheduled_at + MISSED_AFTER:
+            status = MISSED
+        elif now > scheduled_at + LATE_AFTER:
+            status = LATE
+        else:
+            status = None
+        result.append((slot, status, given_at))
+    return result
+
+async def sweep(now: datetime = None) -> dict:
+    """Marca las franjas atrasadas u omitidas de toda la residencia.
+
+    Dos consultas masivas (franjas de la ventana e historial de la ventana) y
+    una pasada por medicación: O(franjas + administraciones). Solo se escriben
+    las franjas cuyo estado cambió. `now` y las franjas son hora local de la
+    residencia (FACILITY_TIMEZONE), no del servidor.
+    """
+    now = now or facility_time.now()
+    start = now - MISSED_DOSE_LOOKBACK
+    # Las franjas que abren hasta EARLY_TOLERANCE después de ahora delimitan la ventana de la anterior
+    slots = await fetch_slots(
+        start.strftime(TIMESTAMP_FORMAT), (now + EARLY_TOLERANCE).strftime(TIMESTAMP_FORMAT),
+        columns="medication_id, resident_id, slot_date, scheduled_at, status, administered_at"
+    )
+    history = await fetch_all(
+        lambda: table('medication_history').select("id, medication_id, administered_at")
+        .gte('administered_at', (start - EARLY_TOLERANCE).strftime(TIMESTAMP_FORMAT))
+        .lte('administered_at', now.strftime(TIMESTAMP_FORMAT)),
+        ['administered_at', 'id']
+    )
+
+    slots_by_medication = {}
+    for slot in slots:
+        slots_by_medication.setdefault(slot['medication_id'], []).append(slot)
+    administrations = {}
+    for record in history:
+        # Hora local sin zona (ver facility_time); to_local solo parsea si la fila ya sigue la convención
+        administered_at = facility_time.to_local(record['administered_at']).replace(microsecond=0)
+        administrations.setdefault(record['medication_id'], []).append(administered_at)
+
+    changes = []
+    counts = {GIVEN: 0, GIVEN_LATE: 0, LATE: 0, MISSED: 0}
+    for medication_id, medication_slots in slots_by_medication.items():
+        for slot, status, given_at in classify(medication_slots, administrations.get(medication_id, []), now):
+            if status is not None:
+                counts[status] += 1
+            administered_at = given_at.strftime(TIMESTAMP_FORMAT) if given_at else None
+            stored_at = slot['administered_at'][:19] if slot.get('administered_at') else None
+            if status != slot.get('status') or administered_at != stored_at:
+                changes.append({**slot, 'status': status, 'administered_at': administered_at})
+
+    for i in range(0, len(changes), SLOT_INSERT_CHUNK):
+        await execute(table('medication_dose_slots').upsert(changes[i:i + SLOT_INSERT_CHUNK], on_conflict='medication_id,scheduled_at'))
+
+    last_sweep.update({
+        "at": now.strftime(TIMESTAMP_FORMAT),
+        "slots": len(slots),
+        "administrations": len(history),
+        "updated": len(changes),
+        **counts
+    })
+    if counts[LATE] or counts[MISSED]:
+        logger.info("Missed-dose sweep: %s late, %s missed, %s slots updated", counts[LATE], counts[MISSED], len(changes))
+    return dict(last_sweep)
@@ -0,0 +1,97 @@
+import asyncio
+import base64
+import json
+from typing import List, Literal, Optional
+from fastapi import HTTPException, Response
+from supabase_client import execute
+
+# Ningún endpoint de listas devuelve más de MAX_PAGE_SIZE filas por petición
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Métodos de conteo de PostgREST; "estimated" y "planned" evitan el COUNT(*) completo
+CountMethod = Literal["exact", "planned", "estimated"]
+
+def encode_cursor(row: dict, columns: List[str]) -> str:
+    """Codifica los valores de las columnas clave de la última fila de la página"""
+    values = [row.get(column) for column in columns]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str, columns: List[str]) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+    return values
+
+def quote(value) -> str:
+    """Escapa un valor para usarlo dentro de un filtro or=(...) de PostgREST"""
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+def apply_keyset(query, columns: List[str], cursor: Optional[str], desc: bool = True):
+    """Ordena por las columnas clave y, si hay cursor, filtra las filas posteriores a él.
+
+    Con columnas (a, b) y orden descendente genera: a < x OR (a = x AND b < y),
+    que Postgres resuelve con el índice sobre (a, b) sin recorrer las páginas previas.
+    """
+    for column in columns:
+        query = query.order(column, desc=desc)
+    if not cursor:
+        return query
+
+    values = decode_cursor(cursor, columns)
+    op = 'lt' if desc else 'gt'
+    conditions = []
+    for i, column in enumerate(columns):
+        equal = [f"{columns[j]}.eq.{quote(values[j])}" for j in range(i)]
+        strict = f"{column}.{op}.{quote(values[i])}"
+        conditions.append(f"and({','.join(equal + [strict])})" if equal else strict)
+    return query.or_(','.join(conditions))
+
+async def fetch_page(query, columns: List[str], limit: int, cursor: Optional[str] = None, desc: bool = True):
+    """Ejecuta una página de keyset en un solo round trip.
+
+    Pide limit + 1 filas para saber si hay página siguiente sin contar.
+    Devuelve (filas, next_cursor, count); count solo viene si el select lo pidió
+    y, como el cursor es un filtro más, con cursor cuenta las filas restantes.
+    """
+    query = apply_keyset(query, columns, cursor, desc).limit(limit + 1)
+    response = await execute(query)
+    rows = response.data
+    next_cursor = encode_cursor(rows[limit - 1], columns) if len(rows) > limit else None
+    return rows[:limit], next_cursor, response.count
+
+def set_page_headers(response: Response, next_cursor: Optional[str], count: Optional[int] = None):
+    """Expone la paginación en headers para que las listas mantengan su forma (array)"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if count is not None:
+        response.headers["X-Total-Count"] = str(count)
+
+# PostgREST corta cada respuesta en max-rows (1000 por defecto en Supabase) y
+# fetch_page pide limit + 1 filas, así que cada bloque queda por debajo del tope
+FETCH_ALL_CHUNK = 999
+
+async def fetch_all(build_query, columns: List[str], desc: bool = False, chunk: int = FETCH_ALL_CHUNK) -> list:
+    """Recorre todas las páginas keyset de una consulta y devuelve todas las filas.
+
+    `build_query` arma la consulta base en cada vuelta (los builders no se reutilizan).
+    """
+    rows, cursor = [], None
+    while True:
+        page, cursor, _ = await fetch_page(build_query(), columns, chunk, cursor, desc)
+        rows.extend(page)
+        if cursor is None:
+            return rows
+
+# Valores por consulta en filtros in.(...): viajan en la URL, que los proxies limitan a unos pocos KB
+IN_FILTER_CHUNK = 200
+
+async def fetch_in(build_query, column: str, values: list, chunk: int = IN_FILTER_CHUNK) -> list:
+    """Filas con `column` en `values`, en consultas paralelas de a `chunk` valores"""
+    chunks = [values[i:i + chunk] for i in range(0, len(values), chunk)]
+    responses = await asyncio.gather(*(execute(build_query().in_(column, part)) for part in chunks))
+    return [row for response in responses for row in response.data]
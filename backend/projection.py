@@ -0,0 +1,44 @@
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple, Type
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+# `fields=*` devuelve las filas completas, como antes de las proyecciones
+ALL_FIELDS = '*'
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel], default: Sequence[str],
+                 keys: Sequence[str] = ('id',)) -> Optional[Tuple[str, ...]]:
+    """Columnas pedidas en `fields=` (separadas por coma), validadas contra el modelo.
+
+    Sin `fields` se usa la proyección liviana `default`; con `*`, todas las
+    columnas (None). Las columnas de `keys` (id y clave keyset) se agregan
+    siempre: el cursor de la página siguiente se arma con ellas.
+    """
+    if fields is not None and fields.strip() == ALL_FIELDS:
+        return None
+    requested = [field.strip() for field in fields.split(',') if field.strip()] if fields is not None else list(default)
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos desconocidos: {', '.join(unknown)}. Disponibles: {', '.join(model.model_fields)}"
+        )
+    return tuple(dict.fromkeys(requested + list(keys)))
+
+def select_columns(columns: Optional[Sequence[str]]) -> str:
+    """Argumento de select() de PostgREST para la proyección"""
+    return ', '.join(columns) if columns else ALL_FIELDS
+
+@lru_cache(maxsize=None)
+def projection_model(model: Type[BaseModel], columns: Tuple[str, ...], name: Optional[str] = None) -> Type[BaseModel]:
+    """Modelo con solo las columnas de la proyección (mismos tipos y descripciones).
+
+    Se usa como response_model de las vistas livianas para que la
+    documentación OpenAPI muestre la forma real de la respuesta.
+    """
+    definitions = {column: (model.model_fields[column].annotation, model.model_fields[column]) for column in columns}
+    return create_model(name or f"{model.__name__}Projection", **definitions)
+
+def fields_description(model: Type[BaseModel], default: Sequence[str]) -> str:
+    return (f"Columnas a devolver, separadas por coma (`*` = todas). "
+            f"Por defecto: {', '.join(default)}. Disponibles: {', '.join(model.model_fields)}")
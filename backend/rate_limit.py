@@ -0,0 +1,69 @@
+import os
+import time
+import logging
+from starlette.datastructures import Headers
+from serialization import ORJSONResponse
+import shared_state
+
+logger = logging.getLogger(__name__)
+
+# Peticiones por cliente y por minuto a /api/ (0 = sin límite). Desactivado por
+# defecto: todas las tabletas de la residencia salen por la misma IP pública.
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "0"))
+RATE_LIMIT_WINDOW = 60
+# Proxies de confianza delante de la app que agregan su entrada a X-Forwarded-For
+# (el balanceador de Render es uno; 0 = usar la IP de la conexión)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+def client_id(scope, trusted_hops: int = TRUSTED_PROXY_HOPS) -> str:
+    """IP del cliente según el último proxy de confianza.
+
+    Cada proxy agrega al final de X-Forwarded-For la IP de quien le habló; las
+    entradas anteriores las pone el propio cliente y se pueden falsificar. Con
+    `trusted_hops` proxies delante (Render: 1) la IP real es la entrada número
+    `trusted_hops` contando desde el final. Sin proxies se usa la conexión.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if trusted_hops <= 0:
+        return peer
+    forwarded = Headers(scope=scope).get("x-forwarded-for")
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()] if forwarded else []
+    if not hops:
+        return peer
+    return hops[-min(trusted_hops, len(hops))]
+
+class RateLimitMiddleware:
+    """Límite de peticiones por cliente en ventanas fijas de un minuto.
+
+    El contador vive en el estado compartido (INCR en Redis), así el límite es
+    por cliente y no por worker. Si el backend falla, la petición pasa.
+    """
+
+    def __init__(self, app, limit: int = RATE_LIMIT_PER_MINUTE):
+        self.app = app
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if (self.limit <= 0 or scope["type"] != "http" or scope["method"] == "OPTIONS"
+                or not scope["path"].startswith("/api/")):
+            await self.app(scope, receive, send)
+            return
+
+        now = time.time()
+        window = int(now // RATE_LIMIT_WINDOW)
+        try:
+            count = await shared_state.get_backend().incr(f"rate:{client_id(scope)}:{window}", RATE_LIMIT_WINDOW)
+        except Exception as e:
+            logger.warning("Rate limit store unavailable, allowing request: %s", e)
+            count = 0
+
+        if count > self.limit:
+            retry_after = int((window + 1) * RATE_LIMIT_WINDOW - now) + 1
+            response = ORJSONResponse(
+                {"detail": "Demasiadas peticiones, intente de nuevo en unos segundos"},
+                status_code=429, headers={"Retry-After": str(retry_after), "X-RateLimit-Limit": str(self.limit)}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,237 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import unicodedata
+from collections import Counter
+from typing import Iterable, List, Optional
+import orjson
+import shared_state
+from supabase_client import table
+from pagination import fetch_all
+
+logger = logging.getLogger(__name__)
+
+# Tras este tiempo el índice se reconstruye en segundo plano (recoge lo que no llegó por el canal)
+RESIDENT_INDEX_TTL = float(os.getenv("RESIDENT_INDEX_TTL", "300"))
+# Parte de los trigramas de la búsqueda que debe aparecer en el nombre (como word_similarity de pg_trgm)
+SEARCH_THRESHOLD = float(os.getenv("RESIDENT_SEARCH_THRESHOLD", "0.5"))
+
+# Columnas que guarda el índice y devuelve la búsqueda
+INDEX_COLUMNS = "id, name, status, photo_url, document_number, blood_type, pathologies, allergies, discharge_date"
+# Puntaje de una coincidencia exacta de documento (siempre por encima de cualquier nombre)
+DOCUMENT_SCORE = 2.0
+# Canal del estado compartido por el que cada worker avisa a los demás de sus escrituras
+RESIDENT_INDEX_CHANNEL = 'resident-index'
+
+def normalize(text: Optional[str]) -> str:
+    """Minúsculas, sin tildes y con cualquier signo convertido en espacio: 'José-María' -> 'jose maria'"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+    return ' '.join(''.join(char if char.isalnum() else ' ' for char in stripped).split())
+
+def normalize_document(text: Optional[str]) -> str:
+    """'1.234.567-8' -> '12345678'"""
+    return ''.join(char for char in normalize(text) if char.isalnum())
+
+def normalize_blood_type(text: Optional[str]) -> str:
+    return (text or '').replace(' ', '').upper()
+
+def trigrams(text: str) -> set:
+    """Trigramas por palabra, con el mismo relleno que pg_trgm ('  jo', ' jos', ..., 'se ')"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class ResidentSearchIndex:
+    """Índice en memoria de residentes: trigramas del nombre, documento exacto y filtros.
+
+    Se carga completo la primera vez que se busca y después se mantiene con
+    cada escritura del router de residentes (upsert / remove). Es por proceso:
+    con Redis cada escritura se publica en RESIDENT_INDEX_CHANNEL y los demás
+    workers la aplican a su copia; además se reconstruye en segundo plano cada
+    RESIDENT_INDEX_TTL segundos por si se perdió algún aviso.
+    """
+
+    def __init__(self):
+        self.rows = {}            # id -> fila con INDEX_COLUMNS
+        self.names = {}           # id -> nombre normalizado
+        self.grams = {}           # id -> trigramas del nombre
+        self.postings = {}        # trigrama -> {id}
+        self.documents = {}       # documento normalizado -> {id}
+        self.filters = {}         # (campo, valor normalizado) -> {id}
+        self.loaded_at: Optional[float] = None
+        self.loading: Optional[asyncio.Task] = None
+        self.origin = uuid.uuid4().hex
+        self.relayed = 0
+
+    def clear(self):
+        self.rows, self.names, self.grams, self.postings, self.documents, self.filters = {}, {}, {}, {}, {}, {}
+
+    def filter_keys(self, row: dict) -> List[tuple]:
+        keys = [('status', row.get('status'))]
+        if row.get('blood_type'):
+            keys.append(('blood_type', normalize_blood_type(row['blood_type'])))
+        keys.extend(('pathologies', normalize(value)) for value in row.get('pathologies') or [])
+        keys.extend(('allergies', normalize(value)) for value in row.get('allergies') or [])
+        keys.append(('active', row.get('discharge_date') is None))
+        return keys
+
+    def upsert(self, row: dict):
+        """Agrega o reemplaza un residente (se llama desde las escrituras del router)"""
+        if self.loaded_at is None or not row.get('id'):
+            return
+        resident_id = row['id']
+        self.remove(resident_id)
+        entry = {column.strip(): row.get(column.strip()) for column in INDEX_COLUMNS.split(',')}
+        self.rows[resident_id] = entry
+        self.names[resident_id] = normalize(entry['name'])
+        grams = trigrams(self.names[resident_id])
+        self.grams[resident_id] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(resident_id)
+        document = normalize_document(entry.get('document_number'))
+        if document:
+            self.documents.setdefault(document, set()).add(resident_id)
+        for key in self.filter_keys(entry):
+            self.filters.setdefault(key, set()).add(resident_id)
+
+    def remove(self, resident_id: str):
+        entry = self.rows.pop(resident_id, None)
+        if entry is None:
+            return
+        del self.names[resident_id]
+        for gram in self.grams.pop(resident_id, ()):
+            self.postings[gram].discard(resident_id)
+            if not self.postings[gram]:
+                del self.postings[gram]
+        document = normalize_document(entry.get('document_number'))
+        if document in self.documents:
+            self.documents[document].discard(resident_id)
+            if not self.documents[document]:
+                del self.documents[document]
+        for key in self.filter_keys(entry):
+            ids = self.filters.get(key)
+            if ids is not None:
+                ids.discard(resident_id)
+                if not ids:
+                    del self.filters[key]
+
+    async def publish(self, resident_id: str, row: Optional[dict] = None):
+        """Avisa a los demás workers del cambio (row=None: el residente se quita del índice)"""
+        backend = shared_state.get_backend()
+        if not backend.shared:
+            return
+        entry = {column.strip(): row.get(column.strip()) for column in INDEX_COLUMNS.split(',')} if row else None
+        message = orjson.dumps({"origin": self.origin, "id": resident_id, "row": entry}, default=str)
+        try:
+            await backend.publish(RESIDENT_INDEX_CHANNEL, message)
+        except Exception as e:
+            logger.warning("Could not relay resident %s to the other search indexes: %s", resident_id, e)
+
+    def receive(self, message: bytes):
+        """Cambio hecho por otro worker (llega por el canal compartido)"""
+        change = orjson.loads(message)
+        if change["origin"] == self.origin:
+            return
+        self.relayed += 1
+        if change["row"] is not None:
+            self.upsert(change["row"])
+        else:
+            self.remove(change["id"])
+
+    def start(self):
+        backend = shared_state.get_backend()
+        if backend.shared:
+            backend.subscribe(RESIDENT_INDEX_CHANNEL, self.receive)
+
+    def load(self, rows: Iterable[dict]):
+        self.clear()
+        self.loaded_at = time.monotonic()
+        for row in rows:
+            self.upsert(row)
+
+    async def reload(self):
+        rows = await fetch_all(lambda: table('residents').select(INDEX_COLUMNS), ['id'])
+        self.load(rows)
+        logger.info("Resident search index loaded: %s residents", len(rows))
+
+    async def ensure_loaded(self):
+        """Primera búsqueda: carga y espera; índice vencido: se sirve el actual y se recarga aparte"""
+        if self.loaded_at is None:
+            if self.loading is None or self.loading.done():
+                self.loading = asyncio.create_task(self.reload())
+            await asyncio.shield(self.loading)
+        elif time.monotonic() - self.loaded_at > RESIDENT_INDEX_TTL and (self.loading is None or self.loading.done()):
+            self.loading = asyncio.create_task(self.reload())
+
+    def candidates(self, filters: List[tuple]) -> Optional[set]:
+        """Intersección de los filtros, empezando por el más selectivo; None = sin filtros"""
+        if not filters:
+            return None
+        sets = sorted((self.filters.get(key, set()) for key in filters), key=len)
+        result = set(sets[0])
+        for ids in sets[1:]:
+            result &= ids
+        return result
+
+    def search(self, q: Optional[str] = None, status: Optional[str] = None, pathologies: Optional[List[str]] = None,
+               allergies: Optional[List[str]] = None, blood_type: Optional[str] = None, active: Optional[bool] = None) -> list:
+        """Residentes que cumplen los filtros, ordenados por puntaje y nombre: [(puntaje, fila)]"""
+        filters = []
+        if status:
+            filters.append(('status', status))
+        if blood_type:
+            filters.append(('blood_type', normalize_blood_type(blood_type)))
+        filters.extend(('pathologies', normalize(value)) for value in pathologies or [])
+        filters.extend(('allergies', normalize(value)) for value in allergies or [])
+        if active is not None:
+            filters.append(('active', active))
+        allowed = self.candidates(filters)
+
+        query = normalize(q)
+        if not query:
+            ids = allowed if allowed is not None else self.rows.keys()
+            return [(0.0, self.rows[resident_id]) for resident_id in sorted(ids, key=self.names.__getitem__)]
+
+        scores = {}
+        # Documento: coincidencia exacta (sin puntos ni guiones)
+        for resident_id in self.documents.get(normalize_document(q), ()):
+            scores[resident_id] = DOCUMENT_SCORE
+
+        # Nombre: trigramas compartidos, tolera tildes y errores de tipeo
+        query_grams = trigrams(query)
+        hits = Counter()
+        for gram in query_grams:
+            hits.update(self.postings.get(gram, ()))
+        words = query.split()
+        for resident_id, shared in hits.items():
+            coverage = shared / len(query_grams)
+            if coverage < SEARCH_THRESHOLD or resident_id in scores:
+                continue
+            name_words = self.names[resident_id].split()
+            # Desempate: similitud de todo el nombre y palabras que empiezan igual que lo buscado
+            similarity = shared / (len(query_grams) + len(self.grams[resident_id]) - shared)
+            prefix = sum(1 for word in words if any(name_word.startswith(word) for name_word in name_words)) / len(words)
+            scores[resident_id] = round(coverage + 0.5 * similarity + 0.25 * prefix, 4)
+
+        ranked = sorted(
+            (resident_id for resident_id in scores if allowed is None or resident_id in allowed),
+            key=lambda resident_id: (-scores[resident_id], self.names[resident_id])
+        )
+        return [(scores[resident_id], self.rows[resident_id]) for resident_id in ranked]
+
+    def stats(self) -> dict:
+        return {
+            "residents": len(self.rows),
+            "trigrams": len(self.postings),
+            "relayed": self.relayed,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.loaded_at is not None else None
+        }
+
+search_index = ResidentSearchIndex()
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, Optional, Tuple
+from alerts import engine, DEFAULT_THRESHOLDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Campos de un signo vital que admiten umbral
+THRESHOLD_FIELDS = {'value', 'systolic', 'diastolic'}
+
+@router.get("/alerts")
+async def get_alerts(
+    resident_id: Optional[str] = None,
+    since_id: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Feed de alertas de signos vitales, más recientes primero.
+
+    `since_id` devuelve solo las alertas posteriores a la última que ya tiene
+    el cliente (para consultar el feed periódicamente).
+    """
+    try:
+        return await engine.alerts(resident_id, since_id, limit)
+    except Exception as e:
+        logger.error("Error getting alerts: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/alerts/stats")
+def get_alert_stats():
+    """Lecturas evaluadas, descartadas y en cola del motor de alertas"""
+    return engine.stats()
+
+@router.get("/alerts/thresholds")
+def get_default_thresholds():
+    """Umbrales por defecto (mínimo, máximo) por tipo de signo vital"""
+    return DEFAULT_THRESHOLDS
+
+@router.get("/alerts/thresholds/{resident_id}")
+async def get_resident_thresholds(resident_id: str):
+    """Umbrales efectivos de un residente (por defecto más los propios)"""
+    try:
+        return await engine.thresholds(resident_id)
+    except Exception as e:
+        logger.error("Error getting alert thresholds: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/alerts/thresholds/{resident_id}")
+async def update_resident_thresholds(resident_id: str, thresholds: Dict[str, Dict[str, Tuple[Optional[float], Optional[float]]]]):
+    """Reemplazar los umbrales propios de un residente, p. ej. {"Presión Arterial": {"systolic": [90, 150]}}"""
+    for vital_type, fields in thresholds.items():
+        unknown = set(fields) - THRESHOLD_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campos no válidos para {vital_type}: {', '.join(sorted(unknown))}")
+        for field, (low, high) in fields.items():
+            if low is not None and high is not None and low > high:
+                raise HTTPException(status_code=400, detail=f"{vital_type}.{field}: el mínimo supera al máximo")
+    try:
+        await engine.set_overrides(resident_id, thresholds)
+        logger.info("Alert thresholds updated for resident %s", resident_id)
+        return await engine.thresholds(resident_id)
+    except Exception as e:
+        logger.error("Error updating alert thresholds: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/alerts/thresholds/{resident_id}")
+async def delete_resident_thresholds(resident_id: str):
+    """Volver a los umbrales por defecto"""
+    try:
+        await engine.delete_overrides(resident_id)
+        return {"message": "Umbrales restablecidos"}
+    except Exception as e:
+        logger.error("Error deleting alert thresholds: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from events import broker
+
+router = APIRouter()
+
+# Temas que un cliente puede pedir en ?topics=
+TOPICS = {'medication', 'vital_sign', 'resident', 'alert'}
+
+@router.get("/events")
+async def stream_events(request: Request, topics: Optional[str] = None, resident_id: Optional[str] = None):
+    """Stream SSE con los cambios (administraciones, signos vitales, residentes, alertas).
+
+    Reemplaza el polling del dashboard: `topics` (separados por coma) y
+    `resident_id` filtran los eventos. Al reconectar, EventSource envía
+    Last-Event-ID y se reenvían los eventos recientes que el cliente no recibió.
+    """
+    selected = None
+    if topics:
+        selected = {topic.strip() for topic in topics.split(',') if topic.strip()}
+        unknown = selected - TOPICS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Temas no válidos: {', '.join(sorted(unknown))}")
+
+    last_event_id = request.headers.get('last-event-id') or request.query_params.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscriber = broker.subscribe(selected, resident_id, last_event_id)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Demasiadas conexiones en vivo, reintente más tarde")
+
+    return StreamingResponse(
+        broker.stream(subscriber),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Evita que nginx/Render acumulen el stream en un buffer
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@router.get("/events/stats")
+def get_event_stats():
+    """Conexiones abiertas y eventos publicados en este worker"""
+    return broker.stats()
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
-from supabase_client import supabase_client
+from supabase_client import table, execute
+from conditional import conditional_response
+from projection import parse_fields, select_columns, projection_model, fields_description
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,26 +28,40 @@ class FamilyContact(BaseModel):
 
 router = APIRouter()
 
-@router.get("/family-contacts/resident/{resident_id}", response_model=List[FamilyContact])
-async def get_resident_contacts(resident_id: str):
+# Proyección por defecto de la lista: sin columnas de auditoría
+CONTACT_LIST_FIELDS = ('id', 'resident_id', 'name', 'relationship', 'phone', 'is_primary', 'address', 'notes')
+FamilyContactListItem = projection_model(FamilyContact, CONTACT_LIST_FIELDS, 'FamilyContactListItem')
+
+@router.get("/family-contacts/resident/{resident_id}", response_model=List[FamilyContactListItem])
+async def get_resident_contacts(
+    resident_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=fields_description(FamilyContact, CONTACT_LIST_FIELDS))
+):
     """Obtener todos los contactos familiares de un residente"""
     try:
-        response = supabase_client.table('family_contacts').select("*").eq('resident_id', resident_id).execute()
-        return response.data
+        columns = select_columns(parse_fields(fields, FamilyContact, CONTACT_LIST_FIELDS))
+        result = await execute(table('family_contacts').select(columns).eq('resident_id', resident_id))
+        return conditional_response(request, response, result.data, raw=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting family contacts for resident {resident_id}: {str(e)}")
+        logger.error("Error getting family contacts for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/family-contacts/{contact_id}", response_model=FamilyContact)
-async def get_contact(contact_id: str):
+async def get_contact(contact_id: str, request: Request, response: Response):
     """Obtener un contacto familiar específico"""
     try:
-        response = supabase_client.table('family_contacts').select("*").eq('id', contact_id).execute()
-        if not response.data:
+        result = await execute(table('family_contacts').select("*").eq('id', contact_id))
+        if not result.data:
             raise HTTPException(status_code=404, detail="Contacto familiar no encontrado")
-        return response.data[0]
+        return conditional_response(request, response, result.data[0])
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting family contact {contact_id}: {str(e)}")
+        logger.error("Error getting family contact %s: %s", contact_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/family-contacts/", response_model=FamilyContact)
@@ -54,10 +70,11 @@ async def create_contact(contact: FamilyContact):
     try:
         # Si es contacto primario, desmarcar otros contactos primarios del mismo residente
         if contact.is_primary:
-            supabase_client.table('family_contacts')\
-                .update({'is_primary': False})\
-                .eq('resident_id', contact.resident_id)\
-                .execute()
+            await execute(
+                table('family_contacts')
+                .update({'is_primary': False})
+                .eq('resident_id', contact.resident_id)
+            )
 
         data = contact.dict(exclude_unset=True)
         if 'id' in data:
@@ -67,11 +84,11 @@ async def create_contact(contact: FamilyContact):
         if 'updated_at' in data:
             del data['updated_at']
 
-        logger.info(f"Creating family contact: {data}")
-        response = supabase_client.table('family_contacts').insert(data).execute()
+        logger.debug("Creating family contact", extra={"data": data})
+        response = await execute(table('family_contacts').insert(data))
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error creating family contact: {str(e)}")
+        logger.error("Error creating family contact: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/family-contacts/{contact_id}", response_model=FamilyContact)
@@ -80,10 +97,11 @@ async def update_contact(contact_id: str, contact: FamilyContact):
     try:
         # Si se está marcando como primario, desmarcar otros contactos primarios
         if contact.is_primary:
-            supabase_client.table('family_contacts')\
-                .update({'is_primary': False})\
-                .eq('resident_id', contact.resident_id)\
-                .execute()
+            await execute(
+                table('family_contacts')
+                .update({'is_primary': False})
+                .eq('resident_id', contact.resident_id)
+            )
 
         data = contact.dict(exclude_unset=True)
         if 'id' in data:
@@ -93,24 +111,24 @@ async def update_contact(contact_id: str, contact: FamilyContact):
         if 'updated_at' in data:
             del data['updated_at']
 
-        logger.info(f"Updating family contact {contact_id}: {data}")
-        response = supabase_client.table('family_contacts').update(data).eq('id', contact_id).execute()
+        logger.debug("Updating family contact %s", contact_id, extra={"data": data})
+        response = await execute(table('family_contacts').update(data).eq('id', contact_id))
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Contacto familiar no encontrado")
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error updating family contact {contact_id}: {str(e)}")
+        logger.error("Error updating family contact %s: %s", contact_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/family-contacts/{contact_id}")
 async def delete_contact(contact_id: str):
     """Eliminar un contacto familiar"""
     try:
-        response = supabase_client.table('family_contacts').delete().eq('id', contact_id).execute()
+        response = await execute(table('family_contacts').delete().eq('id', contact_id))
         if not response.data:
             raise HTTPException(status_code=404, detail="Contacto familiar no encontrado")
         return {"message": "Contacto familiar eliminado"}
     except Exception as e:
-        logger.error(f"Error deleting family contact {contact_id}: {str(e)}")
+        logger.error("Error deleting family contact %s: %s", contact_id, e)
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
-from datetime import datetime, time, date
-from pydantic import BaseModel
-from supabase_client import supabase_client
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from datetime import datetime, time, date, timedelta
+from pydantic import BaseModel, Field
+from supabase_client import table, execute
+from conditional import conditional_response, not_modified
+from serialization import raw_json
+from events import broker
+from dose_schedule import parse_frequency, schedule_of, slots_for_day, materialize, rematerialize, fetch_slots, group_slots
+from missed_doses import FLAGGED, MISSED_DOSE_LOOKBACK
+import facility_time
+from scheduler import scheduler
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CountMethod, fetch_all, fetch_in, fetch_page, set_page_headers
+from projection import parse_fields, select_columns, projection_model, fields_description
+import asyncio
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +35,8 @@ class Medication(MedicationBase):
     id: str
     administered_at: Optional[datetime] = None
     administered_by_user_id: Optional[str] = None
+    # Frecuencia ya interpretada (ver dose_schedule.parse_frequency)
+    schedule: Optional[dict] = None
     class Config:
         orm_mode = True
 
@@ -38,28 +52,205 @@ class MedicationHistory(BaseModel):
     class Config:
         orm_mode = True
 
+# Largo máximo de idempotency_key (las claves viajan en la URL del filtro in.())
+IDEMPOTENCY_KEY_MAX_LENGTH = 200
+
+class AdministrationEntry(BaseModel):
+    medication_id: str
+    user_id: str
+    administered_at: Optional[datetime] = None
+    # Clave generada por el cliente: reintentos con la misma clave no duplican la dosis
+    idempotency_key: Optional[str] = Field(None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH)
+
 router = APIRouter()
 
-@router.get("/medications/resident/{resident_id}", response_model=List[Medication])
-async def get_resident_medications(resident_id: str):
+# Máximo de administraciones por lote
+MAX_BATCH_SIZE = 500
+
+# Clave de paginación keyset del historial: índice sugerido (resident_id, administered_at desc, id desc)
+HISTORY_KEY = ['administered_at', 'id']
+
+# Proyecciones por defecto de las listas: sin el horario interpretado (schedule)
+# ni las columnas de auditoría; se piden con fields=
+MEDICATION_LIST_FIELDS = ('id', 'resident_id', 'med_name', 'dosage', 'frequency', 'scheduled_time', 'notes',
+                          'administered_at', 'administered_by_user_id')
+HISTORY_LIST_FIELDS = ('id', 'medication_id', 'resident_id', 'med_name', 'dosage', 'administered_at',
+                       'administered_by_user_id', 'notes')
+MedicationListItem = projection_model(Medication, MEDICATION_LIST_FIELDS, 'MedicationListItem')
+MedicationHistoryListItem = projection_model(MedicationHistory, HISTORY_LIST_FIELDS, 'MedicationHistoryListItem')
+
+# Ventana por defecto y máxima de /medications/due
+DUE_WINDOW_MINUTES = 60
+MAX_DUE_WINDOW_MINUTES = 720
+
+async def fetch_today_history(today: str) -> list:
+    """Administraciones de hoy de toda la residencia, recorriendo todas las páginas"""
+    return await fetch_all(
+        lambda: table('medication_history').select("id, medication_id, administered_at")
+        .gte('administered_at', f"{today}T00:00:00").lt('administered_at', f"{next_day(today)}T00:00:00"),
+        HISTORY_KEY
+    )
+
+@router.get("/medications/resident/{resident_id}", response_model=List[MedicationListItem])
+async def get_resident_medications(
+    resident_id: str,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=fields_description(Medication, MEDICATION_LIST_FIELDS))
+):
     """Obtener todas las medicaciones de un residente"""
     try:
-        response = supabase_client.table('medications').select("*").eq('resident_id', resident_id).execute()
-        return response.data
+        columns = select_columns(parse_fields(fields, Medication, MEDICATION_LIST_FIELDS))
+        result = await execute(table('medications').select(columns).eq('resident_id', resident_id))
+        return conditional_response(request, response, result.data, raw=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting medications for resident {resident_id}: {str(e)}")
+        logger.error("Error getting medications for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/medications/today-status")
+async def get_facility_today_status(request: Request, response: Response):
+    """Estado de medicación de hoy para todos los residentes activos (ronda de enfermería)"""
+    try:
+        today = facility_time.today().isoformat()
+
+        # Consultas masivas en paralelo en lugar de dos por residente; paginadas
+        # porque en toda la residencia superan el max-rows de PostgREST
+        residents, medications, history, slots = await asyncio.gather(
+            fetch_all(lambda: table('residents').select("id, name, photo_url").is_('discharge_date', 'null'), ['name', 'id']),
+            fetch_all(lambda: table('medications').select("*"), ['id']),
+            fetch_today_history(today),
+            fetch_slots(f"{today}T00:00:00", f"{next_day(today)}T00:00:00")
+        )
+    except Exception as e:
+        logger.error("Error getting facility medication status: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    unchanged = not_modified(request, response, (today, residents, medications, history, slots))
+    if unchanged is not None:
+        return unchanged
+
+    medications_by_resident = {}
+    for medication in medications:
+        medications_by_resident.setdefault(medication['resident_id'], []).append(medication)
+    summary = summarize_history(history)
+    slots_by_medication = group_slots(slots)
+
+    async def stream():
+        # Se emite un residente a la vez para que el cliente pueda renderizar
+        # las primeras filas antes de recibir el documento completo
+        yield f'{{"date": "{today}", "residents": ['.encode()
+        for i, resident in enumerate(residents):
+            medication_status = build_medication_status(medications_by_resident.get(resident['id'], []), summary, slots_by_medication)
+            entry = {
+                "resident_id": resident['id'],
+                "name": resident['name'],
+                "photo_url": resident.get('photo_url'),
+                "pending": sum(1 for status in medication_status if status['can_administer']),
+                "medications": medication_status
+            }
+            yield (b"," if i else b"") + orjson.dumps(entry, default=str)
+        yield b"]}"
+
+    return StreamingResponse(stream(), media_type="application/json", headers=dict(response.headers))
+
+@router.get("/medications/due")
+async def get_due_doses(window_minutes: int = Query(DUE_WINDOW_MINUTES, ge=0, le=MAX_DUE_WINDOW_MINUTES)):
+    """Dosis de hoy pendientes hasta dentro de `window_minutes` (las ya vencidas marcadas como overdue).
+
+    Sale de las franjas materializadas en medication_dose_slots: las primeras
+    N franjas del día de cada medicación se dan por cubiertas por sus N
+    administraciones de hoy.
+    """
+    try:
+        now = facility_time.now()
+        today = now.strftime('%Y-%m-%d')
+        until = (now + timedelta(minutes=window_minutes)).strftime('%Y-%m-%dT%H:%M:%S')
+        slots, history, medication_rows = await asyncio.gather(
+            fetch_slots(f"{today}T00:00:00", min(until, f"{next_day(today)}T00:00:00")),
+            fetch_today_history(today),
+            fetch_all(lambda: table('medications').select("id, resident_id, med_name, dosage"), ['id'])
+        )
+    except Exception as e:
+        logger.error("Error getting due doses: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    now_text = now.strftime('%Y-%m-%dT%H:%M:%S')
+    medications = {medication['id']: medication for medication in medication_rows}
+    summary = summarize_history(history)
+    due = []
+    for medication_id, times in group_slots(slots).items():
+        medication = medications.get(medication_id)
+        if medication is None:
+            continue
+        administered, _ = summary.get(medication_id, (0, None))
+        for scheduled_at in times[administered:]:
+            due.append({
+                "medication_id": medication_id,
+                "resident_id": medication['resident_id'],
+                "med_name": medication['med_name'],
+                "dosage": medication['dosage'],
+                "scheduled_at": scheduled_at,
+                "overdue": scheduled_at <= now_text
+            })
+    due.sort(key=lambda dose: dose['scheduled_at'])
+    return raw_json({"now": now_text, "window_minutes": window_minutes, "due": due})
+
+@router.get("/medications/missed")
+async def get_missed_doses(
+    status: Optional[Literal['late', 'missed']] = None,
+    resident_id: Optional[str] = None,
+    since: Optional[str] = None
+):
+    """Dosis atrasadas u omitidas que marcó el barrido periódico (ver missed_doses.py).
+
+    Por defecto cubre las últimas MISSED_DOSE_LOOKBACK_HOURS; `since` acepta una
+    fecha u hora ISO. Cualquier worker responde: los estados viven en
+    medication_dose_slots, aunque el barrido solo lo haga el líder.
+    """
+    try:
+        since = since or (facility_time.now() - MISSED_DOSE_LOOKBACK).strftime('%Y-%m-%dT%H:%M:%S')
+        query = (
+            table('medication_dose_slots').select("medication_id, resident_id, scheduled_at, status")
+            .in_('status', [status] if status else list(FLAGGED))
+            .gte('scheduled_at', since)
+        )
+        if resident_id:
+            query = query.eq('resident_id', resident_id)
+        slots_response = await execute(query.order('scheduled_at', desc=True).limit(MAX_PAGE_SIZE))
+
+        medication_ids = list({slot['medication_id'] for slot in slots_response.data})
+        medication_rows = await fetch_in(lambda: table('medications').select("id, med_name, dosage"), 'id', medication_ids)
+        medications = {medication['id']: medication for medication in medication_rows}
+    except Exception as e:
+        logger.error("Error getting missed doses: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    doses = []
+    for slot in slots_response.data:
+        medication = medications.get(slot['medication_id'])
+        if medication is None:
+            continue
+        doses.append({**slot, "med_name": medication['med_name'], "dosage": medication['dosage']})
+    return raw_json({
+        "since": since,
+        "doses": doses,
+        "scheduler": scheduler.stats()
+    })
+
 @router.get("/medications/{medication_id}", response_model=Medication)
-async def get_medication(medication_id: str):
+async def get_medication(medication_id: str, request: Request, response: Response):
     """Obtener una medicación específica"""
     try:
-        response = supabase_client.table('medications').select("*").eq('id', medication_id).execute()
-        if not response.data:
+        result = await execute(table('medications').select("*").eq('id', medication_id))
+        if not result.data:
             raise HTTPException(status_code=404, detail="Medicación no encontrada")
-        return response.data[0]
+        return conditional_response(request, response, result.data[0])
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting medication {medication_id}: {str(e)}")
+        logger.error("Error getting medication %s: %s", medication_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/medications/", response_model=Medication)
@@ -72,12 +263,16 @@ async def create_medication(medication: MedicationCreate):
         if data.get('scheduled_time'):
             if isinstance(data['scheduled_time'], time):
                 data['scheduled_time'] = data['scheduled_time'].strftime('%H:%M:%S')
+        # La frecuencia se interpreta una sola vez aquí, no en cada consulta de estado
+        data['schedule'] = parse_frequency(data['frequency'], data.get('scheduled_time'))
 
-        logger.info(f"Creating medication: {data}")
-        response = supabase_client.table('medications').insert(data).execute()
+        logger.debug("Creating medication", extra={"data": data})
+        response = await execute(table('medications').insert(data))
+        await materialize_slots(response.data[0])
+        broker.publish('medication.created', response.data[0], response.data[0]['resident_id'])
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error creating medication: {str(e)}")
+        logger.error("Error creating medication: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/medications/{medication_id}", response_model=Medication)
@@ -90,27 +285,31 @@ async def update_medication(medication_id: str, medication: MedicationCreate):
         if data.get('scheduled_time'):
             if isinstance(data['scheduled_time'], time):
                 data['scheduled_time'] = data['scheduled_time'].strftime('%H:%M:%S')
+        data['schedule'] = parse_frequency(data['frequency'], data.get('scheduled_time'))
 
-        logger.info(f"Updating medication {medication_id}: {data}")
-        response = supabase_client.table('medications').update(data).eq('id', medication_id).execute()
+        logger.debug("Updating medication %s", medication_id, extra={"data": data})
+        response = await execute(table('medications').update(data).eq('id', medication_id))
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Medicación no encontrada")
+        await materialize_slots(response.data[0], replace=True)
+        broker.publish('medication.updated', response.data[0], response.data[0]['resident_id'])
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error updating medication {medication_id}: {str(e)}")
+        logger.error("Error updating medication %s: %s", medication_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/medications/{medication_id}")
 async def delete_medication(medication_id: str):
     """Eliminar una medicación"""
     try:
-        response = supabase_client.table('medications').delete().eq('id', medication_id).execute()
+        response = await execute(table('medications').delete().eq('id', medication_id))
         if not response.data:
             raise HTTPException(status_code=404, detail="Medicación no encontrada")
+        broker.publish('medication.deleted', {"id": medication_id}, response.data[0].get('resident_id'))
         return {"message": "Medicación eliminada"}
     except Exception as e:
-        logger.error(f"Error deleting medication {medication_id}: {str(e)}")
+        logger.error("Error deleting medication %s: %s", medication_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/medications/{medication_id}/administer")
@@ -118,120 +317,192 @@ async def administer_medication(medication_id: str, user_id: str):
     """Marcar una medicación como administrada y guardar en historial"""
     try:
         # Obtener información de la medicación
-        medication_response = supabase_client.table('medications').select("*").eq('id', medication_id).execute()
+        medication_response = await execute(table('medications').select("*").eq('id', medication_id))
         if not medication_response.data:
             raise HTTPException(status_code=404, detail="Medicación no encontrada")
         
         medication = medication_response.data[0]
-        now = datetime.now()
         
         # Guardar en historial (siempre se guarda)
-        history_data = {
-            'medication_id': medication_id,
-            'resident_id': medication['resident_id'],
-            'med_name': medication['med_name'],
-            'dosage': medication['dosage'],
-            'administered_at': now.isoformat(),
-            'administered_by_user_id': user_id,
-            'notes': medication.get('notes')
-        }
+        history_data = build_history_row(medication, user_id, facility_time.now())
         
-        supabase_client.table('medication_history').insert(history_data).execute()
+        result = await execute(table('medication_history').insert(history_data))
+        # Las pantallas de ronda reciben la dosis al instante en lugar de re-consultar today-status
+        broker.publish('medication.administered', result.data[0], medication['resident_id'])
         
-        logger.info(f"Medication {medication_id} administered by user {user_id}")
+        logger.info("Medication %s administered by user %s", medication_id, user_id)
         return {"message": "Medicación administrada y registrada en historial"}
         
     except Exception as e:
-        logger.error(f"Error administering medication {medication_id}: {str(e)}")
+        logger.error("Error administering medication %s: %s", medication_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/medications/history/resident/{resident_id}", response_model=List[MedicationHistory])
-async def get_medication_history(resident_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
-    """Obtener historial de administración de medicamentos de un residente"""
+@router.post("/medications/administer/batch")
+async def administer_medications_batch(entries: List[AdministrationEntry]):
+    """Registrar varias administraciones (ronda de medicación) en un solo round trip de escritura.
+
+    Resuelve las medicaciones con filtros `in_` por bloques e inserta el
+    historial en bloque. Las entradas con `idempotency_key` ya registrada se reportan como
+    duplicadas en lugar de volver a insertarse.
+    """
+    if len(entries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_SIZE} administraciones por lote")
+
+    results = [None] * len(entries)
     try:
-        query = supabase_client.table('medication_history').select("*").eq('resident_id', resident_id)
+        medication_ids = list({entry.medication_id for entry in entries})
+        keys = list({entry.idempotency_key for entry in entries if entry.idempotency_key})
+
+        # Búsquedas por bloques de IN_FILTER_CHUNK valores: un lote de 500 no cabe en una URL
+        medication_rows, recorded_rows = await asyncio.gather(
+            fetch_in(lambda: table('medications').select("*"), 'id', medication_ids),
+            fetch_in(lambda: table('medication_history').select("id, idempotency_key"), 'idempotency_key', keys)
+        )
+
+        medications = {medication['id']: medication for medication in medication_rows}
+        recorded = {row['idempotency_key']: row['id'] for row in recorded_rows}
+
+        # Armar las filas nuevas; duplicados y medicaciones inexistentes se resuelven aquí
+        pending = []
+        now = facility_time.now()
+        for i, entry in enumerate(entries):
+            key = entry.idempotency_key
+            if key and key in recorded:
+                results[i] = {"index": i, "status": "duplicate", "history_id": recorded[key], "idempotency_key": key}
+                continue
+            medication = medications.get(entry.medication_id)
+            if medication is None:
+                results[i] = {"index": i, "status": "error", "detail": "Medicación no encontrada", "idempotency_key": key}
+                continue
+            if key:
+                recorded[key] = None  # clave repetida dentro del mismo lote
+            row = build_history_row(medication, entry.user_id, entry.administered_at or now)
+            row['idempotency_key'] = key
+            pending.append((i, row))
+
+        if pending:
+            # ignore_duplicates cubre reintentos concurrentes que llegan entre la consulta y el insert
+            insert_response = await execute(
+                table('medication_history').upsert(
+                    [row for _, row in pending],
+                    on_conflict='idempotency_key',
+                    ignore_duplicates=True
+                )
+            )
+            inserted_by_key = {row.get('idempotency_key'): row for row in insert_response.data if row.get('idempotency_key')}
+            unkeyed = iter(row for row in insert_response.data if not row.get('idempotency_key'))
+            for i, row in pending:
+                key = row['idempotency_key']
+                inserted = inserted_by_key.get(key) if key else next(unkeyed, None)
+                if inserted is not None:
+                    results[i] = {"index": i, "status": "created", "history_id": inserted['id'], "idempotency_key": key}
+                    broker.publish('medication.administered', inserted, inserted['resident_id'])
+                else:
+                    results[i] = {"index": i, "status": "duplicate", "history_id": None, "idempotency_key": key}
+
+        created = sum(1 for result in results if result['status'] == 'created')
+        logger.info("Batch administration: %s/%s doses recorded", created, len(entries))
+        return {"created": created, "results": results}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error administering medication batch: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/medications/history/resident/{resident_id}", response_model=List[MedicationHistoryListItem])
+async def get_medication_history(
+    resident_id: str,
+    request: Request,
+    response: Response,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    count: Optional[CountMethod] = None,
+    fields: Optional[str] = Query(None, description=fields_description(MedicationHistory, HISTORY_LIST_FIELDS))
+):
+    """Obtener historial de administración de medicamentos de un residente (paginado por cursor)"""
+    try:
+        columns = select_columns(parse_fields(fields, MedicationHistory, HISTORY_LIST_FIELDS, HISTORY_KEY))
+        query = table('medication_history').select(columns, count=count).eq('resident_id', resident_id)
         
         if start_date:
             query = query.gte('administered_at', start_date)
         if end_date:
             query = query.lte('administered_at', end_date)
             
-        response = query.order('administered_at', desc=True).execute()
-        return response.data
+        rows, next_cursor, total = await fetch_page(query, HISTORY_KEY, limit, cursor)
+        set_page_headers(response, next_cursor, total)
+        return conditional_response(request, response, rows, key=(rows, next_cursor, total), raw=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting medication history for resident {resident_id}: {str(e)}")
+        logger.error("Error getting medication history for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/medications/history/calendar/{resident_id}")
-async def get_medication_calendar(resident_id: str, year: int, month: int):
+async def get_medication_calendar(resident_id: str, year: int, month: int, request: Request, response: Response):
     """Obtener datos del calendario de administración para un mes específico"""
     try:
-        # Obtener todas las medicaciones del residente
-        medications_response = supabase_client.table('medications').select("*").eq('resident_id', resident_id).execute()
-        medications = medications_response.data
-        
         # Obtener historial del mes
         start_date = f"{year}-{month:02d}-01"
         if month == 12:
             end_date = f"{year + 1}-01-01"
         else:
             end_date = f"{year}-{month + 1:02d}-01"
-            
-        history_response = supabase_client.table('medication_history').select("*").eq('resident_id', resident_id).gte('administered_at', start_date).lt('administered_at', end_date).execute()
+
+        # Medicaciones, historial y dosis programadas del mes en paralelo
+        medications_response, history_response, slots = await asyncio.gather(
+            execute(table('medications').select("*").eq('resident_id', resident_id)),
+            execute(table('medication_history').select("*").eq('resident_id', resident_id).gte('administered_at', start_date).lt('administered_at', end_date)),
+            fetch_slots(start_date, end_date, resident_id)
+        )
+        medications = medications_response.data
         history = history_response.data
         
-        # Procesar datos para el calendario
-        calendar_data = {}
+        unchanged = not_modified(request, response, (medications, history, slots))
+        if unchanged is not None:
+            return unchanged
         
-        # Agrupar administraciones por fecha
+        # Agrupar administraciones y dosis programadas por fecha (YYYY-MM-DD)
+        calendar_data = {}
         for record in history:
-            date_key = record['administered_at'][:10]  # YYYY-MM-DD
-            if date_key not in calendar_data:
-                calendar_data[date_key] = []
-            calendar_data[date_key].append(record)
+            calendar_data.setdefault(record['administered_at'][:10], []).append(record)
+        scheduled = {}
+        for slot in slots:
+            scheduled.setdefault(slot['scheduled_at'][:10], []).append({"medication_id": slot['medication_id'], "scheduled_at": slot['scheduled_at']})
         
-        return {
+        return raw_json({
             "medications": medications,
             "history": calendar_data,
+            "scheduled": scheduled,
             "month": month,
             "year": year
-        }
+        }, response)
         
     except Exception as e:
-        logger.error(f"Error getting medication calendar for resident {resident_id}: {str(e)}")
+        logger.error("Error getting medication calendar for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/medications/today-status/{resident_id}")
-async def get_today_medication_status(resident_id: str):
+async def get_today_medication_status(resident_id: str, request: Request, response: Response):
     """Obtener el estado de administración de medicamentos para hoy"""
     try:
-        today = datetime.now().strftime('%Y-%m-%d')
+        today = facility_time.today().isoformat()
         
-        # Obtener todas las medicaciones del residente
-        medications_response = supabase_client.table('medications').select("*").eq('resident_id', resident_id).execute()
-        medications = medications_response.data
+        # Medicaciones, administraciones y dosis programadas de hoy en paralelo
+        medications_response, history_response, slots = await asyncio.gather(
+            execute(table('medications').select("*").eq('resident_id', resident_id)),
+            execute(table('medication_history').select("medication_id, administered_at").eq('resident_id', resident_id).gte('administered_at', f"{today}T00:00:00").lt('administered_at', f"{next_day(today)}T00:00:00")),
+            fetch_slots(f"{today}T00:00:00", f"{next_day(today)}T00:00:00", resident_id)
+        )
         
-        # Obtener administraciones de hoy
-        history_response = supabase_client.table('medication_history').select("*").eq('resident_id', resident_id).gte('administered_at', f"{today}T00:00:00").lt('administered_at', f"{today}T23:59:59").execute()
-        today_history = history_response.data
+        unchanged = not_modified(request, response, (today, medications_response.data, history_response.data, slots))
+        if unchanged is not None:
+            return unchanged
         
-        # Procesar estado de cada medicación
-        medication_status = []
-        
-        for medication in medications:
-            # Contar cuántas veces se administró hoy
-            today_count = len([h for h in today_history if h['medication_id'] == medication['id']])
-            
-            # Determinar cuántas veces debería administrarse según la frecuencia
-            expected_count = get_expected_admin_count(medication['frequency'])
-            
-            medication_status.append({
-                **medication,
-                'administered_today': today_count,
-                'expected_today': expected_count,
-                'can_administer': today_count < expected_count,
-                'last_administered': get_last_administered(today_history, medication['id'])
-            })
+        medication_status = build_medication_status(medications_response.data, summarize_history(history_response.data), group_slots(slots))
         
         return {
             "date": today,
@@ -239,32 +510,83 @@ async def get_today_medication_status(resident_id: str):
         }
         
     except Exception as e:
-        logger.error(f"Error getting today's medication status for resident {resident_id}: {str(e)}")
+        logger.error("Error getting today's medication status for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
-def get_expected_admin_count(frequency: str) -> int:
-    """Determinar cuántas veces se debe administrar según la frecuencia"""
-    frequency_lower = frequency.lower()
-    if 'una vez' in frequency_lower:
-        return 1
-    elif 'dos veces' in frequency_lower:
-        return 2
-    elif 'tres veces' in frequency_lower:
-        return 3
-    elif 'cada 8 horas' in frequency_lower:
-        return 3  # 24/8 = 3 veces al día
-    elif 'cada 12 horas' in frequency_lower:
-        return 2  # 24/12 = 2 veces al día
-    elif 'según necesidad' in frequency_lower:
-        return 5  # Máximo 5 veces por día para "según necesidad"
-    else:
-        return 1  # Por defecto
-
-def get_last_administered(history: list, medication_id: str) -> str:
-    """Obtener la última hora de administración de hoy"""
-    medication_history = [h for h in history if h['medication_id'] == medication_id]
-    if medication_history:
-        # Ordenar por hora y tomar la más reciente
-        medication_history.sort(key=lambda x: x['administered_at'], reverse=True)
-        return medication_history[0]['administered_at']
-    return None 
\ No newline at end of file
+def next_day(day: str) -> str:
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+async def materialize_slots(medication: dict, replace: bool = False):
+    """Genera las franjas de dosis de la medicación recién creada o editada.
+
+    Si falla no se revierte la escritura: el refresco periódico de
+    dose_schedule completa las franjas que falten.
+    """
+    try:
+        if replace:
+            await rematerialize(medication)
+        else:
+            await materialize([medication])
+    except Exception as e:
+        logger.warning("Could not materialize dose slots for medication %s: %s", medication['id'], e)
+
+def build_history_row(medication: dict, user_id: str, administered_at: datetime) -> dict:
+    """Fila de medication_history a partir de la medicación administrada.
+
+    administered_at se guarda en hora local de la residencia, sin zona, como
+    scheduled_at: las horas con zona (tabletas, lotes) se convierten aquí.
+    """
+    return {
+        'medication_id': medication['id'],
+        'resident_id': medication['resident_id'],
+        'med_name': medication['med_name'],
+        'dosage': medication['dosage'],
+        'administered_at': facility_time.to_local(administered_at).isoformat(),
+        'administered_by_user_id': user_id,
+        'notes': medication.get('notes')
+    }
+
+def summarize_history(history: list) -> dict:
+    """Agrupar el historial por medication_id en una sola pasada: {id: (cantidad, última)}"""
+    summary = {}
+    for record in history:
+        medication_id = record['medication_id']
+        count, last = summary.get(medication_id, (0, None))
+        administered_at = record['administered_at']
+        if last is None or administered_at > last:
+            last = administered_at
+        summary[medication_id] = (count + 1, last)
+    return summary
+
+def build_medication_status(medications: list, summary: dict, slots: Optional[dict] = None) -> list:
+    """Estado de administración de hoy para cada medicación.
+
+    summary: ver summarize_history. slots: franjas de hoy por medicación (ver
+    dose_schedule.group_slots); las medicaciones sin franjas materializadas
+    usan los horarios de su `schedule`.
+    """
+    now = facility_time.now()
+    now_text = now.strftime('%Y-%m-%dT%H:%M:%S')
+    medication_status = []
+    for medication in medications:
+        today_count, last_administered = summary.get(medication['id'], (0, None))
+        schedule = schedule_of(medication)
+        times = (slots or {}).get(medication['id'])
+        if times is None:
+            times = [slot['scheduled_at'] for slot in slots_for_day(medication, now.date())]
+
+        # "Según necesidad" no tiene horarios, solo un máximo diario
+        expected_count = schedule['max_per_day'] if schedule['kind'] == 'prn' else len(times)
+        due_count = sum(1 for scheduled_at in times if scheduled_at <= now_text)
+        
+        medication_status.append({
+            **medication,
+            'administered_today': today_count,
+            'expected_today': expected_count,
+            'can_administer': today_count < expected_count,
+            'last_administered': last_administered,
+            'scheduled_today': times,
+            'doses_due': max(0, due_count - today_count),
+            'next_dose_at': times[today_count] if today_count < len(times) else None
+        })
+    return medication_status
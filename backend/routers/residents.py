@@ -1,13 +1,99 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import List, Optional
 from models.resident import Resident
-from supabase_client import supabase_client
+from supabase_client import table, execute
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CountMethod, fetch_page, set_page_headers
+from cache import SharedCache
+from conditional import conditional_response, not_modified
+from serialization import raw_json
+from server_timing import timed, format_server_timing
+from events import broker
+from resident_search import search_index
+from projection import parse_fields, select_columns, projection_model, fields_description
+from routers.medications import build_medication_status, summarize_history
+from datetime import date
+import facility_time
+import asyncio
+import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Clave de paginación keyset: orden alfabético estable (name, id)
+RESIDENT_KEY = ['name', 'id']
+
+# Proyección por defecto del listado: lo que muestran las tarjetas y el formulario
+# de edición, sin los campos médicos (historia clínica, patologías, alergias)
+RESIDENT_LIST_FIELDS = ('id', 'name', 'status', 'photo_url', 'admission_date', 'discharge_date',
+                        'emergency_contact_name', 'emergency_contact_phone')
+ResidentListItem = projection_model(Resident, RESIDENT_LIST_FIELDS, 'ResidentListItem')
+
+# Últimos signos vitales incluidos en el perfil (igual que /vital-signs/resident/{id}/latest)
+PROFILE_VITAL_SIGNS = 5
+
+# Caché de lecturas: ('resident', id) -> fila completa, ('list', ...) -> página del listado.
+# Toda escritura de este router invalida las entradas afectadas (en todos los workers
+# si SHARED_STATE_URL apunta a Redis, ver shared_state.py).
+resident_cache = SharedCache(
+    'residents',
+    maxsize=int(os.getenv("RESIDENT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RESIDENT_CACHE_TTL", "60"))
+)
+
+async def invalidate_resident(resident_id: Optional[str] = None, row: Optional[dict] = None):
+    """Invalida el listado y, si se indica, el residente (o lo reescribe con la fila nueva)"""
+    await resident_cache.delete_prefix('list')
+    if resident_id is not None:
+        if row is not None:
+            await resident_cache.set(('resident', resident_id), row)
+            search_index.upsert(row)
+        else:
+            await resident_cache.delete(('resident', resident_id))
+            search_index.remove(resident_id)
+        await search_index.publish(resident_id, row)
+
+async def fetch_resident(resident_id: str) -> Optional[dict]:
+    """Fila completa del residente, desde la caché si está vigente"""
+    key = ('resident', resident_id)
+    row = await resident_cache.get(key)
+    if row is None:
+        response = await execute(table('residents').select("*").eq('id', resident_id))
+        if not response.data:
+            return None
+        row = response.data[0]
+        await resident_cache.set(key, row)
+    return row
+
+def calculate_age(birth_date: Optional[str]) -> Optional[int]:
+    """Edad en años cumplidos a partir de la fecha de nacimiento (YYYY-MM-DD)"""
+    if not birth_date:
+        return None
+    birth = date.fromisoformat(birth_date)
+    today = date.today()
+    return today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+
+def build_medical_info(resident_data: dict) -> dict:
+    """Campos médicos del residente (listas vacías si no existen) con la edad calculada"""
+    return {
+        "id": resident_data.get("id"),
+        "name": resident_data.get("name"),
+        "document_number": resident_data.get("document_number"),
+        "birth_date": resident_data.get("birth_date"),
+        "pathologies": resident_data.get("pathologies") or [],
+        "medical_history": resident_data.get("medical_history"),
+        "allergies": resident_data.get("allergies") or [],
+        "blood_type": resident_data.get("blood_type"),
+        "age": calculate_age(resident_data.get("birth_date"))
+    }
+
+@router.get("/residents/cache/stats")
+def get_resident_cache_stats():
+    """Contadores de aciertos/fallos de la caché de residentes"""
+    return resident_cache.stats()
+
 @router.get("/simple-test")
 def simple_test():
     """Endpoint muy simple para verificar que el router funciona"""
@@ -55,70 +141,142 @@ def prepare_resident_data(data: dict) -> dict:
     
     return cleaned_data
 
-@router.get("/residents/", response_model=List[Resident])
-async def get_residents():
+@router.get("/residents/", response_model=List[ResidentListItem])
+async def get_residents(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    count: Optional[CountMethod] = None,
+    fields: Optional[str] = Query(None, description=fields_description(Resident, RESIDENT_LIST_FIELDS))
+):
+    try:
+        columns = select_columns(parse_fields(fields, Resident, RESIDENT_LIST_FIELDS, RESIDENT_KEY))
+        key = ('list', columns, limit, cursor, count)
+        page = await resident_cache.get(key)
+        if page is None:
+            query = table('residents').select(columns, count=count)
+            page = await fetch_page(query, RESIDENT_KEY, limit, cursor, desc=False)
+            await resident_cache.set(key, page)
+        rows, next_cursor, total = page
+        set_page_headers(response, next_cursor, total)
+        return conditional_response(request, response, rows, key=page, raw=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting residents: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/residents/search")
+async def search_residents(
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    pathologies: Optional[List[str]] = Query(None),
+    allergies: Optional[List[str]] = Query(None),
+    blood_type: Optional[str] = None,
+    active: Optional[bool] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0)
+):
+    """Buscar residentes por nombre (sin tildes y con tolerancia a errores) o documento exacto.
+
+    Filtros: status, blood_type, active (sin fecha de egreso) y pathologies /
+    allergies (repetibles; el residente debe tenerlas todas). Resultados por
+    relevancia (documento exacto primero), luego alfabéticos, paginados con
+    limit/offset. Se resuelve con el índice en memoria de resident_search.
+    """
     try:
-        response = supabase_client.table('residents').select("*").execute()
-        return response.data
+        await search_index.ensure_loaded()
     except Exception as e:
-        logger.error(f"Error getting residents: {str(e)}")
+        logger.error("Error loading resident search index: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+    hits = search_index.search(q, status, pathologies, allergies, blood_type, active)
+    return raw_json({
+        "total": len(hits),
+        "limit": limit,
+        "offset": offset,
+        "results": [{**row, "score": score} for score, row in hits[offset:offset + limit]]
+    })
+
 @router.get("/residents/{resident_id}/medical-info")
-async def get_resident_medical_info(resident_id: str):
+async def get_resident_medical_info(resident_id: str, request: Request, response: Response):
     """Obtener información médica específica de un residente"""
     try:
-        logger.info(f"Fetching medical info for resident: {resident_id}")
-        response = supabase_client.table('residents').select(
-            "id, name, document_number, birth_date, pathologies, medical_history, allergies, blood_type"
-        ).eq('id', resident_id).execute()
+        logger.debug("Fetching medical info for resident: %s", resident_id)
+        # La fila completa cacheada incluye todos los campos médicos
+        resident_data = await fetch_resident(resident_id)
         
-        if not response.data:
-            logger.warning(f"Resident not found: {resident_id}")
+        if resident_data is None:
+            logger.warning("Resident not found: %s", resident_id)
             raise HTTPException(status_code=404, detail="Residente no encontrado")
         
-        resident_data = response.data[0]
-        logger.info(f"Found resident data: {resident_data}")
-        
-        # Inicializar campos médicos si no existen
-        medical_data = {
-            "id": resident_data.get("id"),
-            "name": resident_data.get("name"),
-            "document_number": resident_data.get("document_number"),
-            "birth_date": resident_data.get("birth_date"),
-            "pathologies": resident_data.get("pathologies") or [],
-            "medical_history": resident_data.get("medical_history"),
-            "allergies": resident_data.get("allergies") or [],
-            "blood_type": resident_data.get("blood_type")
-        }
-        
-        # Calcular edad si hay fecha de nacimiento
-        age = None
-        if medical_data.get('birth_date'):
-            from datetime import date
-            birth_date = date.fromisoformat(medical_data['birth_date'])
-            today = date.today()
-            age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-        
-        result = {
-            **medical_data,
-            "age": age
+        result = build_medical_info(resident_data)
+        return conditional_response(request, response, result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting medical info for resident %s: %s", resident_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/residents/{resident_id}/profile")
+async def get_resident_profile(resident_id: str, request: Request, response: Response):
+    """Perfil completo del residente en una sola petición.
+
+    Reúne lo que la UI pedía por separado (residente, información médica,
+    contactos, medicaciones de hoy y últimos signos vitales) lanzando todas
+    las consultas a la vez. La duración de cada sección va en Server-Timing.
+    """
+    try:
+        today = facility_time.today().isoformat()
+        timings = {}
+        resident_data, contacts, medications, history, vital_signs = await asyncio.gather(
+            timed(timings, 'resident', fetch_resident(resident_id)),
+            timed(timings, 'contacts', execute(table('family_contacts').select("*").eq('resident_id', resident_id))),
+            timed(timings, 'medications', execute(table('medications').select("*").eq('resident_id', resident_id))),
+            timed(timings, 'medication_history', execute(table('medication_history').select("medication_id, administered_at").eq('resident_id', resident_id).gte('administered_at', f"{today}T00:00:00").lt('administered_at', f"{today}T23:59:59"))),
+            timed(timings, 'vital_signs', execute(table('vital_signs').select("*").eq('resident_id', resident_id).order('taken_at', desc=True).limit(PROFILE_VITAL_SIGNS)))
+        )
+        if resident_data is None:
+            raise HTTPException(status_code=404, detail="Residente no encontrado")
+
+        server_timing = format_server_timing(timings)
+        unchanged = not_modified(request, response, (today, resident_data, contacts.data, medications.data, history.data, vital_signs.data))
+        if unchanged is not None:
+            unchanged.headers["Server-Timing"] = server_timing
+            return unchanged
+
+        start = time.perf_counter()
+        profile = {
+            "resident": resident_data,
+            "medical_info": build_medical_info(resident_data),
+            "family_contacts": contacts.data,
+            "medications_today": {
+                "date": today,
+                "medications": build_medication_status(medications.data, summarize_history(history.data))
+            },
+            "latest_vital_signs": vital_signs.data
         }
-        logger.info(f"Returning medical info: {result}")
-        return result
+        timings['compose'] = (time.perf_counter() - start) * 1000
+        response.headers["Server-Timing"] = format_server_timing(timings)
+        return raw_json(profile, response)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting medical info for resident {resident_id}: {str(e)}")
+        logger.error("Error getting profile for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/residents/{resident_id}", response_model=Resident)
-async def get_resident(resident_id: str):
+async def get_resident(resident_id: str, request: Request, response: Response):
     try:
-        response = supabase_client.table('residents').select("*").eq('id', resident_id).execute()
-        if not response.data:
+        resident_data = await fetch_resident(resident_id)
+        if resident_data is None:
             raise HTTPException(status_code=404, detail="Residente no encontrado")
-        return response.data[0]
+        return conditional_response(request, response, resident_data)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting resident {resident_id}: {str(e)}")
+        logger.error("Error getting resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/residents/", response_model=Resident)
@@ -126,12 +284,14 @@ async def create_resident(resident: Resident):
     try:
         # Preparar datos para Supabase
         data = prepare_resident_data(resident.dict())
-        logger.info(f"Creating resident with data: {data}")
+        logger.debug("Creating resident", extra={"data": data})
         
-        response = supabase_client.table('residents').insert(data).execute()
+        response = await execute(table('residents').insert(data))
+        await invalidate_resident(response.data[0].get('id'), response.data[0])
+        broker.publish('resident.created', response.data[0], response.data[0].get('id'))
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error creating resident: {str(e)}")
+        logger.error("Error creating resident: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/residents/{resident_id}", response_model=Resident)
@@ -139,17 +299,18 @@ async def update_resident(resident_id: str, resident: Resident):
     try:
         # Preparar datos para Supabase
         data = prepare_resident_data(resident.dict())
-        logger.info(f"Updating resident {resident_id} with data: {data}")
+        logger.debug("Updating resident %s", resident_id, extra={"data": data})
         
-        response = supabase_client.table('residents').update(data).eq('id', resident_id).execute()
+        response = await execute(table('residents').update(data).eq('id', resident_id))
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Residente no encontrado")
             
-        logger.info(f"Update response: {response.data}")
+        await invalidate_resident(resident_id, response.data[0])
+        broker.publish('resident.updated', response.data[0], resident_id)
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error updating resident {resident_id}: {str(e)}")
+        logger.error("Error updating resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/residents/{resident_id}/medical-info")
@@ -157,8 +318,7 @@ async def update_resident_medical_info(resident_id: str, medical_data: dict):
     """Actualizar información médica específica de un residente"""
     try:
         # Validar que el residente existe
-        existing_response = supabase_client.table('residents').select("id").eq('id', resident_id).execute()
-        if not existing_response.data:
+        if await fetch_resident(resident_id) is None:
             raise HTTPException(status_code=404, detail="Residente no encontrado")
         
         # Preparar datos médicos
@@ -170,25 +330,29 @@ async def update_resident_medical_info(resident_id: str, medical_data: dict):
             if isinstance(medical_update['birth_date'], str):
                 medical_update['birth_date'] = medical_update['birth_date']
         
-        logger.info(f"Updating medical info for resident {resident_id}: {medical_update}")
+        logger.debug("Updating medical info for resident %s", resident_id, extra={"data": medical_update})
         
-        response = supabase_client.table('residents').update(medical_update).eq('id', resident_id).execute()
+        response = await execute(table('residents').update(medical_update).eq('id', resident_id))
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Residente no encontrado")
             
+        await invalidate_resident(resident_id, response.data[0])
+        broker.publish('resident.updated', response.data[0], resident_id)
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error updating medical info for resident {resident_id}: {str(e)}")
+        logger.error("Error updating medical info for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/residents/{resident_id}")
 async def delete_resident(resident_id: str):
     try:
-        response = supabase_client.table('residents').delete().eq('id', resident_id).execute()
+        response = await execute(table('residents').delete().eq('id', resident_id))
+        await invalidate_resident(resident_id)
         if not response.data:
             raise HTTPException(status_code=404, detail="Residente no encontrado")
+        broker.publish('resident.deleted', {"id": resident_id}, resident_id)
         return {"message": "Residente eliminado"}
     except Exception as e:
-        logger.error(f"Error deleting resident {resident_id}: {str(e)}")
+        logger.error("Error deleting resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
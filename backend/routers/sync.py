@@ -0,0 +1,283 @@
+from fastapi import APIRouter, HTTPException
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel
+from supabase_client import table, execute
+from serialization import raw_json
+from pagination import encode_cursor, fetch_page
+from alerts import engine as alert_engine
+from events import broker
+from routers.vital_signs import VitalSign, prepare_vital_sign_data, describe_error
+from routers.family_contacts import FamilyContact
+from routers.medications import build_history_row
+import asyncio
+import base64
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+SyncTable = Literal['vital_signs', 'medication_history', 'family_contacts']
+
+# Columna de fecha de cada tabla para acotar la primera sincronización (None = tabla completa)
+SYNC_TABLES = {
+    'vital_signs': 'taken_at',
+    'medication_history': 'administered_at',
+    'family_contacts': None,
+}
+TOMBSTONES = 'sync_tombstones'
+
+# Cambios por petición y filas por tabla que se devuelven en cada vuelta (has_more = pedir otra)
+MAX_SYNC_CHANGES = 2000
+SYNC_PULL_LIMIT = 1000
+# Ids por consulta al buscar las versiones del servidor (el filtro in.() viaja en la URL)
+SYNC_LOOKUP_CHUNK = 200
+# Días de historial que baja una tableta nueva
+SYNC_INITIAL_DAYS = 7
+# Las filas más recientes que esto esperan a la siguiente sincronización: una
+# transacción que confirma tarde con un synced_at anterior no queda detrás del token
+SYNC_SETTLE = timedelta(seconds=5)
+
+# Clave keyset de las deltas: índice sugerido (synced_at, id) en cada tabla
+SYNC_KEY = ['synced_at', 'id']
+
+class SyncChange(BaseModel):
+    table: SyncTable
+    op: Literal['upsert', 'delete'] = 'upsert'
+    # Generado en la tableta: la fila conserva el mismo id offline y en el servidor
+    id: str
+    # Hora de la edición en la tableta; gana la versión más reciente
+    updated_at: datetime
+    data: dict = {}
+
+class SyncRequest(BaseModel):
+    device_id: str
+    sync_token: Optional[str] = None
+    # Residentes del pabellón; sin filtro se sincroniza toda la residencia
+    resident_ids: Optional[List[str]] = None
+    changes: List[SyncChange] = []
+
+def utc_text(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+def parse_timestamp(value) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def edited_at(change: SyncChange) -> datetime:
+    # Las tabletas pueden mandar horas con o sin zona; sin zona se toman como UTC
+    return parse_timestamp(utc_text(change.updated_at))
+
+def encode_token(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+def decode_token(token: Optional[str]) -> Optional[dict]:
+    if not token:
+        return None
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Token de sincronización inválido")
+    if not isinstance(state, dict) or not isinstance(state.get('cursors'), dict):
+        raise HTTPException(status_code=400, detail="Token de sincronización inválido")
+    return state
+
+def prepare_row(change: SyncChange, medications: dict) -> dict:
+    """Valida el cambio con el modelo de su tabla y arma la fila a guardar"""
+    data = {**change.data}
+    if change.table == 'vital_signs':
+        row = prepare_vital_sign_data(VitalSign(**data).dict())
+    elif change.table == 'family_contacts':
+        row = FamilyContact(**data).dict(exclude={'id', 'created_at', 'updated_at'})
+    else:
+        medication = medications.get(data.get('medication_id'))
+        if medication is None:
+            raise ValueError("Medicación no encontrada")
+        if not data.get('administered_by_user_id'):
+            raise ValueError("administered_by_user_id es obligatorio")
+        # Llega en UTC (o con la zona de la tableta); build_history_row la pasa a hora local
+        administered_at = parse_timestamp(data.get('administered_at')) or change.updated_at
+        row = build_history_row(medication, data['administered_by_user_id'], administered_at)
+        if 'notes' in data:
+            row['notes'] = data['notes']
+        if data.get('idempotency_key'):
+            row['idempotency_key'] = data['idempotency_key']
+    row['id'] = change.id
+    row['updated_at'] = utc_text(change.updated_at)
+    return row
+
+async def fetch_current(table_name: str, ids: list) -> dict:
+    """Versión del servidor de las filas tocadas por el lote, en consultas de SYNC_LOOKUP_CHUNK ids"""
+    chunks = [ids[i:i + SYNC_LOOKUP_CHUNK] for i in range(0, len(ids), SYNC_LOOKUP_CHUNK)]
+    responses = await asyncio.gather(*(execute(table(table_name).select("*").in_('id', chunk)) for chunk in chunks))
+    return {row['id']: row for response in responses for row in response.data}
+
+async def apply_changes(changes: List[SyncChange], synced_at: str) -> list:
+    """Aplica el lote en bloque: por tabla, una lectura de las versiones actuales,
+    un upsert y un delete. Gana la versión con updated_at más reciente."""
+    results = [None] * len(changes)
+
+    # Dentro del lote, la última edición de cada fila reemplaza a las anteriores
+    latest = {}
+    for i, change in enumerate(changes):
+        key = (change.table, change.id)
+        previous = latest.get(key)
+        if previous is None or edited_at(changes[previous]) <= edited_at(change):
+            if previous is not None:
+                results[previous] = {"index": previous, "table": change.table, "id": change.id, "status": "superseded"}
+            latest[key] = i
+        else:
+            results[i] = {"index": i, "table": change.table, "id": change.id, "status": "superseded"}
+
+    by_table = {}
+    for (table_name, _), i in latest.items():
+        by_table.setdefault(table_name, []).append(i)
+
+    medication_ids = list({changes[i].data.get('medication_id') for i in by_table.get('medication_history', [])} - {None})
+    lookups = [fetch_current(table_name, [changes[i].id for i in indexes]) for table_name, indexes in by_table.items()]
+    if medication_ids:
+        lookups.append(fetch_current('medications', medication_ids))
+    responses = await asyncio.gather(*lookups)
+    current_by_table = dict(zip(by_table, responses))
+    medications = responses[-1] if medication_ids else {}
+
+    writes = []
+    for table_name, indexes in by_table.items():
+        current = current_by_table[table_name]
+        upserts, deletes = [], []
+        for i in indexes:
+            change = changes[i]
+            result = {"index": i, "table": table_name, "id": change.id}
+            server_row = current.get(change.id)
+            server_updated_at = parse_timestamp(server_row.get('updated_at')) if server_row else None
+            if server_updated_at is not None and server_updated_at > edited_at(change):
+                # El servidor tiene una edición posterior: se conserva y se devuelve a la tableta
+                results[i] = {**result, "status": "conflict", "current": server_row}
+                continue
+            if change.op == 'delete':
+                if server_row is not None:
+                    deletes.append((i, server_row))
+                results[i] = {**result, "status": "applied"}
+                continue
+            try:
+                row = prepare_row(change, medications)
+            except Exception as e:
+                results[i] = {**result, "status": "error", "detail": describe_error(e)}
+                continue
+            row['synced_at'] = synced_at
+            upserts.append((i, row))
+            results[i] = {**result, "status": "applied"}
+        writes.append(write_table(table_name, upserts, deletes, results, synced_at))
+    await asyncio.gather(*writes)
+    return results
+
+async def write_table(table_name: str, upserts: list, deletes: list, results: list, synced_at: str):
+    """Escribe los cambios aceptados de una tabla; si falla, sus entradas quedan en error"""
+    try:
+        if upserts:
+            primary = [row for _, row in upserts if row.get('is_primary')] if table_name == 'family_contacts' else []
+            if primary:
+                # Igual que en create_contact: un solo contacto primario por residente
+                await execute(
+                    table('family_contacts').update({'is_primary': False})
+                    .in_('resident_id', list({row['resident_id'] for row in primary}))
+                    .not_.in_('id', [row['id'] for row in primary])
+                )
+            await execute(table(table_name).upsert([row for _, row in upserts], on_conflict='id'))
+        if deletes:
+            # Las lápidas llevan el borrado a las demás tabletas
+            await execute(table(TOMBSTONES).upsert(
+                [
+                    {'table_name': table_name, 'row_id': row['id'], 'resident_id': row.get('resident_id'), 'synced_at': synced_at}
+                    for _, row in deletes
+                ],
+                on_conflict='table_name,row_id', ignore_duplicates=True
+            ))
+            await execute(table(table_name).delete().in_('id', [row['id'] for _, row in deletes]))
+    except Exception as e:
+        logger.error("Error applying %s sync changes: %s", table_name, e)
+        for i, _ in upserts + deletes:
+            results[i] = {**results[i], "status": "error", "detail": str(e)}
+        return
+
+    rows = [row for _, row in upserts]
+    if table_name == 'vital_signs' and rows:
+        alert_engine.submit_many(rows)
+        broker.publish('vital_sign.imported', {"inserted": len(rows), "resident_ids": sorted({row['resident_id'] for row in rows})})
+    elif table_name == 'medication_history':
+        for row in rows:
+            broker.publish('medication.administered', row, row['resident_id'])
+
+async def pull_table(table_name: str, cursor: Optional[str], window_start: str, resident_ids: Optional[list], settled: str):
+    """Una página de filas con synced_at posterior al cursor de la tableta"""
+    query = table(table_name).select("*").lt('synced_at', settled)
+    if resident_ids is not None:
+        query = query.in_('resident_id', resident_ids)
+    time_column = SYNC_TABLES.get(table_name)
+    if time_column:
+        query = query.gte(time_column, window_start)
+    rows, next_cursor, _ = await fetch_page(query, SYNC_KEY, SYNC_PULL_LIMIT, cursor, desc=False)
+    if next_cursor is None and rows:
+        next_cursor = encode_cursor(rows[-1], SYNC_KEY)
+    return rows, next_cursor or cursor, len(rows) == SYNC_PULL_LIMIT
+
+@router.post("/sync")
+async def sync(payload: SyncRequest):
+    """Sincronización de tabletas offline en un solo round trip.
+
+    La tableta sube los cambios que encoló sin conexión (signos vitales,
+    administraciones y contactos familiares, con ids generados por ella) y
+    recibe todo lo que cambió desde su `sync_token`: filas nuevas o editadas y
+    ids borrados. Los conflictos se resuelven por `updated_at` (gana la edición
+    más reciente). Si `has_more` es true hay más deltas: volver a llamar con el
+    token nuevo.
+    """
+    if len(payload.changes) > MAX_SYNC_CHANGES:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_SYNC_CHANGES} cambios por sincronización")
+
+    state = decode_token(payload.sync_token) or {}
+    now = datetime.now(timezone.utc)
+    window_start = state.get('window') or (now - timedelta(days=SYNC_INITIAL_DAYS)).date().isoformat()
+    cursors = state.get('cursors', {})
+    settled = utc_text(now - SYNC_SETTLE)
+
+    try:
+        results = await apply_changes(payload.changes, utc_text(now)) if payload.changes else []
+        pulled_tables = list(SYNC_TABLES) + [TOMBSTONES]
+        pages = await asyncio.gather(*(
+            pull_table(table_name, cursors.get(table_name), window_start, payload.resident_ids, settled)
+            for table_name in pulled_tables
+        ))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error syncing device %s: %s", payload.device_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    changes, deleted, has_more = {}, {table_name: [] for table_name in SYNC_TABLES}, False
+    for table_name, (rows, cursor, more) in zip(pulled_tables, pages):
+        if cursor:
+            cursors[table_name] = cursor
+        has_more = has_more or more
+        if table_name == TOMBSTONES:
+            for tombstone in rows:
+                deleted.setdefault(tombstone['table_name'], []).append(tombstone['row_id'])
+        else:
+            changes[table_name] = rows
+
+    applied = sum(1 for result in results if result['status'] == 'applied')
+    logger.info("Sync %s: %s/%s changes applied, %s rows pulled", payload.device_id, applied, len(results),
+                sum(len(rows) for rows in changes.values()))
+    return raw_json({
+        "results": results,
+        "changes": changes,
+        "deleted": deleted,
+        "sync_token": encode_token({"window": window_start, "cursors": cursors}),
+        "has_more": has_more
+    })
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from typing import Optional
 import os
-from PIL import Image
-import io
+import asyncio
 import uuid
 from datetime import datetime
-from supabase_client import supabase_client
+from supabase_client import storage
+from image_processing import process_image
 import logging
 
 # Configurar el router
@@ -17,18 +17,50 @@ router = APIRouter(
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 BUCKET_NAME = 'residents'
+CHUNK_SIZE = 64 * 1024
+
+# Existencia del bucket verificada una sola vez por proceso
+_bucket_ready = False
+_bucket_lock = asyncio.Lock()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def is_valid_image(file_content: bytes) -> bool:
-    try:
-        img = Image.open(io.BytesIO(file_content))
-        img.verify()
-        return True
-    except Exception as e:
-        logger.error(f"Error validando imagen: {str(e)}")
-        return False
+async def read_with_limit(file: UploadFile) -> bytes:
+    """Lee el UploadFile por bloques y aborta en cuanto supera MAX_FILE_SIZE"""
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail="El archivo es demasiado grande. Máximo 5MB."
+            )
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+async def ensure_bucket():
+    """Crea el bucket si no existe; el resultado se cachea para todo el proceso"""
+    global _bucket_ready
+    if _bucket_ready:
+        return
+    async with _bucket_lock:
+        if _bucket_ready:
+            return
+        buckets = await storage().list_buckets()
+        if not any(bucket.name == BUCKET_NAME for bucket in buckets):
+            logger.info("El bucket %s no existe, intentando crearlo...", BUCKET_NAME)
+            try:
+                await storage().create_bucket(BUCKET_NAME, options={'public': True})
+                logger.info("Bucket %s creado exitosamente", BUCKET_NAME)
+            except Exception as e:
+                logger.error("No se pudo crear el bucket: %s", e)
+                raise HTTPException(
+                    status_code=500,
+                    detail="No se pudo crear el bucket de almacenamiento. Por favor, contacta al administrador."
+                )
+        _bucket_ready = True
 
 @router.post("/")
 async def upload_file(file: UploadFile = File(...)):
@@ -43,32 +75,24 @@ async def upload_file(file: UploadFile = File(...)):
                 detail="Formato de archivo no permitido. Use: .jpg, .jpeg, .png o .gif"
             )
 
-        # Mapear extensiones a MIME types correctos
-        mime_type_map = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif'
-        }
-        content_type = mime_type_map.get(file_ext, 'image/jpeg')
-        
-        # Forzar el content type correcto
-        logger.info(f"Original content type: {file.content_type}")
-        logger.info(f"File extension: {file_ext}")
-        logger.info(f"Mapped content type: {content_type}")
+        logger.debug("Original content type: %s", file.content_type)
+        logger.debug("File extension: %s", file_ext)
 
-        # Leer el archivo
-        contents = await file.read()
-        
-        # Verificar tamaño
-        if len(contents) > MAX_FILE_SIZE:
+        # Rechazar de entrada si el tamaño ya es conocido
+        if file.size is not None and file.size > MAX_FILE_SIZE:
             raise HTTPException(
                 status_code=400,
                 detail="El archivo es demasiado grande. Máximo 5MB."
             )
 
-        # Verificar que sea una imagen válida
-        if not is_valid_image(contents):
+        # Leer el archivo por bloques, cortando apenas supere el máximo
+        contents = await read_with_limit(file)
+
+        # Validar y normalizar (orientación, sin EXIF, variantes) en el pool de procesos
+        try:
+            image = await process_image(contents)
+        except ValueError as e:
+            logger.error("Error validando imagen: %s", e)
             raise HTTPException(
                 status_code=400,
                 detail="El archivo no es una imagen válida"
@@ -77,75 +101,48 @@ async def upload_file(file: UploadFile = File(...)):
         # Generar nombre único para el archivo
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         random_uuid = str(uuid.uuid4())[:8]
-        new_filename = f"resident_photo_{timestamp}_{random_uuid}{file_ext}"
+        base_name = f"resident_photo_{timestamp}_{random_uuid}"
+        filenames = {
+            name: f"{base_name}{'' if name == 'original' else '_' + name}{image['extension']}"
+            for name in image['variants']
+        }
 
-        logger.info(f"Intentando subir archivo: {new_filename}")
+        logger.info("Intentando subir archivo: %s", filenames['original'])
 
         try:
-            # Verificar si el bucket existe
-            buckets = supabase_client.storage.list_buckets()
-            logger.info(f"Buckets disponibles: {buckets}")
-            
-            bucket_exists = False
-            for bucket in buckets:
-                if bucket.name == BUCKET_NAME:
-                    bucket_exists = True
-                    break
-
-            if not bucket_exists:
-                logger.info(f"El bucket {BUCKET_NAME} no existe, intentando crearlo...")
-                try:
-                    supabase_client.storage.create_bucket(BUCKET_NAME, {'public': True})
-                    logger.info(f"Bucket {BUCKET_NAME} creado exitosamente")
-                except Exception as e:
-                    logger.error(f"No se pudo crear el bucket: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail="No se pudo crear el bucket de almacenamiento. Por favor, contacta al administrador."
-                    )
-
-            # Subir a Supabase Storage
-            logger.info("Iniciando subida a Supabase Storage...")
-            logger.info(f"Content type: {content_type}")
-            logger.info(f"File size: {len(contents)} bytes")
-            
-            # Intentar con método alternativo
-            try:
-                # Crear un archivo temporal con el content type correcto
-                import tempfile
-                with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-                    temp_file.write(contents)
-                    temp_file.flush()
-                    
-                    # Subir usando el archivo temporal
-                    with open(temp_file.name, 'rb') as f:
-                        response = supabase_client.storage.from_(BUCKET_NAME).upload(
-                            path=new_filename,
-                            file=f
-                        )
-                    
-                    # Limpiar archivo temporal
-                    import os
-                    os.unlink(temp_file.name)
-                    
-            except Exception as e:
-                logger.error(f"Error con método upload: {str(e)}")
-                # Intentar método alternativo sin file_options
-            response = supabase_client.storage.from_(BUCKET_NAME).upload(
-                path=new_filename,
-                    file=contents
-            )
-            
-            logger.info(f"Archivo subido exitosamente: {response}")
-
-            # Obtener URL pública
-            file_url = supabase_client.storage.from_(BUCKET_NAME).get_public_url(new_filename)
-            logger.info(f"URL pública generada: {file_url}")
-
-            return {"url": file_url}
-
+            await ensure_bucket()
+
+            # Subir todas las variantes en paralelo, una sola vez cada una
+            bucket = storage().from_(BUCKET_NAME)
+            await asyncio.gather(*(
+                bucket.upload(
+                    path=filenames[name],
+                    file=data,
+                    file_options={"content-type": image['content_type']}
+                )
+                for name, data in image['variants'].items()
+            ))
+            logger.info("Archivo subido exitosamente: %s", filenames['original'])
+
+            # Obtener URLs públicas
+            variant_urls = {
+                name: await bucket.get_public_url(filename)
+                for name, filename in filenames.items()
+            }
+
+            # "url" es la que se guarda como photo_url: la variante mediana
+            # basta para avatares y perfiles
+            return {
+                "url": variant_urls['medium'],
+                "variants": variant_urls,
+                "width": image['width'],
+                "height": image['height']
+            }
+
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error en operación de Supabase: {str(e)}")
+            logger.error("Error en operación de Supabase: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error al procesar el archivo en Supabase: {str(e)}"
@@ -154,7 +151,7 @@ async def upload_file(file: UploadFile = File(...)):
     except HTTPException as he:
         raise he
     except Exception as e:
-        logger.error(f"Error general: {str(e)}")
+        logger.error("Error general: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error inesperado: {str(e)}"
@@ -1,9 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import List, Optional
-from datetime import datetime
-from pydantic import BaseModel, Field
-from supabase_client import supabase_client
+from datetime import date, datetime, timedelta
+from pydantic import BaseModel, Field, ValidationError
+from supabase_client import table, execute
+from conditional import conditional_response, not_modified
+from serialization import raw_json
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CountMethod, encode_cursor, fetch_all, fetch_page, set_page_headers
+from vital_stats import Bucket, aggregate, downsample
+from alerts import engine as alert_engine
+from events import broker
+from projection import parse_fields, select_columns, projection_model, fields_description
+import facility_time
+import asyncio
+import csv
+import json
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +41,30 @@ class VitalSign(BaseModel):
 
 router = APIRouter()
 
+# Clave de paginación keyset: índice sugerido (resident_id, taken_at desc, id desc)
+VITAL_SIGN_KEY = ['taken_at', 'id']
+
+# Proyección por defecto de las listas: sin created_at / updated_at ni columnas internas (synced_at)
+VITAL_SIGN_LIST_FIELDS = ('id', 'resident_id', 'type', 'value', 'unit', 'systolic', 'diastolic',
+                          'taken_at', 'notes', 'taken_by')
+VitalSignListItem = projection_model(VitalSign, VITAL_SIGN_LIST_FIELDS, 'VitalSignListItem')
+
+def vital_sign_columns(fields: Optional[str]) -> str:
+    return select_columns(parse_fields(fields, VitalSign, VITAL_SIGN_LIST_FIELDS, VITAL_SIGN_KEY))
+
+FIELDS_QUERY = Query(None, description=fields_description(VitalSign, VITAL_SIGN_LIST_FIELDS))
+
+# Ingesta masiva: filas por insert, inserts simultáneos y tope del reporte de errores
+INGEST_CHUNK_SIZE = 1000
+INGEST_CONCURRENCY = 4
+MAX_REPORTED_ERRORS = 1000
+
+# Agregados y tendencias: rango por defecto (días) y puntos de la serie reducida
+AGGREGATE_DEFAULT_DAYS = 30
+TREND_DEFAULT_DAYS = 365
+TREND_DEFAULT_POINTS = 300
+TREND_MAX_POINTS = 2000
+
 @router.get("/test")
 def test_vital_signs():
     return {"message": "vital signs router is working"}
@@ -64,36 +100,61 @@ def prepare_vital_sign_data(data: dict) -> dict:
     
     return cleaned_data
 
-@router.get("/vital-signs/", response_model=List[VitalSign])
-async def get_all_vital_signs():
-    """Obtener todos los signos vitales"""
+@router.get("/vital-signs/", response_model=List[VitalSignListItem])
+async def get_all_vital_signs(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    count: Optional[CountMethod] = None,
+    fields: Optional[str] = FIELDS_QUERY
+):
+    """Obtener signos vitales (paginados por cursor, más recientes primero)"""
     try:
-        response = supabase_client.table('vital_signs').select("*").order('taken_at', desc=True).execute()
-        return response.data
+        query = table('vital_signs').select(vital_sign_columns(fields), count=count)
+        rows, next_cursor, total = await fetch_page(query, VITAL_SIGN_KEY, limit, cursor)
+        set_page_headers(response, next_cursor, total)
+        return conditional_response(request, response, rows, key=(rows, next_cursor, total), raw=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting vital signs: {str(e)}")
+        logger.error("Error getting vital signs: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/vital-signs/resident/{resident_id}", response_model=List[VitalSign])
-async def get_vital_signs_by_resident(resident_id: str):
-    """Obtener signos vitales por residente"""
+@router.get("/vital-signs/resident/{resident_id}", response_model=List[VitalSignListItem])
+async def get_vital_signs_by_resident(
+    resident_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    count: Optional[CountMethod] = None,
+    fields: Optional[str] = FIELDS_QUERY
+):
+    """Obtener signos vitales por residente (paginados por cursor)"""
     try:
-        response = supabase_client.table('vital_signs').select("*").eq('resident_id', resident_id).order('taken_at', desc=True).execute()
-        return response.data
+        query = table('vital_signs').select(vital_sign_columns(fields), count=count).eq('resident_id', resident_id)
+        rows, next_cursor, total = await fetch_page(query, VITAL_SIGN_KEY, limit, cursor)
+        set_page_headers(response, next_cursor, total)
+        return conditional_response(request, response, rows, key=(rows, next_cursor, total), raw=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting vital signs for resident {resident_id}: {str(e)}")
+        logger.error("Error getting vital signs for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/vital-signs/{vital_sign_id}", response_model=VitalSign)
-async def get_vital_sign(vital_sign_id: str):
+async def get_vital_sign(vital_sign_id: str, request: Request, response: Response):
     """Obtener un signo vital específico"""
     try:
-        response = supabase_client.table('vital_signs').select("*").eq('id', vital_sign_id).execute()
-        if not response.data:
+        result = await execute(table('vital_signs').select("*").eq('id', vital_sign_id))
+        if not result.data:
             raise HTTPException(status_code=404, detail="Signo vital no encontrado")
-        return response.data[0]
+        return conditional_response(request, response, result.data[0])
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting vital sign {vital_sign_id}: {str(e)}")
+        logger.error("Error getting vital sign %s: %s", vital_sign_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/vital-signs/", response_model=VitalSign)
@@ -102,89 +163,266 @@ async def create_vital_sign(vital_sign: VitalSign):
     try:
         # Preparar datos para Supabase
         data = prepare_vital_sign_data(vital_sign.dict())
-        logger.info(f"Creating vital sign with data: {data}")
+        logger.debug("Creating vital sign", extra={"data": data})
         
-        response = supabase_client.table('vital_signs').insert(data).execute()
+        response = await execute(table('vital_signs').insert(data))
+        # La evaluación de alertas corre en segundo plano: no agrega latencia aquí
+        alert_engine.submit(response.data[0])
+        broker.publish('vital_sign.created', response.data[0], response.data[0]['resident_id'])
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error creating vital sign: {str(e)}")
+        logger.error("Error creating vital sign: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def iter_lines(request: Request):
+    """Líneas del cuerpo a medida que llegan, sin cargar el cuerpo completo"""
+    buffer = b''
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8-sig').rstrip('\r')
+    if buffer:
+        yield buffer.decode('utf-8-sig').rstrip('\r')
+
+async def iter_json_records(request: Request):
+    body = await request.body()
+    try:
+        records = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"JSON inválido: {str(e)}")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Se esperaba un array JSON de signos vitales")
+    for row_number, record in enumerate(records, start=1):
+        yield row_number, record
+
+async def iter_ndjson_records(request: Request):
+    row_number = 0
+    async for line in iter_lines(request):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"JSON inválido: {str(e)}")
+
+async def iter_csv_records(request: Request):
+    header = None
+    row_number = 0
+    async for line in iter_lines(request):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [column.strip() for column in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, ValueError(f"Se esperaban {len(header)} columnas y llegaron {len(values)}")
+            continue
+        # En CSV las celdas vacías equivalen a null
+        yield row_number, {column: (value if value != '' else None) for column, value in zip(header, values)}
+
+RECORD_PARSERS = {
+    'application/json': iter_json_records,
+    'application/x-ndjson': iter_ndjson_records,
+    'application/ndjson': iter_ndjson_records,
+    'text/csv': iter_csv_records
+}
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors())
+    return str(error)
+
+@router.post("/vital-signs/batch")
+async def create_vital_signs_batch(request: Request):
+    """Ingesta masiva de signos vitales (lectores de dispositivos e importaciones).
+
+    Acepta un array JSON, NDJSON (application/x-ndjson) o CSV con encabezado
+    (text/csv). Cada fila se valida con VitalSign y prepare_vital_sign_data; las
+    válidas se insertan en bloques de INGEST_CHUNK_SIZE y se devuelve un reporte
+    de errores por número de fila.
+    """
+    content_type = request.headers.get('content-type', 'application/json').split(';')[0].strip().lower()
+    parser = RECORD_PARSERS.get(content_type)
+    if parser is None:
+        raise HTTPException(status_code=415, detail="Use application/json, application/x-ndjson o text/csv")
+
+    errors = []
+    received = 0
+    inserted = 0
+    imported_residents = set()
+    semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+    tasks = []
+
+    async def insert_chunk(rows: list):
+        nonlocal inserted
+        try:
+            await execute(table('vital_signs').insert([data for _, data in rows], returning="minimal"))
+            inserted += len(rows)
+            imported_residents.update(data['resident_id'] for _, data in rows)
+            alert_engine.submit_many(data for _, data in rows)
+        except Exception as e:
+            logger.error("Error inserting vital signs chunk: %s", e)
+            errors.extend({"row": row_number, "error": str(e)} for row_number, _ in rows)
+        finally:
+            semaphore.release()
+
+    async def flush(rows: list):
+        # Contrapresión: no se parsea más allá de INGEST_CONCURRENCY bloques en vuelo
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(insert_chunk(rows)))
+
+    try:
+        chunk = []
+        async for row_number, record in parser(request):
+            received += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                if not isinstance(record, dict):
+                    raise ValueError("Cada fila debe ser un objeto")
+                data = prepare_vital_sign_data(VitalSign(**record).dict())
+                # El id se genera aquí: el insert no devuelve las filas y las alertas lo necesitan
+                data['id'] = str(uuid.uuid4())
+                chunk.append((row_number, data))
+            except Exception as e:
+                errors.append({"row": row_number, "error": describe_error(e)})
+                continue
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                await flush(chunk)
+                chunk = []
+        if chunk:
+            await flush(chunk)
+        await asyncio.gather(*tasks)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error ingesting vital signs batch: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+    errors.sort(key=lambda error: error['row'])
+    logger.info("Vital signs batch: %s/%s rows inserted", inserted, received)
+    # Un solo evento por importación: miles de filas no se reenvían una a una
+    if inserted:
+        broker.publish('vital_sign.imported', {"inserted": inserted, "resident_ids": sorted(imported_residents)})
+    return {
+        "received": received,
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "errors_truncated": len(errors) > MAX_REPORTED_ERRORS
+    }
+
 @router.put("/vital-signs/{vital_sign_id}", response_model=VitalSign)
 async def update_vital_sign(vital_sign_id: str, vital_sign: VitalSign):
     """Actualizar un signo vital existente"""
     try:
         # Preparar datos para Supabase
         data = prepare_vital_sign_data(vital_sign.dict())
-        logger.info(f"Updating vital sign {vital_sign_id} with data: {data}")
+        logger.debug("Updating vital sign %s", vital_sign_id, extra={"data": data})
         
-        response = supabase_client.table('vital_signs').update(data).eq('id', vital_sign_id).execute()
+        response = await execute(table('vital_signs').update(data).eq('id', vital_sign_id))
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Signo vital no encontrado")
             
-        logger.info(f"Update response: {response.data}")
+        broker.publish('vital_sign.updated', response.data[0], response.data[0]['resident_id'])
         return response.data[0]
     except Exception as e:
-        logger.error(f"Error updating vital sign {vital_sign_id}: {str(e)}")
+        logger.error("Error updating vital sign %s: %s", vital_sign_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/vital-signs/{vital_sign_id}")
 async def delete_vital_sign(vital_sign_id: str):
     """Eliminar un signo vital"""
     try:
-        response = supabase_client.table('vital_signs').delete().eq('id', vital_sign_id).execute()
+        response = await execute(table('vital_signs').delete().eq('id', vital_sign_id))
         if not response.data:
             raise HTTPException(status_code=404, detail="Signo vital no encontrado")
+        broker.publish('vital_sign.deleted', {"id": vital_sign_id}, response.data[0].get('resident_id'))
         return {"message": "Signo vital eliminado"}
     except Exception as e:
-        logger.error(f"Error deleting vital sign {vital_sign_id}: {str(e)}")
+        logger.error("Error deleting vital sign %s: %s", vital_sign_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/vital-signs/resident/{resident_id}/latest", response_model=List[VitalSign])
-async def get_latest_vital_signs_by_resident(resident_id: str, limit: int = 5):
+@router.get("/vital-signs/resident/{resident_id}/latest", response_model=List[VitalSignListItem])
+async def get_latest_vital_signs_by_resident(
+    resident_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(5, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = FIELDS_QUERY
+):
     """Obtener los últimos signos vitales de un residente"""
     try:
-        response = supabase_client.table('vital_signs').select("*").eq('resident_id', resident_id).order('taken_at', desc=True).limit(limit).execute()
-        return response.data
+        query = table('vital_signs').select(vital_sign_columns(fields)).eq('resident_id', resident_id)
+        result = await execute(query.order('taken_at', desc=True).limit(limit))
+        return conditional_response(request, response, result.data, raw=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting latest vital signs for resident {resident_id}: {str(e)}")
+        logger.error("Error getting latest vital signs for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/vital-signs/resident/{resident_id}/paginated")
-async def get_vital_signs_paginated(resident_id: str, page: int = 1, limit: int = 10):
-    """Obtener signos vitales paginados de un residente"""
+async def get_vital_signs_paginated(
+    resident_id: str,
+    request: Request,
+    response: Response,
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    count: Optional[CountMethod] = None,
+    fields: Optional[str] = FIELDS_QUERY
+):
+    """Obtener signos vitales paginados de un residente.
+
+    Con `cursor` pagina por keyset sobre (taken_at, id); sin cursor mantiene la
+    paginación por número de página. En ambos casos solo cuenta si se pide
+    `count` (el COUNT exacto recorre todas las filas del residente); has_next
+    sale de pedir una fila de más.
+    """
     try:
-        # Calcular offset
-        offset = (page - 1) * limit
-        
-        # Obtener el total de registros
-        count_response = supabase_client.table('vital_signs').select("*", count="exact").eq('resident_id', resident_id).execute()
-        total_count = count_response.count
-        
-        # Obtener registros paginados
-        response = supabase_client.table('vital_signs').select("*").eq('resident_id', resident_id).order('taken_at', desc=True).range(offset, offset + limit - 1).execute()
-        
+        columns = vital_sign_columns(fields)
+        if cursor:
+            query = table('vital_signs').select(columns, count=count).eq('resident_id', resident_id)
+            data, next_cursor, total_count = await fetch_page(query, VITAL_SIGN_KEY, limit, cursor)
+            page = None
+        else:
+            offset = (page - 1) * limit
+            query = table('vital_signs').select(columns, count=count).eq('resident_id', resident_id)
+            for column in VITAL_SIGN_KEY:
+                query = query.order(column, desc=True)
+            result = await execute(query.range(offset, offset + limit))
+            data, total_count = result.data[:limit], result.count
+            next_cursor = encode_cursor(data[-1], VITAL_SIGN_KEY) if len(result.data) > limit else None
+
         # Calcular información de paginación
-        total_pages = (total_count + limit - 1) // limit  # ceil division
-        
-        return {
-            "data": response.data,
+        total_pages = (total_count + limit - 1) // limit if total_count is not None else None
+
+        return conditional_response(request, response, {
+            "data": data,
             "pagination": {
                 "page": page,
                 "limit": limit,
                 "total_count": total_count,
                 "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
+                "has_next": next_cursor is not None,
+                "has_prev": bool(cursor) or (page or 1) > 1,
+                "next_cursor": next_cursor
             }
-        }
+        }, raw=True)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error getting paginated vital signs for resident {resident_id}: {str(e)}")
+        logger.error("Error getting paginated vital signs for resident %s: %s", resident_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/vital-signs/calendar/{resident_id}")
-async def get_vital_signs_calendar(resident_id: str, year: int, month: int):
+async def get_vital_signs_calendar(resident_id: str, year: int, month: int, request: Request, response: Response):
     """Obtener datos del calendario de signos vitales para un mes específico"""
     try:
         # Obtener signos vitales del mes
@@ -194,8 +432,13 @@ async def get_vital_signs_calendar(resident_id: str, year: int, month: int):
         else:
             end_date = f"{year}-{month + 1:02d}-01"
             
-        response = supabase_client.table('vital_signs').select("*").eq('resident_id', resident_id).gte('taken_at', start_date).lt('taken_at', end_date).order('taken_at', desc=True).execute()
-        vital_signs = response.data
+        result = await execute(table('vital_signs').select("*").eq('resident_id', resident_id).gte('taken_at', start_date).lt('taken_at', end_date).order('taken_at', desc=True))
+        vital_signs = result.data
+        
+        # Si el mes no cambió no hace falta agrupar ni serializar
+        unchanged = not_modified(request, response, vital_signs)
+        if unchanged is not None:
+            return unchanged
         
         # Procesar datos para el calendario
         calendar_data = {}
@@ -207,13 +450,87 @@ async def get_vital_signs_calendar(resident_id: str, year: int, month: int):
                 calendar_data[date_key] = []
             calendar_data[date_key].append(record)
         
-        return {
+        return raw_json({
             "vital_signs": vital_signs,
             "calendar_data": calendar_data,
             "month": month,
             "year": year
-        }
+        }, response)
         
     except Exception as e:
-        logger.error(f"Error getting vital signs calendar for resident {resident_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Error getting vital signs calendar for resident %s: %s", resident_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def vital_signs_range_query(resident_id: str, start_date: str, end_date: str, vital_type: Optional[str]):
+    """Consulta de las columnas necesarias para agregados y tendencias en [start_date, end_date)"""
+    query = table('vital_signs').select("id, type, value, systolic, diastolic, taken_at").eq('resident_id', resident_id).gte('taken_at', start_date).lt('taken_at', end_date)
+    if vital_type:
+        query = query.eq('type', vital_type)
+    return query
+
+def default_range(start_date: Optional[str], end_date: Optional[str], days: int):
+    """Rango por defecto: los últimos `days` días hasta mañana (incluye todo hoy, en la residencia)"""
+    end = end_date or (facility_time.today() + timedelta(days=1)).isoformat()
+    start = start_date or (date.fromisoformat(end[:10]) - timedelta(days=days)).isoformat()
+    return start, end
+
+@router.get("/vital-signs/resident/{resident_id}/aggregate")
+async def get_vital_signs_aggregate(
+    resident_id: str,
+    request: Request,
+    response: Response,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    bucket: Bucket = 'day',
+    type: Optional[str] = None
+):
+    """Mínimo, máximo, promedio y último valor por tipo y por día o semana.
+
+    Reemplaza traer todas las filas del mes para agruparlas en el cliente; la
+    presión arterial se resume por sistólica y diastólica.
+    """
+    try:
+        start_date, end_date = default_range(start_date, end_date, AGGREGATE_DEFAULT_DAYS)
+        rows = await fetch_all(lambda: vital_signs_range_query(resident_id, start_date, end_date, type), VITAL_SIGN_KEY)
+        return conditional_response(request, response, {
+            "resident_id": resident_id,
+            "start_date": start_date,
+            "end_date": end_date,
+            "bucket": bucket,
+            "series": aggregate(rows, bucket)
+        }, raw=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error aggregating vital signs for resident %s: %s", resident_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/vital-signs/resident/{resident_id}/trend")
+async def get_vital_signs_trend(
+    resident_id: str,
+    request: Request,
+    response: Response,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    type: Optional[str] = None,
+    points: int = Query(TREND_DEFAULT_POINTS, ge=3, le=TREND_MAX_POINTS)
+):
+    """Serie temporal por tipo reducida con LTTB a como mucho `points` puntos.
+
+    Un gráfico de un año recibe unos cientos de puntos (con sus picos y valles)
+    en lugar de miles de filas.
+    """
+    try:
+        start_date, end_date = default_range(start_date, end_date, TREND_DEFAULT_DAYS)
+        rows = await fetch_all(lambda: vital_signs_range_query(resident_id, start_date, end_date, type), VITAL_SIGN_KEY)
+        return conditional_response(request, response, {
+            "resident_id": resident_id,
+            "start_date": start_date,
+            "end_date": end_date,
+            "series": downsample(rows, points)
+        }, raw=True)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error getting vital signs trend for resident %s: %s", resident_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
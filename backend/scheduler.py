@@ -0,0 +1,162 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+from supabase_client import table, execute
+from pagination import quote
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() != "false"
+# Cada cuánto cada worker renueva (o intenta tomar) el liderazgo y revisa qué tareas tocan
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
+# Si el líder deja de renovar durante este tiempo, otro worker lo reemplaza
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "90"))
+
+LEASE_NAME = "hogar-scheduler"
+
+class Job:
+    def __init__(self, name: str, interval: float, func: Callable[[], Awaitable]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[str] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+class Scheduler:
+    """Tareas periódicas en segundo plano con un único líder entre workers.
+
+    Cada worker de uvicorn arranca su propio Scheduler desde el lifespan, pero
+    solo el que tiene el lease de la tabla scheduler_leases ejecuta las tareas.
+    El lease se toma con un UPDATE condicional (holder propio o vencido), así
+    que no hace falta más coordinación que la propia base. Las tareas deben ser
+    idempotentes: si el líder muere a mitad de una, otro la repite al vencer
+    el lease.
+    """
+
+    def __init__(self, lease_name: str = LEASE_NAME):
+        self.lease_name = lease_name
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.jobs = {}
+        self.task: Optional[asyncio.Task] = None
+        self.leader = False
+        self.lease_ready = False
+
+    def add_job(self, name: str, interval: float, func: Callable[[], Awaitable]):
+        self.jobs[name] = Job(name, interval, func)
+
+    def start(self):
+        if SCHEDULER_ENABLED and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+        if self.leader:
+            await self.release()
+
+    async def acquire(self) -> bool:
+        """Toma o renueva el lease; True si este worker es el líder"""
+        now = datetime.now(timezone.utc)
+        if not self.lease_ready:
+            # La fila del lease se crea una vez; ignore_duplicates la deja como esté
+            await execute(table('scheduler_leases').upsert(
+                {'name': self.lease_name, 'holder': None, 'expires_at': datetime.fromtimestamp(0, timezone.utc).isoformat()},
+                on_conflict='name', ignore_duplicates=True
+            ))
+            self.lease_ready = True
+        expires_at = now + timedelta(seconds=SCHEDULER_LEASE_SECONDS)
+        result = await execute(
+            table('scheduler_leases')
+            .update({'holder': self.holder, 'expires_at': expires_at.isoformat()})
+            .eq('name', self.lease_name)
+            .or_(f"holder.eq.{quote(self.holder)},expires_at.lt.{quote(now.isoformat())}")
+        )
+        leader = bool(result.data)
+        if leader != self.leader:
+            logger.info("Scheduler %s %s leadership", self.holder, "acquired" if leader else "lost")
+        self.leader = leader
+        return leader
+
+    async def release(self):
+        """Libera el lease al apagar para que otro worker tome el relevo sin esperar"""
+        try:
+            await execute(
+                table('scheduler_leases')
+                .update({'holder': None, 'expires_at': datetime.fromtimestamp(0, timezone.utc).isoformat()})
+                .eq('name', self.lease_name)
+                .eq('holder', self.holder)
+            )
+        except Exception as e:
+            logger.warning("Could not release scheduler lease: %s", e)
+        self.leader = False
+
+    async def run_job(self, job: Job):
+        start = time.perf_counter()
+        job.last_run = datetime.now().isoformat()
+        try:
+            await job.func()
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            logger.error("Scheduled job %s failed: %s", job.name, e)
+        finally:
+            job.runs += 1
+            job.last_duration_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    async def tick(self):
+        """Una vuelta: renovar el lease y, si somos líder, correr las tareas vencidas"""
+        try:
+            leader = await self.acquire()
+        except Exception as e:
+            logger.warning("Could not acquire scheduler lease: %s", e)
+            self.leader = False
+            return
+        if not leader:
+            # Al recuperar el liderazgo las tareas corren enseguida
+            for job in self.jobs.values():
+                job.next_run = 0.0
+            return
+        for job in self.jobs.values():
+            if time.monotonic() >= job.next_run:
+                job.next_run = time.monotonic() + job.interval
+                await self.run_job(job)
+
+    async def run(self):
+        while True:
+            await self.tick()
+            await asyncio.sleep(SCHEDULER_TICK_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": SCHEDULER_ENABLED,
+            "holder": self.holder,
+            "leader": self.leader,
+            "jobs": {
+                job.name: {
+                    "interval_seconds": job.interval,
+                    "runs": job.runs,
+                    "failures": job.failures,
+                    "last_run": job.last_run,
+                    "last_duration_ms": job.last_duration_ms,
+                    "last_error": job.last_error
+                }
+                for job in self.jobs.values()
+            }
+        }
+
+scheduler = Scheduler()
@@ -0,0 +1,20 @@
+from typing import Any, Optional
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse serializada con orjson (varias veces más rápido que json)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def raw_json(data, response: Optional[Response] = None, status_code: int = 200) -> ORJSONResponse:
+    """Devuelve datos tal como vienen de Supabase, sin re-validarlos con response_model.
+
+    Al devolver una Response, FastAPI omite la validación y serialización del
+    response_model (que se sigue usando para la documentación OpenAPI). Los
+    headers ya puestos en `response` (ETag, paginación) se conservan.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return ORJSONResponse(content=data, status_code=status_code, headers=headers)
@@ -0,0 +1,16 @@
+import time
+from typing import Awaitable, Dict, TypeVar
+
+T = TypeVar("T")
+
+async def timed(timings: Dict[str, float], name: str, awaitable: Awaitable[T]) -> T:
+    """Espera `awaitable` y guarda su duración en ms en `timings[name]`"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Header Server-Timing, p. ej. `resident;dur=1.2, contacts;dur=8.4`"""
+    return ", ".join(f"{name};dur={duration:.1f}" for name, duration in timings.items())
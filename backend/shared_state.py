@@ -0,0 +1,255 @@
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+# memory:// (un solo worker) o redis://[usuario:clave@]host:puerto/db (varios workers)
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+# Conexiones por worker y tiempo máximo por comando: si Redis no responde la
+# petición sigue sin caché / sin límite en lugar de quedar esperando
+SHARED_STATE_MAX_CONNECTIONS = int(os.getenv("SHARED_STATE_MAX_CONNECTIONS", "10"))
+SHARED_STATE_TIMEOUT = float(os.getenv("SHARED_STATE_TIMEOUT", "1"))
+# Prefijo de todas las claves: varios entornos pueden compartir la misma instancia
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "hogar:")
+
+# RESP2: lo hablan todas las versiones de Redis/Valkey y los servidores compatibles
+REDIS_PROTOCOL = 2
+
+# Cada cuántas escrituras el backend en memoria purga las claves vencidas
+MEMORY_PURGE_EVERY = 1000
+
+class SharedStateError(Exception):
+    pass
+
+class MemoryBackend:
+    """Estado en el propio proceso: claves con vencimiento, hashes y contadores.
+
+    Es el backend por defecto (un worker). publish/subscribe no hacen nada: en
+    un solo proceso los suscriptores ya reciben los eventos directamente.
+    """
+
+    kind = 'memory'
+    shared = False
+
+    def __init__(self):
+        self.values: Dict[str, Tuple[float, object]] = {}
+        self.writes = 0
+
+    def _get(self, key: str):
+        entry = self.values.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.values[key]
+            return None
+        return entry[1]
+
+    def _set(self, key: str, value, ttl: float):
+        self.values[key] = (time.monotonic() + ttl, value)
+        self.writes += 1
+        if self.writes % MEMORY_PURGE_EVERY == 0:
+            now = time.monotonic()
+            for expired in [key for key, (expires, _) in self.values.items() if expires < now]:
+                del self.values[expired]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float, only_if_absent: bool = False) -> bool:
+        if only_if_absent and self._get(key) is not None:
+            return False
+        self._set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self.values.pop(key, None)
+
+    async def incr(self, key: str, ttl: float) -> int:
+        """Contador que vence `ttl` segundos después de su primer incremento"""
+        entry = self.values.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._set(key, 1, ttl)
+            return 1
+        self.values[key] = (entry[0], entry[1] + 1)
+        return entry[1] + 1
+
+    async def hget(self, name: str, field: str) -> Optional[bytes]:
+        return (self._get(name) or {}).get(field)
+
+    async def hset(self, name: str, field: str, value: bytes, ttl: float):
+        fields = self._get(name) or {}
+        fields[field] = value
+        self._set(name, fields, ttl)
+
+    async def hdel(self, name: str, field: str):
+        (self._get(name) or {}).pop(field, None)
+
+    async def publish(self, channel: str, message: bytes):
+        pass
+
+    def subscribe(self, channel: str, handler: Callable[[bytes], None]):
+        pass
+
+    async def close(self):
+        self.values.clear()
+
+    def stats(self) -> dict:
+        return {"backend": self.kind, "keys": len(self.values)}
+
+class RedisBackend:
+    """Estado compartido en Redis (o Valkey) con redis.asyncio.
+
+    Cada worker mantiene un pool de hasta SHARED_STATE_MAX_CONNECTIONS
+    conexiones; si no hay una libre o Redis no responde en
+    SHARED_STATE_TIMEOUT segundos el comando falla con SharedStateError, y
+    quien llama sigue sin caché / sin límite. Las suscripciones usan una
+    conexión aparte, sin timeout de lectura, que se reconecta si se corta.
+    """
+
+    kind = 'redis'
+    shared = True
+
+    def __init__(self, url: str, max_connections: int = SHARED_STATE_MAX_CONNECTIONS,
+                 timeout: float = SHARED_STATE_TIMEOUT):
+        self.url = url
+        self.pool = redis.BlockingConnectionPool.from_url(
+            url, max_connections=max_connections, timeout=timeout,
+            socket_timeout=timeout, socket_connect_timeout=timeout, protocol=REDIS_PROTOCOL
+        )
+        self.client = redis.Redis(connection_pool=self.pool)
+        self.subscriptions: Dict[str, Callable[[bytes], None]] = {}
+        self.subscriber_task: Optional[asyncio.Task] = None
+        self.errors = 0
+
+    @asynccontextmanager
+    async def errors_as_shared_state(self):
+        try:
+            yield
+        except (redis.RedisError, OSError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            raise SharedStateError(str(e) or type(e).__name__) from e
+
+    def key(self, name: str) -> str:
+        return SHARED_STATE_PREFIX + name
+
+    async def get(self, key: str) -> Optional[bytes]:
+        async with self.errors_as_shared_state():
+            return await self.client.get(self.key(key))
+
+    async def set(self, key: str, value: bytes, ttl: float, only_if_absent: bool = False) -> bool:
+        async with self.errors_as_shared_state():
+            return bool(await self.client.set(self.key(key), value, px=max(1, int(ttl * 1000)), nx=only_if_absent))
+
+    async def delete(self, key: str):
+        async with self.errors_as_shared_state():
+            await self.client.delete(self.key(key))
+
+    async def incr(self, key: str, ttl: float) -> int:
+        # SET NX fija el vencimiento solo en el primer incremento de la ventana
+        async with self.errors_as_shared_state():
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.set(self.key(key), 0, px=max(1, int(ttl * 1000)), nx=True)
+                pipe.incr(self.key(key))
+                _, count = await pipe.execute()
+        return count
+
+    async def hget(self, name: str, field: str) -> Optional[bytes]:
+        async with self.errors_as_shared_state():
+            return await self.client.hget(self.key(name), field)
+
+    async def hset(self, name: str, field: str, value: bytes, ttl: float):
+        async with self.errors_as_shared_state():
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hset(self.key(name), field, value)
+                pipe.pexpire(self.key(name), max(1, int(ttl * 1000)))
+                await pipe.execute()
+
+    async def hdel(self, name: str, field: str):
+        async with self.errors_as_shared_state():
+            await self.client.hdel(self.key(name), field)
+
+    async def publish(self, channel: str, message: bytes):
+        async with self.errors_as_shared_state():
+            await self.client.publish(self.key(channel), message)
+
+    def subscribe(self, channel: str, handler: Callable[[bytes], None]):
+        """Registra `handler` para los mensajes del canal (una conexión dedicada por worker)"""
+        self.subscriptions[self.key(channel)] = handler
+        if self.subscriber_task is not None and not self.subscriber_task.done():
+            # Reiniciar la escucha para sumar el canal nuevo
+            self.subscriber_task.cancel()
+        self.subscriber_task = asyncio.create_task(self.listen())
+
+    async def listen(self):
+        """Escucha los canales suscritos; si la conexión se corta, reconecta con espera creciente"""
+        delay = 1.0
+        while True:
+            client = redis.Redis.from_url(self.url, socket_connect_timeout=self.pool.connection_kwargs['socket_connect_timeout'],
+                                          protocol=REDIS_PROTOCOL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(*self.subscriptions)
+                delay = 1.0
+                async for message in pubsub.listen():
+                    handler = self.subscriptions.get(message['channel'].decode())
+                    if handler is not None:
+                        handler(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Shared state subscription lost (%s), retrying in %.0fs", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                await pubsub.aclose()
+                await client.aclose()
+
+    async def close(self):
+        if self.subscriber_task is not None:
+            self.subscriber_task.cancel()
+            try:
+                await self.subscriber_task
+            except asyncio.CancelledError:
+                pass
+            self.subscriber_task = None
+        await self.client.aclose()
+        await self.pool.disconnect()
+
+    def stats(self) -> dict:
+        kwargs = self.pool.connection_kwargs
+        return {
+            "backend": self.kind,
+            "server": f"{kwargs.get('host')}:{kwargs.get('port')}/{kwargs.get('db', 0)}",
+            "errors": self.errors
+        }
+
+def create_backend(url: str):
+    scheme = urlsplit(url).scheme
+    if scheme == 'memory':
+        return MemoryBackend()
+    if scheme in ('redis', 'rediss'):
+        return RedisBackend(url)
+    raise ValueError(f"SHARED_STATE_URL no soportada: {url}")
+
+# Se crea bajo demanda (ver get_backend), nunca al importar el módulo
+backend = None
+
+def get_backend():
+    global backend
+    if backend is None:
+        backend = create_backend(SHARED_STATE_URL)
+        logger.info("Shared state backend: %s", backend.kind)
+    return backend
+
+async def close():
+    global backend
+    if backend is not None:
+        await backend.close()
+        backend = None
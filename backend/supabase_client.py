@@ -1,37 +1,125 @@
 import os
-from supabase import create_client
+import time
+import asyncio
+import httpx
+from datetime import datetime
+from supabase import AsyncClient, AsyncClientOptions
 from dotenv import load_dotenv
 import logging
+import metrics
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Obtener credenciales
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # Usar service role key para tener permisos de admin
+# Tamaño del pool de conexiones HTTP compartido por todos los routers
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    logger.error("Faltan credenciales de Supabase")
-    raise ValueError("SUPABASE_URL y SUPABASE_SERVICE_ROLE_KEY son requeridas")
+# Intervalos (segundos) del chequeo de disponibilidad en segundo plano
+READINESS_RETRY_INTERVAL = float(os.getenv("READINESS_RETRY_INTERVAL", "5"))
+READINESS_CHECK_INTERVAL = float(os.getenv("READINESS_CHECK_INTERVAL", "60"))
 
-try:
-    logger.info(f"Inicializando cliente de Supabase con URL: {SUPABASE_URL}")
-    supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    
-    # Verificar la conexión intentando listar los buckets
+# El cliente se crea bajo demanda (ver init), nunca al importar el módulo
+supabase_client = None
+http_client = None
+
+# Estado del último chequeo de disponibilidad, expuesto en /ready
+readiness = {
+    "ready": False,
+    "checked_at": None,
+    "error": None
+}
+
+def init():
+    """Crea el cliente de Supabase y el pool HTTP compartido (sin tráfico de red)"""
+    global supabase_client, http_client
+    if supabase_client is not None:
+        return supabase_client
+
+    # Obtener credenciales
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")  # Usar service role key para tener permisos de admin
+
+    if not supabase_url or not supabase_key:
+        logger.error("Faltan credenciales de Supabase")
+        raise ValueError("SUPABASE_URL y SUPABASE_SERVICE_ROLE_KEY son requeridas")
+
+    try:
+        logger.info("Inicializando cliente de Supabase con URL: %s", supabase_url)
+        # Un único cliente httpx asíncrono: PostgREST y Storage reutilizan las
+        # mismas conexiones keep-alive y ninguna consulta bloquea el event loop.
+        http_client = httpx.AsyncClient(
+            timeout=SUPABASE_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_CONNECTIONS,
+            ),
+        )
+        supabase_client = AsyncClient(
+            supabase_url,
+            supabase_key,
+            options=AsyncClientOptions(httpx_client=http_client),
+        )
+        logger.info("Cliente de Supabase inicializado correctamente")
+    except Exception as e:
+        logger.error("Error al inicializar cliente de Supabase: %s", e)
+        raise
+    return supabase_client
+
+def get_client():
+    """Devuelve el cliente de Supabase, creándolo si todavía no existe"""
+    return supabase_client if supabase_client is not None else init()
+
+def table(table_name: str):
+    """Devuelve un query builder asíncrono de PostgREST para la tabla indicada"""
+    return get_client().table(table_name)
+
+def storage():
+    """Devuelve el cliente asíncrono de Supabase Storage"""
+    return get_client().storage
+
+async def execute(query):
+    """Ejecuta una consulta construida con table() sin bloquear el event loop.
+
+    Registra tabla, operación, filas y duración de cada consulta (ver metrics.py).
+    """
+    table_name, operation = metrics.describe_query(query)
+    start = time.perf_counter()
+    try:
+        result = await query.execute()
+    except Exception:
+        metrics.record_query(table_name, operation, 0, start, time.perf_counter(), failed=True)
+        raise
+    metrics.record_query(table_name, operation, metrics.count_rows(result), start, time.perf_counter())
+    return result
+
+async def check_storage():
+    """Verifica la conexión a Supabase Storage listando los buckets"""
     try:
         logger.info("Verificando conexión a Supabase Storage...")
-        buckets = supabase_client.storage.list_buckets()
-        logger.info(f"Conexión exitosa. Buckets disponibles: {[bucket.name for bucket in buckets]}")
+        buckets = await storage().list_buckets()
+        logger.info("Conexión exitosa. Buckets disponibles: %s", [bucket.name for bucket in buckets])
+        readiness.update(ready=True, error=None)
     except Exception as e:
-        logger.warning(f"No se pudieron listar los buckets: {str(e)}")
+        logger.warning("No se pudieron listar los buckets: %s", e)
         logger.warning("Esto podría indicar un problema con los permisos o la configuración de Storage")
-    
-    logger.info("Cliente de Supabase inicializado correctamente")
-except Exception as e:
-    logger.error(f"Error al inicializar cliente de Supabase: {str(e)}")
-    raise 
\ No newline at end of file
+        readiness.update(ready=False, error=str(e))
+    readiness["checked_at"] = datetime.now().isoformat()
+    return readiness["ready"]
+
+async def monitor_readiness():
+    """Chequeo periódico en segundo plano; reintenta más seguido mientras no esté listo"""
+    while True:
+        ready = await check_storage()
+        await asyncio.sleep(READINESS_CHECK_INTERVAL if ready else READINESS_RETRY_INTERVAL)
+
+async def close():
+    """Cierra el pool de conexiones HTTP compartido"""
+    global supabase_client, http_client
+    if http_client is not None:
+        await http_client.aclose()
+    supabase_client = None
+    http_client = None
+    readiness.update(ready=False, checked_at=None, error=None)
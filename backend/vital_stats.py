@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+import numpy as np
+
+# Tipo que se registra con sistólica/diastólica en lugar de `value`
+BLOOD_PRESSURE = 'Presión Arterial'
+
+Bucket = Literal['day', 'week']
+
+def period_key(day: str, bucket: Bucket) -> str:
+    """Día (YYYY-MM-DD) o lunes de su semana, igual que agrupa el calendario"""
+    if bucket == 'week':
+        value = date.fromisoformat(day)
+        return (value - timedelta(days=value.weekday())).isoformat()
+    return day
+
+def _column(rows: list, name: str) -> np.ndarray:
+    # None -> NaN, así los faltantes no cuentan en min/max/promedio
+    return np.array([row.get(name) for row in rows], dtype=float)
+
+def _number(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+def _reduce(values: np.ndarray, starts: np.ndarray) -> list:
+    """min/max/mean/last de cada tramo contiguo [starts[i], starts[i+1]) en una pasada vectorizada"""
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid, starts)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    mins = np.fmin.reduceat(values, starts)
+    maxs = np.fmax.reduceat(values, starts)
+    last_index = np.maximum.reduceat(np.where(valid, np.arange(len(values)), -1), starts)
+    last = np.where(last_index >= 0, values[np.maximum(last_index, 0)], np.nan)
+    means = np.divide(sums, counts, out=np.full(len(starts), np.nan), where=counts > 0)
+    return [
+        {"min": _number(mins[i]), "max": _number(maxs[i]), "mean": _number(means[i]), "last": _number(last[i])}
+        for i in range(len(starts))
+    ]
+
+def aggregate(rows: list, bucket: Bucket = 'day') -> dict:
+    """Resumen por tipo y período de filas ordenadas por taken_at ascendente.
+
+    Devuelve {tipo: [{period, count, min, max, mean, last}]}; para la presión
+    arterial cada período trae `systolic` y `diastolic` con esas mismas claves.
+    """
+    by_type = {}
+    for row in rows:
+        by_type.setdefault(row['type'], []).append(row)
+
+    result = {}
+    for vital_type, type_rows in by_type.items():
+        keys = np.array([period_key(row['taken_at'][:10], bucket) for row in type_rows])
+        # Las filas vienen ordenadas, así que cada período es un tramo contiguo
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        counts = np.diff(np.append(starts, len(keys)))
+        if vital_type == BLOOD_PRESSURE:
+            systolic = _reduce(_column(type_rows, 'systolic'), starts)
+            diastolic = _reduce(_column(type_rows, 'diastolic'), starts)
+            periods = [{"systolic": s, "diastolic": d} for s, d in zip(systolic, diastolic)]
+        else:
+            periods = _reduce(_column(type_rows, 'value'), starts)
+        result[vital_type] = [
+            {"period": str(keys[start]), "count": int(count), **stats}
+            for start, count, stats in zip(starts, counts, periods)
+        ]
+    return result
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Índices elegidos por Largest-Triangle-Three-Buckets.
+
+    Conserva el primer y el último punto y, de cada tramo intermedio, el que
+    forma el triángulo más grande con el punto anterior elegido y el promedio
+    del tramo siguiente: mantiene picos y valles con pocos puntos.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end >= next_end:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def downsample(rows: list, points: int) -> dict:
+    """Serie reducida a `points` puntos por tipo (LTTB sobre value, o sistólica para la presión)"""
+    by_type = {}
+    for row in rows:
+        by_type.setdefault(row['type'], []).append(row)
+
+    result = {}
+    for vital_type, type_rows in by_type.items():
+        blood_pressure = vital_type == BLOOD_PRESSURE
+        y = _column(type_rows, 'systolic' if blood_pressure else 'value')
+        valid = np.flatnonzero(~np.isnan(y))
+        x = np.array([datetime.fromisoformat(type_rows[i]['taken_at']).timestamp() for i in valid])
+        chosen = valid[lttb(x, y[valid], points)]
+        if blood_pressure:
+            series = [
+                {"taken_at": type_rows[i]['taken_at'], "systolic": type_rows[i].get('systolic'), "diastolic": type_rows[i].get('diastolic')}
+                for i in chosen
+            ]
+        else:
+            series = [{"taken_at": type_rows[i]['taken_at'], "value": type_rows[i].get('value')} for i in chosen]
+        result[vital_type] = {"total": len(type_rows), "points": series}
+    return result
@@ -0,0 +1,8 @@
+-- Clave de idempotencia para el registro de administraciones en lote
+ALTER TABLE medication_history ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+
+-- Índice único: un reintento con la misma clave no vuelve a registrar la dosis
+CREATE UNIQUE INDEX IF NOT EXISTS medication_history_idempotency_key_idx ON medication_history (idempotency_key);
+
+-- Comentario para documentar el nuevo campo
+COMMENT ON COLUMN medication_history.idempotency_key IS 'Clave generada por el cliente en POST /api/medications/administer/batch; NULL para administraciones individuales';
@@ -0,0 +1,26 @@
+-- Frecuencia interpretada una sola vez al crear o editar la medicación
+ALTER TABLE medications ADD COLUMN IF NOT EXISTS schedule JSONB;
+
+COMMENT ON COLUMN medications.schedule IS 'Horario estructurado generado desde frequency: {"kind": "daily" | "interval" | "prn", "times": ["08:00", ...], "interval_hours": int | null, "max_per_day": int}';
+
+-- Franjas de dosis esperadas por día, materializadas por el backend (ver backend/dose_schedule.py)
+CREATE TABLE IF NOT EXISTS medication_dose_slots (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    medication_id UUID NOT NULL REFERENCES medications(id) ON DELETE CASCADE,
+    resident_id UUID NOT NULL,
+    slot_date DATE NOT NULL,
+    scheduled_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Una franja por medicación y horario: la materialización repetida no duplica filas
+CREATE UNIQUE INDEX IF NOT EXISTS medication_dose_slots_medication_scheduled_idx ON medication_dose_slots (medication_id, scheduled_at);
+
+-- "Pendientes ahora" y vistas de toda la residencia por rango de tiempo
+CREATE INDEX IF NOT EXISTS medication_dose_slots_scheduled_idx ON medication_dose_slots (scheduled_at, medication_id);
+
+-- Estado de hoy y calendario de un residente
+CREATE INDEX IF NOT EXISTS medication_dose_slots_resident_scheduled_idx ON medication_dose_slots (resident_id, scheduled_at);
+
+COMMENT ON COLUMN medication_dose_slots.scheduled_at IS 'Hora local de la residencia (FACILITY_TIMEZONE), sin zona: la misma convención que medication_history.administered_at';
+COMMENT ON TABLE medication_dose_slots IS 'Dosis programadas de cada medicación; el backend mantiene DOSE_SLOT_DAYS días hacia adelante';
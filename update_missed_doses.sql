@@ -0,0 +1,32 @@
+-- Estado de cada franja según el barrido de dosis omitidas (ver backend/missed_doses.py)
+ALTER TABLE medication_dose_slots ADD COLUMN IF NOT EXISTS status TEXT;
+ALTER TABLE medication_dose_slots ADD COLUMN IF NOT EXISTS administered_at TIMESTAMP;
+ALTER TABLE medication_dose_slots ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+
+-- medication_history.administered_at sigue la misma convención que las franjas: hora local de
+-- la residencia sin zona (ver backend/facility_time.py). Si la columna era TIMESTAMPTZ se pasa a
+-- TIMESTAMP convirtiendo a la zona de la residencia (debe coincidir con FACILITY_TIMEZONE)
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'medication_history' AND column_name = 'administered_at') = 'timestamp with time zone' THEN
+        ALTER TABLE medication_history
+            ALTER COLUMN administered_at TYPE TIMESTAMP USING administered_at AT TIME ZONE 'America/Bogota';
+    END IF;
+END $$;
+
+COMMENT ON COLUMN medication_history.administered_at IS 'Hora local de la residencia (FACILITY_TIMEZONE), sin zona';
+COMMENT ON COLUMN medication_dose_slots.administered_at IS 'Administración asignada a la franja por el barrido; hora local de la residencia, sin zona';
+COMMENT ON COLUMN medication_dose_slots.status IS 'NULL (pendiente a tiempo), given, given_late, late (atrasada sin administrar) o missed (omitida)';
+
+-- GET /api/medications/missed solo recorre las franjas marcadas
+CREATE INDEX IF NOT EXISTS medication_dose_slots_flagged_idx ON medication_dose_slots (scheduled_at DESC) WHERE status IN ('late', 'missed');
+
+-- Lease del scheduler: con varios workers solo el que lo tiene ejecuta las tareas periódicas
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+COMMENT ON TABLE scheduler_leases IS 'Un registro por scheduler; holder = host:pid:id del worker líder hasta expires_at';
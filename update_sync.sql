@@ -0,0 +1,79 @@
+-- Sincronización de tabletas offline (POST /api/sync, ver backend/routers/sync.py)
+
+-- updated_at: hora de la última edición (en la tableta si vino por sync); decide los conflictos.
+-- synced_at: hora en que el servidor guardó la fila; las deltas se piden por (synced_at, id).
+ALTER TABLE vital_signs ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+ALTER TABLE vital_signs ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE medication_history ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+ALTER TABLE medication_history ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE family_contacts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+ALTER TABLE family_contacts ADD COLUMN IF NOT EXISTS synced_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS vital_signs_synced_idx ON vital_signs (synced_at, id);
+CREATE INDEX IF NOT EXISTS medication_history_synced_idx ON medication_history (synced_at, id);
+CREATE INDEX IF NOT EXISTS family_contacts_synced_idx ON family_contacts (synced_at, id);
+
+-- Toda escritura (también la de los endpoints normales) marca synced_at para que llegue a las tabletas
+CREATE OR REPLACE FUNCTION set_synced_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.synced_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vital_signs_synced_at ON vital_signs;
+CREATE TRIGGER vital_signs_synced_at BEFORE INSERT OR UPDATE ON vital_signs FOR EACH ROW EXECUTE FUNCTION set_synced_at();
+DROP TRIGGER IF EXISTS medication_history_synced_at ON medication_history;
+CREATE TRIGGER medication_history_synced_at BEFORE INSERT OR UPDATE ON medication_history FOR EACH ROW EXECUTE FUNCTION set_synced_at();
+DROP TRIGGER IF EXISTS family_contacts_synced_at ON family_contacts;
+CREATE TRIGGER family_contacts_synced_at BEFORE INSERT OR UPDATE ON family_contacts FOR EACH ROW EXECUTE FUNCTION set_synced_at();
+
+-- Ediciones de los endpoints normales (PUT) no envían updated_at: sin esto la fila conservaría la
+-- hora de creación y una edición más vieja de una tableta la pisaría. Si la escritura trae su propio
+-- updated_at (POST /api/sync, con la hora de la edición en la tableta) se respeta.
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+        NEW.updated_at = now();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vital_signs_updated_at ON vital_signs;
+CREATE TRIGGER vital_signs_updated_at BEFORE UPDATE ON vital_signs FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+DROP TRIGGER IF EXISTS medication_history_updated_at ON medication_history;
+CREATE TRIGGER medication_history_updated_at BEFORE UPDATE ON medication_history FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+DROP TRIGGER IF EXISTS family_contacts_updated_at ON family_contacts;
+CREATE TRIGGER family_contacts_updated_at BEFORE UPDATE ON family_contacts FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- Lápidas: los borrados también viajan a las tabletas
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    table_name TEXT NOT NULL,
+    row_id UUID NOT NULL,
+    resident_id UUID,
+    synced_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS sync_tombstones_row_idx ON sync_tombstones (table_name, row_id);
+CREATE INDEX IF NOT EXISTS sync_tombstones_synced_idx ON sync_tombstones (synced_at, id);
+
+-- Borrados hechos desde los endpoints normales
+CREATE OR REPLACE FUNCTION record_sync_tombstone() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sync_tombstones (table_name, row_id, resident_id)
+    VALUES (TG_TABLE_NAME, OLD.id, OLD.resident_id)
+    ON CONFLICT (table_name, row_id) DO NOTHING;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vital_signs_tombstone ON vital_signs;
+CREATE TRIGGER vital_signs_tombstone AFTER DELETE ON vital_signs FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+DROP TRIGGER IF EXISTS medication_history_tombstone ON medication_history;
+CREATE TRIGGER medication_history_tombstone AFTER DELETE ON medication_history FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+DROP TRIGGER IF EXISTS family_contacts_tombstone ON family_contacts;
+CREATE TRIGGER family_contacts_tombstone AFTER DELETE ON family_contacts FOR EACH ROW EXECUTE FUNCTION record_sync_tombstone();
+
+COMMENT ON TABLE sync_tombstones IS 'Filas borradas de vital_signs, medication_history y family_contacts que las tabletas deben eliminar';
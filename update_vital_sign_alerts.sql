@@ -0,0 +1,30 @@
+-- Alertas de signos vitales (ver backend/alerts.py): se guardan en tablas para que
+-- todos los workers vean los mismos umbrales y el mismo feed, y sobrevivan a un reinicio
+
+-- Umbrales propios de cada residente, encima de los umbrales por defecto
+CREATE TABLE IF NOT EXISTS vital_sign_thresholds (
+    resident_id UUID PRIMARY KEY REFERENCES residents(id) ON DELETE CASCADE,
+    thresholds JSONB NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+COMMENT ON TABLE vital_sign_thresholds IS 'Umbrales por residente: {tipo: {campo: [mínimo, máximo]}}; null = sin límite';
+
+-- Feed de alertas; el id creciente es el cursor de GET /api/alerts?since_id=
+CREATE TABLE IF NOT EXISTS vital_sign_alerts (
+    id BIGSERIAL PRIMARY KEY,
+    resident_id UUID NOT NULL REFERENCES residents(id) ON DELETE CASCADE,
+    vital_sign_id UUID,
+    type TEXT NOT NULL,
+    rule TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value NUMERIC,
+    threshold NUMERIC,
+    taken_at TIMESTAMPTZ,
+    message TEXT,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS vital_sign_alerts_resident_idx ON vital_sign_alerts (resident_id, id DESC);
+
+COMMENT ON COLUMN vital_sign_alerts.rule IS 'low, high (fuera de umbral) o rising (lecturas seguidas en aumento)';